@@ -0,0 +1,256 @@
+"""
+Multi-fidelity tuning of launcher parameters by successive halving and Hyperband.
+
+A candidate is first evaluated on a short scenario: the times of the scenario (stair edges and the horizon)
+and the task durations are scaled by the budget, a fraction of the full scenario. The periods are not scaled,
+that is where a short run saves, so an objective has a minimum budget below which its stair spans too few periods.
+Only the best 1 / eta of candidates move to eta times bigger budget, up to the full test_on_stair_configurable run.
+Evaluations of a rung run in parallel.
+
+    space = {'k_p': LogUniform(1e-3, 1.0), 'k_i': LogUniform(1e-6, 1e-2), 'k_d': Choice([0.0])}
+    result = hyperband(pid_stair_objective({'sum_of_deltas': 1.0}), space, workers=8)
+    print(result.best_params, result.best_value, result.used_budget)
+"""
+import concurrent.futures
+import contextlib
+import dataclasses
+import functools
+import itertools
+import math
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from plotting.modules.metrics import AdaptingSpeedMetric, AverageDiffMetric
+from random_streams import RandomStreams, StreamTaskGenerator
+from task_model import Task
+
+
+@dataclasses.dataclass(frozen=True)
+class Uniform:
+    low: float
+    high: float
+
+    def sample(self, rng: np.random.Generator):
+        return float(rng.uniform(self.low, self.high))
+
+
+@dataclasses.dataclass(frozen=True)
+class LogUniform:
+    low: float
+    high: float
+
+    def sample(self, rng: np.random.Generator):
+        return float(np.exp(rng.uniform(np.log(self.low), np.log(self.high))))
+
+
+@dataclasses.dataclass(frozen=True)
+class Choice:
+    values: Sequence[Any]
+
+    def sample(self, rng: np.random.Generator):
+        return self.values[rng.integers(len(self.values))]
+
+
+def sample_params(space: Dict[str, Any], rng: np.random.Generator) -> Dict[str, Any]:
+    return {name: distribution.sample(rng) for name, distribution in space.items()}
+
+
+@dataclasses.dataclass
+class Evaluation:
+    params: Dict[str, Any]
+    budget: float
+    value: float
+    metrics: Dict[str, float]
+    error: Optional[str] = None
+
+
+def scaled_task_generator(streams: RandomStreams, budget: float, size_mean: float, size_dev: float,
+                          duration_mean: float, duration_dev: float) -> Callable[[], Task]:
+    """
+    StreamTaskGenerator with the durations scaled by the budget, so tasks fit into the scaled stair
+    """
+    return StreamTaskGenerator(streams, size_mean=size_mean, size_dev=size_dev, duration_mean=duration_mean * budget,
+                               duration_dev=duration_dev * budget, min_duration=0.1 * budget)
+
+
+class ScenarioObjective:
+    """
+    Runs scenario(**scenario_params, launcher=...) with make_launcher(config, **params) and returns
+    the weighted sum of AverageDiffMetric and AdaptingSpeedMetric fields, for example
+    {'sum_of_deltas': 1.0, 'sum_of_times': 1 / 3600}. Lower is better, a failed or diverged run is inf.
+    time_params are the scenario parameters scaled by the budget.
+    gen_task(streams, budget) makes the task generator of an evaluation from RandomStreams(seed), created anew
+    for every evaluation, so every candidate sees the same tasks, in a worker process or not.
+    A budget below min_budget is raised to it, the evaluation has the budget actually spent.
+    """
+
+    def __init__(self, scenario: Callable, scenario_params: Dict[str, Any], make_launcher: Callable,
+                 time_params: Sequence[str], weights: Dict[str, float],
+                 gen_task: Optional[Callable[[RandomStreams, float], Callable[[], Task]]] = None, seed: int = 0,
+                 min_budget: float = 0.0):
+        self.scenario = scenario
+        self.scenario_params = scenario_params
+        self.make_launcher = make_launcher
+        self.time_params = list(time_params)
+        self.weights = weights
+        self.gen_task = gen_task
+        self.seed = seed
+        self.min_budget = min_budget
+
+    def __call__(self, params: Dict[str, Any], budget: float) -> Evaluation:
+        budget = max(budget, self.min_budget)
+        scenario_params = dict(self.scenario_params)
+        for name in self.time_params:
+            scenario_params[name] = scenario_params[name] * budget
+        if self.gen_task is not None:
+            scenario_params['gen_task'] = self.gen_task(RandomStreams(self.seed), budget)
+        try:
+            # launchers print every decision
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                output_lines = self.scenario(**scenario_params,
+                                             launcher=functools.partial(self.make_launcher, **params))
+        except Exception as e:
+            return Evaluation(params, budget, math.inf, {}, f'{type(e).__name__}: {e}')
+        stop_reason = getattr(output_lines, 'stop_reason', None)
+        if stop_reason is not None and stop_reason.reason == 'divergence':
+            return Evaluation(params, budget, math.inf, {}, f'diverged at {stop_reason.time}: {stop_reason.detail}')
+
+        metrics = AverageDiffMetric.calculate(output_lines).__dict__
+        try:
+            adapting_speed = AdaptingSpeedMetric.calculate(output_lines)
+        except IndexError:
+            # demand never reached the new limit before the end of the run
+            adapting_speed = None
+        if adapting_speed is not None:
+            metrics.update(adapting_speed.__dict__)
+        value = sum(weight * metrics.get(name, math.inf) for name, weight in self.weights.items())
+        return Evaluation(params, budget, value, metrics)
+
+
+# the shortest stair step of a scaled run spans at least this many launcher periods
+MIN_PERIODS = 10
+
+
+def pid_stair_objective(weights: Dict[str, float], seed: int = 0) -> ScenarioObjective:
+    """
+    PidLauncher(k_p, k_i, k_d) on test_on_stair of soft_limit_with_tasks
+    """
+    from soft_limit_with_tasks.__main__ import STAIR_SCENARIO, pid_launcher, test_on_stair_configurable
+
+    scenario = STAIR_SCENARIO
+    # the tasks of gen_stair_task, drawn from the streams
+    gen_task = functools.partial(scaled_task_generator, size_mean=1, size_dev=0, duration_mean=5000, duration_dev=0)
+    step = min(scenario['stair_start'], scenario['stair_end'] - scenario['stair_start'])
+    return ScenarioObjective(test_on_stair_configurable, scenario, pid_launcher,
+                             time_params=['stair_start', 'stair_end', 'simulated_duration'], weights=weights,
+                             gen_task=gen_task, seed=seed,
+                             min_budget=MIN_PERIODS * scenario['queue_maintainer_period'] / step)
+
+
+def relative_pid2_stair_objective(weights: Dict[str, float], seed: int = 0) -> ScenarioObjective:
+    """
+    RelativePidLauncher2(step, optimistic_delta, k_i, k_d) on the stair of comparison_with_constant_rate.py
+    """
+    from demo_scripts.comparison_with_constant_rate import pid_launcher, test_on_stair_configurable
+
+    scenario_params = dict(
+        launcher_period=0.1, capacity_low=200, capacity_high=300, logged_points=1000,
+        simulated_duration=100, queue_maintainer_period=0.1,
+    )
+    gen_task = functools.partial(scaled_task_generator, size_mean=1, size_dev=0.5, duration_mean=10, duration_dev=1)
+    # the stair is at the thirds of simulated_duration
+    step = scenario_params['simulated_duration'] / 3
+    return ScenarioObjective(test_on_stair_configurable, scenario_params, pid_launcher,
+                             time_params=['simulated_duration'], weights=weights, gen_task=gen_task, seed=seed,
+                             min_budget=MIN_PERIODS * scenario_params['launcher_period'] / step)
+
+
+@dataclasses.dataclass
+class TuningResult:
+    best_params: Dict[str, Any]
+    best_value: float
+    evaluations: List[Evaluation]
+
+    @property
+    def used_budget(self) -> float:
+        """
+        Spent simulation in full scenario runs
+        """
+        return sum(x.budget for x in self.evaluations)
+
+
+def _evaluate_all(objective, configs: List[Dict[str, Any]], budget: float, executor) -> List[Evaluation]:
+    if executor is None:
+        return [objective(params, budget) for params in configs]
+    return list(executor.map(objective, configs, [budget] * len(configs)))
+
+
+def successive_halving(objective, configs: List[Dict[str, Any]], min_budget: float, max_budget: float = 1.0,
+                       eta: int = 3, executor=None) -> List[Evaluation]:
+    """
+    Evaluates configs at min_budget, keeps the best 1 / eta and multiplies the budget by eta until max_budget.
+    Returns all evaluations.
+    """
+    evaluations = []
+    budget = min_budget
+    while True:
+        rung = _evaluate_all(objective, configs, min(budget, max_budget), executor)
+        evaluations.extend(rung)
+        if budget >= max_budget * (1 - 1e-9):
+            break
+        # failed runs are inf and go last
+        rung.sort(key=lambda x: x.value)
+        configs = [x.params for x in rung[:max(1, len(rung) // eta)]]
+        budget *= eta
+    return evaluations
+
+
+def _best(evaluations: List[Evaluation], max_budget: float) -> TuningResult:
+    full = [x for x in evaluations if x.budget >= max_budget * (1 - 1e-9)] or evaluations
+    best = min(full, key=lambda x: x.value)
+    return TuningResult(best.params, best.value, evaluations)
+
+
+def _executor(workers: int):
+    if workers <= 1:
+        return contextlib.nullcontext(None)
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+
+def tune_successive_halving(objective, space: Dict[str, Any], n_configs: int, min_budget: float = 1 / 27,
+                            max_budget: float = 1.0, eta: int = 3, seed: int = 0, workers: int = 1) -> TuningResult:
+    rng = np.random.default_rng(seed)
+    configs = [sample_params(space, rng) for _ in range(n_configs)]
+    with _executor(workers) as executor:
+        evaluations = successive_halving(objective, configs, min_budget, max_budget, eta, executor)
+    return _best(evaluations, max_budget)
+
+
+def hyperband(objective, space: Dict[str, Any], min_budget: float = 1 / 27, max_budget: float = 1.0, eta: int = 3,
+              seed: int = 0, workers: int = 1) -> TuningResult:
+    """
+    Successive halving brackets from many candidates at min_budget to a few at max_budget,
+    so bad guesses about how informative short runs are cost little
+    """
+    rng = np.random.default_rng(seed)
+    s_max = int(math.floor(math.log(max_budget / min_budget, eta) + 1e-9))
+    evaluations = []
+    with _executor(workers) as executor:
+        for s in reversed(range(s_max + 1)):
+            n = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+            configs = [sample_params(space, rng) for _ in range(n)]
+            evaluations.extend(successive_halving(objective, configs, max_budget * eta ** -s, max_budget, eta,
+                                                  executor))
+    return _best(evaluations, max_budget)
+
+
+def grid_search(objective, grid: Dict[str, Sequence[Any]], workers: int = 1) -> TuningResult:
+    """
+    Every combination on the full scenario, the baseline for the tuners
+    """
+    configs = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    with _executor(workers) as executor:
+        evaluations = _evaluate_all(objective, configs, 1.0, executor)
+    return _best(evaluations, 1.0)
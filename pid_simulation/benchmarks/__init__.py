@@ -0,0 +1,135 @@
+"""
+Performance benchmarks of the simulator, executors, launchers and metrics, asv style.
+
+A benchmark is a setup function decorated with @benchmark. For every combination of parameters it is
+called once per repeat and returns a function doing the measured work, which returns the number of
+units it processed (events, launches, records). Only that function is timed. It may return
+(units, metrics) instead, the metrics of the run (like AdaptingSpeedMetric fields) are stored with the timings.
+
+Run from pid_simulation:
+
+    python -m benchmarks                            # writes benchmarks/results/<commit>.json
+    python -m benchmarks -k launchers --repeat 3
+    python -m benchmarks --compare benchmarks/results/<base>.json
+
+The quota manager benchmark needs yandex on PYTHONPATH, otherwise it is skipped.
+"""
+import dataclasses
+import gc
+import itertools
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from records import Record
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+@dataclasses.dataclass
+class Benchmark:
+    name: str
+    setup: Callable[..., Callable[[], int]]
+    params: List[Dict[str, Any]]
+    unit: str
+    repeat: int
+
+
+@dataclasses.dataclass
+class BenchmarkResult(Record):
+    name: str
+    params: Dict[str, Any]
+    unit: str
+    units: int = 0
+    min_sec: float = 0.0
+    median_sec: float = 0.0
+    units_per_sec: float = 0.0
+    skipped: Optional[str] = None
+    error: Optional[str] = None
+    metrics: Optional[Dict[str, float]] = None
+
+    @property
+    def key(self) -> str:
+        return f'{self.name}{json.dumps(self.params, sort_keys=True)}'
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(unit: str, repeat: int = 5, **param_grid):
+    """
+    Registers a benchmark run for every combination of param_grid values
+    """
+
+    def decorator(setup):
+        params = [dict(zip(param_grid, values)) for values in itertools.product(*param_grid.values())]
+        name = f"{setup.__module__.split('.')[-1]}.{setup.__name__}"
+        BENCHMARKS.append(Benchmark(name, setup, params, unit, repeat))
+        return setup
+
+    return decorator
+
+
+def run_benchmark(bench: Benchmark, params: Dict[str, Any], repeat: Optional[int] = None) -> BenchmarkResult:
+    result = BenchmarkResult(bench.name, params, bench.unit)
+    times = []
+    try:
+        for _ in range(repeat or bench.repeat):
+            run = bench.setup(**params)
+            gc.collect()
+            started = time.perf_counter()
+            units = run()
+            times.append(time.perf_counter() - started)
+            if isinstance(units, tuple):
+                units, result.metrics = units
+            result.units = units
+    except SkipBenchmark as e:
+        result.skipped = str(e)
+        return result
+    except Exception as e:
+        result.error = f'{type(e).__name__}: {e}'
+        return result
+
+    result.min_sec = min(times)
+    result.median_sec = statistics.median(times)
+    result.units_per_sec = result.units / result.median_sec if result.median_sec > 0 else float('inf')
+    return result
+
+
+def run_benchmarks(name_filter: str = '', repeat: Optional[int] = None,
+                   progress: Callable[[BenchmarkResult], None] = lambda result: None) -> List[BenchmarkResult]:
+    results = []
+    for bench in BENCHMARKS:
+        for params in bench.params:
+            result = BenchmarkResult(bench.name, params, bench.unit)
+            if name_filter not in result.key:
+                continue
+            result = run_benchmark(bench, params, repeat)
+            progress(result)
+            results.append(result)
+    return results
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Rows of benchmarks present in both reports, regression if the median got slower by more than threshold
+    """
+    base_results = {BenchmarkResult(**x).key: x for x in base['results']}
+    rows = []
+    for x in new['results']:
+        key = BenchmarkResult(**x).key
+        old = base_results.get(key)
+        if old is None or not old['median_sec'] or not x['median_sec']:
+            continue
+        ratio = x['median_sec'] / old['median_sec']
+        rows.append({
+            'benchmark': key,
+            'base_sec': old['median_sec'],
+            'new_sec': x['median_sec'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+    return rows
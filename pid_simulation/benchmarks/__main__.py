@@ -0,0 +1,75 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import compare, run_benchmarks
+from benchmarks import bench_executors, bench_launchers, bench_metrics, bench_quota_managers, bench_simulator  # noqa: F401
+
+RESULTS = Path(__file__).resolve().parent / 'results'
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_result(result):
+    name = f'{result.name} {json.dumps(result.params, sort_keys=True)}'
+    if result.skipped:
+        print(f'{name:<80} skipped: {result.skipped}')
+    elif result.error:
+        print(f'{name:<80} failed: {result.error}')
+    else:
+        metrics = ' '.join(f'{key}={value:g}' for key, value in (result.metrics or {}).items())
+        print(f'{name:<80} {result.median_sec:10.4f} s {result.units_per_sec:14.1f} {result.unit}/s {metrics}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the benchmarks and stores the results as JSON')
+    parser.add_argument('-k', default='', help='run benchmarks with the substring in the name or params')
+    parser.add_argument('--repeat', type=int, default=None, help='override the number of repeats')
+    parser.add_argument('--output', default=None, help='default is benchmarks/results/<git revision>.json')
+    parser.add_argument('--compare', default=None, help='previous results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown reported as a regression')
+    args = parser.parse_args()
+
+    revision = git_revision()
+    results = run_benchmarks(args.k, args.repeat, progress=print_result)
+    report = {
+        'revision': revision,
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'processor': platform.processor(),
+        'results': [result.__dict__ for result in results],
+    }
+
+    output = Path(args.output) if args.output else RESULTS / f'{revision}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as out:
+        json.dump(report, out, indent=2)
+    print(f'Results are written to {output}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            rows = compare(json.load(file), report, args.threshold)
+        for row in rows:
+            mark = 'REGRESSION' if row['regression'] else ''
+            print(f"{row['benchmark']:<80} {row['base_sec']:10.4f} -> {row['new_sec']:10.4f} s "
+                  f"x{row['ratio']:.2f} {mark}")
+        if any(row['regression'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
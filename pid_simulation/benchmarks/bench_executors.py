@@ -0,0 +1,23 @@
+from benchmarks import benchmark
+from soft_limit_with_tasks.resources import SoftResourceProvider
+from soft_limit_with_tasks.task_executors import TaskExecutor
+from task_model import Task
+
+LAUNCHES = 2_000
+
+
+@benchmark(unit='launch', concurrent=[100, 1_000, 10_000])
+def executor_launch_clear(concurrent: int):
+    # one task is launched per second and runs for concurrent seconds,
+    # so every launch clears one finished task and keeps the number of running tasks constant
+    executor = TaskExecutor(SoftResourceProvider(lambda t: float('inf')))
+    for t in range(concurrent):
+        executor.launch(Task(1, concurrent - 0.5), t)
+
+    def run():
+        for t in range(concurrent, concurrent + LAUNCHES):
+            executor.launch(Task(1, concurrent - 0.5), t)
+        assert len(executor.running) == concurrent
+        return LAUNCHES
+
+    return run
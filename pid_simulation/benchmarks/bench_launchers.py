@@ -0,0 +1,134 @@
+"""
+Every launcher of soft_limit_with_tasks.launchers on the scenarios of soft_limit_with_tasks.__main__:
+test_on_stair (capacity 200 -> 300 -> 200) and test_on_constant (capacity 2).
+Launcher parameters are the ones used in __main__ and demo_scripts.
+change_detector runs the launchers with a change detector on the stair, before/after adaptation
+is in the AdaptingSpeedMetric fields of the results.
+"""
+import contextlib
+import os
+
+import numpy as np
+
+from benchmarks import benchmark
+from plotting.modules.metrics import AdaptingSpeedMetric
+from simulator import Simulator
+from soft_limit_with_tasks.change_detectors import CusumDetector, PageHinkleyDetector
+from soft_limit_with_tasks.launchers import (
+    CheatingLauncher,
+    ConstantRateLauncher,
+    KalmanLauncher,
+    MpcLauncher,
+    NaiveLauncher,
+    PidLauncher,
+    ProportionalLauncher,
+    RelativeErrorPidLauncher,
+    RelativePidLauncher2,
+)
+from soft_limit_with_tasks.resources import SoftResourceProvider
+from soft_limit_with_tasks.target_demand_estimators import ExponentialEstimator
+from soft_limit_with_tasks.task_executors import ResourceLogger, TaskExecutor, TaskExetutorQueueMaintainer
+from task_model import Task
+
+SCENARIOS = {
+    'stair': dict(stair_start=10_000.0, stair_end=20_000.0, stair_low=200.0, stair_high=300.0,
+                  task_duration=5000.0, simulated_duration=30_000.0),
+    'constant': dict(stair_start=0.0, stair_end=5000.0 * 100, stair_low=2.0, stair_high=2.0,
+                     task_duration=500.0, simulated_duration=5000.0 * 2.2),
+}
+PERIOD = 5 * 60
+
+LAUNCHERS = {
+    'cheating': lambda rp, ex, est, gen, s: CheatingLauncher(rp, ex, gen, est, PERIOD),
+    'pid': lambda rp, ex, est, gen, s: PidLauncher(rp, ex, gen, est, k_p=0.005, k_i=0.00001, k_d=0, period=PERIOD),
+    'relative_error_pid': lambda rp, ex, est, gen, s: RelativeErrorPidLauncher(
+        rp, ex, gen, est, k_p=0.5, k_i=0.0001, k_d=0, period=PERIOD),
+    'naive': lambda rp, ex, est, gen, s: NaiveLauncher(rp, ex, gen, est, PERIOD),
+    'constant_rate': lambda rp, ex, est, gen, s: ConstantRateLauncher(rp, ex, gen, slots=2, period=PERIOD),
+    'proportional': lambda rp, ex, est, gen, s: ProportionalLauncher(
+        ex, gen, optimistic_delta=0.05, step=5, period=PERIOD),
+    'relative_pid2': lambda rp, ex, est, gen, s: RelativePidLauncher2(
+        ex, gen, optimistic_delta=0.05, step=5, k_i=0.1, k_d=0, period=PERIOD),
+    'kalman': lambda rp, ex, est, gen, s: KalmanLauncher(
+        ex, gen, s_mean=s['task_duration'], s_dev=1, l_dev=0.01, v_underutil=0.95, period=PERIOD),
+    'mpc': lambda rp, ex, est, gen, s: MpcLauncher(
+        ex, gen, optimistic_delta=0.05, step=5, size_mean=1.0, duration_mean=s['task_duration'], duration_dev=0,
+        period=PERIOD),
+}
+
+
+# launchers resetting their state on a detected change
+DETECTING_LAUNCHERS = {
+    'pid': lambda rp, ex, est, gen, s, detector: PidLauncher(
+        rp, ex, gen, est, k_p=0.005, k_i=0.00001, k_d=0, period=PERIOD, change_detector=detector),
+    'relative_pid2': lambda rp, ex, est, gen, s, detector: RelativePidLauncher2(
+        ex, gen, optimistic_delta=0.05, step=5, k_i=0.1, k_d=0, period=PERIOD, change_detector=detector),
+    # the noise of LAUNCHERS['kalman'] overflows the filter on the stair without a detector, these stay finite
+    'kalman': lambda rp, ex, est, gen, s, detector: KalmanLauncher(
+        ex, gen, s_mean=s['task_duration'], s_dev=10, l_dev=1, v_underutil=0.95, period=PERIOD,
+        change_detector=detector),
+}
+DETECTORS = {
+    'none': lambda: None,
+    'cusum': lambda: CusumDetector(threshold=1.0, drift=0.05),
+    'page_hinkley': lambda: PageHinkleyDetector(threshold=1.0, delta=0.05),
+}
+
+
+def _scenario_processes(make_launcher, scenario: str, output_lines: list) -> list:
+    s = SCENARIOS[scenario]
+    np.random.seed(0)
+
+    def capacity(t: float) -> float:
+        return s['stair_high'] if s['stair_start'] <= t < s['stair_end'] else s['stair_low']
+
+    def gen_task() -> Task:
+        return Task(1.0, s['task_duration'])
+
+    res_provider = SoftResourceProvider(capacity)
+    executor = TaskExecutor(res_provider)
+    estimator = ExponentialEstimator(margin=0.1, min_optimistic_shift=1.5, res_provider=res_provider, period=PERIOD)
+    return [
+        TaskExetutorQueueMaintainer(PERIOD, executor),
+        estimator,
+        make_launcher(res_provider, executor, estimator, gen_task, s),
+        ResourceLogger(period=s['simulated_duration'] / 1000, executor=executor, output_lines=output_lines),
+    ]
+
+
+def _simulate(processes: list, scenario: str):
+    # launchers print every decision
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        Simulator(processes).simulate(SCENARIOS[scenario]['simulated_duration'])
+
+
+@benchmark(unit='simulated second', repeat=3, launcher=list(LAUNCHERS), scenario=list(SCENARIOS))
+def launcher_scenario(launcher: str, scenario: str):
+    processes = _scenario_processes(LAUNCHERS[launcher], scenario, [])
+
+    def run():
+        _simulate(processes, scenario)
+        return int(SCENARIOS[scenario]['simulated_duration'])
+
+    return run
+
+
+@benchmark(unit='simulated second', repeat=1, launcher=list(DETECTING_LAUNCHERS), detector=list(DETECTORS))
+def change_detector(launcher: str, detector: str):
+    output_lines = []
+    detector = DETECTORS[detector]()
+    processes = _scenario_processes(
+        lambda rp, ex, est, gen, s: DETECTING_LAUNCHERS[launcher](rp, ex, est, gen, s, detector), 'stair',
+        output_lines)
+
+    def run():
+        _simulate(processes, 'stair')
+        try:
+            adapting_speed = AdaptingSpeedMetric.calculate(output_lines)
+        except IndexError:
+            # demand never reached the new limit
+            adapting_speed = None
+        metrics = adapting_speed.__dict__ if adapting_speed is not None else {}
+        return int(SCENARIOS['stair']['simulated_duration']), metrics
+
+    return run
@@ -0,0 +1,19 @@
+import numpy as np
+
+from benchmarks import benchmark
+from plotting.modules.metrics import AverageDiffMetric
+from plotting.modules.records_replica import UtilizationRecord
+
+
+@benchmark(unit='record', repeat=3, records=[10 ** 6])
+def average_diff_metric(records: int):
+    rng = np.random.default_rng(0)
+    usage = rng.uniform(100, 200, records).tolist()
+    demand = rng.uniform(100, 300, records).tolist()
+    lines = [UtilizationRecord(u, d, 200.0, float(i)) for i, (u, d) in enumerate(zip(usage, demand))]
+
+    def run():
+        AverageDiffMetric.calculate(lines)
+        return records
+
+    return run
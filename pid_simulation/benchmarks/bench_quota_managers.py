@@ -0,0 +1,56 @@
+import dataclasses
+
+from benchmarks import SkipBenchmark, benchmark
+
+CALLS = 10
+
+
+class FakeYtClient:
+    def __init__(self, usage: float, demand: float):
+        self.row = {
+            'resource_usage': {'cpu': usage, 'user_memory': usage},
+            'resource_demand': {'cpu': demand, 'user_memory': demand},
+        }
+
+    def get(self, path):
+        return self.row
+
+
+class FakeTasksClient:
+    def count(self, *args, **kwargs):
+        return 0
+
+
+@benchmark(unit='task', backlog=[1_000, 10_000, 100_000], step=[10, 1_000])
+def filter_tasks_to_launch(backlog: int, step: int):
+    try:
+        from quota_managers import ResourceQuotaManager
+        from yweb.video.faas.graphs.ott.common import Priority
+    except ImportError as e:
+        raise SkipBenchmark(f'quota_managers is not importable ({e}), add yandex to PYTHONPATH')
+
+    @dataclasses.dataclass(eq=False)
+    class BacklogTask:
+        priority: Priority
+        parallel_encoding: bool
+
+        def is_parallel_encoding(self) -> bool:
+            return self.parallel_encoding
+
+    tasks = [BacklogTask(Priority.MAX if i % 100 == 0 else Priority.NORMAL, i % 10 == 0) for i in range(backlog)]
+    manager = ResourceQuotaManager(
+        max_demand_usage_diff=0.2,
+        step=step,
+        tasks_client=FakeTasksClient(),
+        yt_client=FakeYtClient(usage=100, demand=100),
+        nirvana_quota='quota',
+        vod_providers=['provider'],
+        parallel_graph_launch_delay_sec=60,
+    )
+
+    def run():
+        for _ in range(CALLS):
+            manager.filter_tasks_to_launch(tasks)
+        return CALLS * backlog
+
+    return run
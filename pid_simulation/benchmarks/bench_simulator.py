@@ -0,0 +1,27 @@
+from benchmarks import benchmark
+from simulator import Simulator
+
+EVENTS = 200_000
+
+
+class CountingProcess:
+    def __init__(self, period: float):
+        self.period = period
+        self.calls = 0
+
+    def do(self, t):
+        self.calls += 1
+
+
+@benchmark(unit='event', processes=[1, 10, 100, 1000])
+def simulator_events(processes: int):
+    # periods differ slightly, so the processes do not run in lockstep
+    periods = [1 + i / processes for i in range(processes)]
+    horizon = EVENTS / sum(1 / period for period in periods)
+    simulated = [CountingProcess(period) for period in periods]
+
+    def run():
+        Simulator(simulated).simulate(horizon)
+        return sum(process.calls for process in simulated)
+
+    return run
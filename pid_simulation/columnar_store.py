@@ -0,0 +1,295 @@
+"""
+Columnar store of logged records: a directory with a .npy file per column and manifest.json.
+
+Notebooks open it memory-mapped, so only the requested columns and the rows of the requested time range
+are read from disk, without parsing:
+
+    test_on_stair(launcher, output_file='logs/pid.columns')     # any output_file ending with .columns
+    store = ColumnarStore('logs/pid.columns')
+    data = store.load(['usage', 'demand'], time_range=(10_000, 20_000))
+
+A ColumnarWriter can also be the output_lines of a logger, then the records go to disk while the simulation runs
+instead of piling up in memory:
+
+    with ColumnarWriter('logs/sweep.columns') as writer:
+        logger = ResourceLogger(period=..., executor=executor, output_lines=writer)
+        Simulator([..., logger]).simulate(30_000)
+
+The time column (sorted if the records were logged in time order) is binary searched for time_range.
+read_records loads both the .columns directories and the JSON lines files written before.
+
+Column types are those of the dataclass fields (float, int, bool) of the records, otherwise of the first chunk.
+A value that does not fit the type of its column without loss (a float in an int column) is a TypeError.
+"""
+import dataclasses
+import json
+import os
+import shutil
+import tempfile
+import typing
+import weakref
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = 'manifest.json'
+SUFFIX = '.columns'
+VERSION = 1
+
+
+def _as_dicts(records: Iterable[Any]) -> List[Dict[str, Any]]:
+    return [x if isinstance(x, dict) else x.__dict__ for x in records]
+
+
+def _npy_header(dtype: np.dtype, rows: int) -> dict:
+    return {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (rows,)}
+
+
+_ANNOTATION_DTYPES = {float: np.float64, int: np.int64, bool: np.bool_}
+
+
+def _field_dtypes(record: Any) -> Dict[str, np.dtype]:
+    """
+    dtypes of the numeric fields of a dataclass record by their annotations
+    """
+    if not dataclasses.is_dataclass(record) or isinstance(record, type):
+        return {}
+    hints = typing.get_type_hints(type(record))
+    return {field.name: np.dtype(_ANNOTATION_DTYPES[hints[field.name]]) for field in dataclasses.fields(record)
+            if hints.get(field.name) in _ANNOTATION_DTYPES}
+
+
+def _discard(files: Dict[str, Any], tmp_dir: Path):
+    for file in files.values():
+        file.close()
+    files.clear()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class ColumnarWriter:
+    """
+    Appends records (UtilizationRecord and alike, dicts or DataFrames) column by column.
+    Records are buffered and written by chunk_rows. The columns are taken from the first chunk, they must be numeric.
+    dtypes override the types of the columns. The store appears at path only on close(), a reader never sees
+    a partial one. The files of a writer that is neither closed nor aborted are removed when it is collected.
+    """
+
+    def __init__(self, path, time_column: str = 'time', metadata: Optional[Dict[str, Any]] = None,
+                 chunk_rows: int = 65536, dtypes: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        self.time_column = time_column
+        self.metadata = metadata or {}
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.time_sorted = True
+        self._last_time = None
+        self._buffer: List[Dict[str, Any]] = []
+        self._files: Dict[str, Any] = {}
+        self._dtypes: Dict[str, np.dtype] = {}
+        self._declared_dtypes = {name: np.dtype(x) for name, x in (dtypes or {}).items()}
+        self._field_dtypes: Optional[Dict[str, np.dtype]] = None
+        # created with the first column, so a writer that gets no records leaves nothing behind
+        self._tmp_dir: Optional[Path] = None
+        self._finalizer: Optional[weakref.finalize] = None
+
+    def _make_tmp_dir(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_dir = Path(tempfile.mkdtemp(dir=self.path.parent, suffix='.tmp'))
+        self._finalizer = weakref.finalize(self, _discard, self._files, self._tmp_dir)
+
+    def append(self, record: Any):
+        if self._field_dtypes is None:
+            self._field_dtypes = _field_dtypes(record)
+        self._buffer.append(record if isinstance(record, dict) else record.__dict__)
+        if len(self._buffer) >= self.chunk_rows:
+            self.flush()
+
+    def extend(self, records: Iterable[Any]):
+        if isinstance(records, pd.DataFrame):
+            self.flush()
+            self._write({name: records[name].to_numpy() for name in records.columns})
+            return
+        for record in records:
+            self.append(record)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        columns = {name: np.asarray([x[name] for x in self._buffer]) for name in self._buffer[0]}
+        self._buffer = []
+        self._write(columns)
+
+    def _open(self, columns: Dict[str, np.ndarray]):
+        self._make_tmp_dir()
+        for name, values in columns.items():
+            if os.sep in name or name == MANIFEST:
+                raise ValueError(f'Column name {name!r} can not be a file name')
+            dtype = self._declared_dtypes.get(name)
+            if dtype is None:
+                dtype = (self._field_dtypes or {}).get(name, values.dtype)
+            if dtype.kind not in 'biuf':
+                raise TypeError(f'Column {name!r} of {dtype} is not numeric')
+            dtype = dtype.newbyteorder('<') if dtype.byteorder == '>' else dtype
+            file = open(self._tmp_dir / f'{name}.npy', 'wb')
+            # the header is rewritten with the number of rows on close, its length does not depend on it
+            np.lib.format.write_array_header_1_0(file, _npy_header(dtype, 0))
+            self._files[name] = file
+            self._dtypes[name] = dtype
+
+    def _write(self, columns: Dict[str, np.ndarray]):
+        if not self._files:
+            self._open(columns)
+        if set(columns) != set(self._files):
+            raise ValueError(f'Columns {sorted(columns)} differ from {sorted(self._files)}')
+        rows = {len(x) for x in columns.values()}
+        assert len(rows) == 1
+        if self.time_column in columns and self.time_sorted:
+            times = columns[self.time_column]
+            if len(times) and self._last_time is not None and times[0] < self._last_time:
+                self.time_sorted = False
+            elif len(times):
+                self.time_sorted = bool(np.all(times[1:] >= times[:-1]))
+                self._last_time = times[-1]
+        for name, values in columns.items():
+            if not np.can_cast(values.dtype, self._dtypes[name], 'safe'):
+                raise TypeError(f'Column {name!r} of {self._dtypes[name]} can not store {values.dtype} values '
+                                f'without loss, pass its type in dtypes')
+        for name, values in columns.items():
+            self._files[name].write(np.ascontiguousarray(values, dtype=self._dtypes[name]).tobytes())
+        self.rows += rows.pop()
+
+    def close(self) -> Path:
+        self.flush()
+        if self._tmp_dir is None:
+            self._make_tmp_dir()
+        columns = {}
+        for name, file in self._files.items():
+            file.seek(0)
+            np.lib.format.write_array_header_1_0(file, _npy_header(self._dtypes[name], self.rows))
+            file.close()
+            columns[name] = {'file': f'{name}.npy', 'dtype': self._dtypes[name].str}
+        self._files.clear()
+        manifest = {
+            'version': VERSION,
+            'rows': self.rows,
+            'columns': columns,
+            'time_column': self.time_column if self.time_column in columns else None,
+            'time_sorted': self.time_sorted,
+            'metadata': self.metadata,
+        }
+        (self._tmp_dir / MANIFEST).write_text(json.dumps(manifest, indent=2))
+        if self.path.exists():
+            shutil.rmtree(self.path)
+        os.replace(self._tmp_dir, self.path)
+        self._finalizer.detach()
+        return self.path
+
+    def abort(self):
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self) -> 'ColumnarWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_columns(path, records: Iterable[Any], time_column: str = 'time',
+                  metadata: Optional[Dict[str, Any]] = None, dtypes: Optional[Dict[str, Any]] = None) -> Path:
+    """
+    Writes records (a list of records or dicts, or a DataFrame) as a columnar store at path
+    """
+    with ColumnarWriter(path, time_column, metadata, dtypes=dtypes) as writer:
+        writer.extend(records)
+    return writer.path
+
+
+class ColumnarStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / MANIFEST).read_text())
+        if self.manifest['version'] != VERSION:
+            raise ValueError(f'Unsupported columnar store version {self.manifest["version"]} in {self.path}')
+        self.rows: int = self.manifest['rows']
+        self.columns: List[str] = list(self.manifest['columns'])
+        self.time_column: Optional[str] = self.manifest['time_column']
+        self.metadata: Dict[str, Any] = self.manifest['metadata']
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Whole column, memory-mapped read only
+        """
+        if name not in self._arrays:
+            if name not in self.manifest['columns']:
+                raise KeyError(f'No column {name!r} in {self.path}, there are {self.columns}')
+            file = self.path / self.manifest['columns'][name]['file']
+            # an empty file can not be mapped
+            self._arrays[name] = np.load(file, mmap_mode='r' if self.rows else None)
+        return self._arrays[name]
+
+    def rows_in(self, time_range: Optional[Tuple[float, float]]):
+        """
+        Rows with start <= time < end: a slice found by binary search if the time column is sorted,
+        otherwise a boolean mask
+        """
+        if time_range is None:
+            return slice(None)
+        if self.time_column is None:
+            raise ValueError(f'{self.path} has no time column')
+        start, end = time_range
+        times = self.column(self.time_column)
+        if self.manifest['time_sorted']:
+            return slice(int(np.searchsorted(times, start, 'left')), int(np.searchsorted(times, end, 'left')))
+        return (times >= start) & (times < end)
+
+    def arrays(self, columns: Optional[Sequence[str]] = None,
+               time_range: Optional[Tuple[float, float]] = None) -> Dict[str, np.ndarray]:
+        """
+        Columns as arrays. With a sorted time column they are views of the memory map, nothing is read until used.
+        """
+        rows = self.rows_in(time_range)
+        return {name: self.column(name)[rows] for name in (columns or self.columns)}
+
+    def load(self, columns: Optional[Sequence[str]] = None,
+             time_range: Optional[Tuple[float, float]] = None) -> pd.DataFrame:
+        """
+        DataFrame of the columns (all by default) in the time range, only these parts of the files are read
+        """
+        return pd.DataFrame({name: np.array(x) for name, x in self.arrays(columns, time_range).items()},
+                            columns=list(columns or self.columns))
+
+    def __len__(self) -> int:
+        return self.rows
+
+
+def write_records(records: Iterable[Any], output_file, time_column: str = 'time'):
+    """
+    Output of the scenario functions: a columnar store if output_file ends with .columns, JSON lines otherwise
+    """
+    if str(output_file).endswith(SUFFIX):
+        write_columns(output_file, records, time_column)
+    else:
+        data = pd.DataFrame(_as_dicts(records))
+        data.to_json(path_or_buf=output_file, orient='records', lines=True)
+
+
+def read_records(path, columns: Optional[Sequence[str]] = None, time_range: Optional[Tuple[float, float]] = None,
+                 time_column: str = 'time') -> pd.DataFrame:
+    """
+    Loads output of write_records. JSON lines are parsed whole and filtered afterwards.
+    """
+    if str(path).rstrip('/\\').endswith(SUFFIX):
+        return ColumnarStore(path).load(columns, time_range)
+    data = pd.read_json(path, lines=True)
+    if time_range is not None:
+        data = data[(data[time_column] >= time_range[0]) & (data[time_column] < time_range[1])]
+    if columns is not None:
+        data = data[list(columns)]
+    return data.reset_index(drop=True)
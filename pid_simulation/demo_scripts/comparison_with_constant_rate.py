@@ -1,7 +1,8 @@
 from soft_limit_with_tasks.task_executors import (
     TaskExetutorQueueMaintainer,
     TaskExecutor,
-    ResourceLogger
+    ResourceLogger,
+    UtilizationRecord
 )
 from task_model import Task
 from soft_limit_with_tasks.resources import SoftResourceProvider
@@ -12,11 +13,16 @@ from soft_limit_with_tasks.launchers import (
 )
 from soft_limit_with_tasks.target_demand_estimators import ExponentialEstimator
 from simulator import Simulator
+from columnar_store import write_records
+from stop_conditions import RecordLog
+from random_streams import PairedReport, RandomStreams, StreamTaskGenerator, compare_launchers
+from plotting.modules.metrics import AverageDiffMetric
 
-import pandas as pd
+import contextlib
 import dataclasses
+import os
 import numpy as np
-from typing import Callable, Any
+from typing import Callable, Any, Dict, Iterable, List, Optional
 
 
 @dataclasses.dataclass
@@ -35,8 +41,8 @@ def test_on_constant_configurable(
         simulated_duration: float,
         launcher: Callable[[LauncherConfig2], Any],
         gen_task: Callable[[], Task],
-        output_file: str,
-):
+        output_file: Optional[str] = None,
+) -> List[UtilizationRecord]:
     res_provider = SoftResourceProvider(lambda t: capacity)
     task_executor = TaskExecutor(res_provider)
     task_queue_maintainer = TaskExetutorQueueMaintainer(queue_maintainer_period, task_executor)
@@ -44,17 +50,18 @@ def test_on_constant_configurable(
     launcher_config = LauncherConfig2(res_provider, task_executor, gen_task, launcher_period)
 
     task_launcher = launcher(launcher_config)
-    output_lines = []
+    output_lines = RecordLog()
     logger = ResourceLogger(period=simulated_duration / logged_points, executor=task_executor,
                             output_lines=output_lines)
 
     processes = [task_queue_maintainer, task_launcher, logger]
     simulator = Simulator(processes)
-    simulator.simulate(simulated_duration)
+    output_lines.stop_reason = simulator.simulate(simulated_duration)
 
     # ====--------plotting--------------
-    data = pd.DataFrame([line.__dict__ for line in output_lines])
-    data.to_json(path_or_buf=output_file, orient='records', lines=True)
+    if output_file is not None:
+        write_records(output_lines, output_file)
+    return output_lines
 
 
 def test_on_stair_configurable(
@@ -66,8 +73,8 @@ def test_on_stair_configurable(
         simulated_duration: float,
         launcher: Callable[[LauncherConfig2], Any],
         gen_task: Callable[[], Task],
-        output_file: str,
-):
+        output_file: Optional[str] = None,
+) -> List[UtilizationRecord]:
     def capacity(t: float) -> float:
         return capacity_high if simulated_duration / 3 < t < (2 / 3 * simulated_duration) else capacity_low
     res_provider = SoftResourceProvider(capacity)
@@ -77,17 +84,18 @@ def test_on_stair_configurable(
     launcher_config = LauncherConfig2(res_provider, task_executor, gen_task, launcher_period)
 
     task_launcher = launcher(launcher_config)
-    output_lines = []
+    output_lines = RecordLog()
     logger = ResourceLogger(period=simulated_duration / logged_points, executor=task_executor,
                             output_lines=output_lines)
 
     processes = [task_queue_maintainer, task_launcher, logger]
     simulator = Simulator(processes)
-    simulator.simulate(simulated_duration)
+    output_lines.stop_reason = simulator.simulate(simulated_duration)
 
     # ====--------plotting--------------
-    data = pd.DataFrame([line.__dict__ for line in output_lines])
-    data.to_json(path_or_buf=output_file, orient='records', lines=True)
+    if output_file is not None:
+        write_records(output_lines, output_file)
+    return output_lines
 
 
 def constant_rate_launcher(config: LauncherConfig2, slots: int) -> ConstantRateLauncher:
@@ -122,6 +130,28 @@ def pid_launcher(config: LauncherConfig2, step: float, optimistic_delta: float,
     )
 
 
+def compare_with_common_random_numbers(
+        launchers: Dict[str, Callable[[LauncherConfig2], Any]],
+        seeds: Iterable[int],
+        task_size: float,
+        task_size_dev: float,
+        task_duration: float,
+        task_duration_dev: float,
+        **scenario
+) -> PairedReport:
+    """
+    Runs test_on_constant_configurable with every launcher on the same task sequences
+    and compares sum_of_deltas of the launchers pairwise
+    """
+    def run(name: str, streams: RandomStreams) -> float:
+        gen_task = StreamTaskGenerator(streams, task_size, task_size_dev, task_duration, task_duration_dev)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            output_lines = test_on_constant_configurable(launcher=launchers[name], gen_task=gen_task, **scenario)
+        return AverageDiffMetric.calculate(output_lines).sum_of_deltas
+
+    return compare_launchers(run, list(launchers), seeds)
+
+
 if __name__ == '__main__':
     task_size = 1
     task_size_dev = 0.5
@@ -194,3 +224,10 @@ if __name__ == '__main__':
     #                               simulated_duration=200, queue_maintainer_period=0.4,
     #                               gen_task=gen_task,
     #                               launcher=kalman_launcher, output_file='logs/comparison/kalman.json')
+
+    # report = compare_with_common_random_numbers(
+    #     {'p': p_launcher, 'pid': pid_launcher_fixed, 'constant': const_launcher}, seeds=range(10),
+    #     task_size=task_size, task_size_dev=task_size_dev,
+    #     task_duration=task_duration, task_duration_dev=task_duration_dev,
+    #     launcher_period=0.1, capacity=300, logged_points=1000, simulated_duration=100, queue_maintainer_period=0.1)
+    # print(report.table())
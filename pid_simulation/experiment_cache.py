@@ -0,0 +1,201 @@
+"""
+Content-addressed cache of experiment results.
+
+An experiment is described by ExperimentConfig: scenario and its parameters, launcher class and its parameters,
+seed and the code version (a hash of the pid_simulation sources). The results are stored under the hash of the
+config, so a repeated run with the same config, in a script or in a notebook, is loaded from disk:
+
+    cache = ExperimentCache()
+    config = ExperimentConfig.create('stair', dict(stair_low=200.0, stair_high=300.0),
+                                     RelativePidLauncher2, dict(step=5, optimistic_delta=0.05, k_i=3, k_d=3), seed=1)
+    data = cache.run(config, run_stair)     # run_stair(config) returns the logged records
+    usage = ColumnarStore(cache.path(config)).load(['usage'], time_range=(10_000, 20_000))
+
+Results are stored as columnar stores (see columnar_store.py) with the config in their metadata, so the records
+must be numeric. The least recently used results are removed when the cache grows over max_bytes.
+"""
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import random
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import SUFFIX, ColumnarStore, write_columns
+from records import Record
+
+PACKAGE_ROOT = Path(__file__).resolve().parent
+DEFAULT_CACHE_DIR = PACKAGE_ROOT / '.experiment_cache'
+
+
+@functools.lru_cache(maxsize=None)
+def code_version(root: Path = PACKAGE_ROOT) -> str:
+    """
+    Hash of all python sources of the package, any change of the code invalidates the cached results
+    """
+    digest = hashlib.sha256()
+    for path in sorted(root.rglob('*.py')):
+        if '__pycache__' in path.parts:
+            continue
+        digest.update(str(path.relative_to(root)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _canonical(value: Any) -> Any:
+    # params may hold numpy numbers and tuples, they are hashed as plain json values
+    if isinstance(value, dict):
+        return {str(key): _canonical(x) for key, x in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(x) for x in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, type):
+        return f'{value.__module__}.{value.__qualname__}'
+    return value
+
+
+@dataclasses.dataclass(frozen=True)
+class ExperimentConfig(Record):
+    scenario: str
+    scenario_params: Dict[str, Any]
+    launcher: str
+    launcher_params: Dict[str, Any]
+    seed: int
+    code_version: str
+
+    @staticmethod
+    def create(scenario: str, scenario_params: Dict[str, Any], launcher, launcher_params: Dict[str, Any],
+               seed: int) -> 'ExperimentConfig':
+        """
+        launcher is a launcher class (or its name), the code version is the current one
+        """
+        return ExperimentConfig(
+            scenario=scenario,
+            scenario_params=_canonical(scenario_params),
+            launcher=_canonical(launcher),
+            launcher_params=_canonical(launcher_params),
+            seed=seed,
+            code_version=code_version(),
+        )
+
+    @property
+    def json(self):
+        return json.dumps(_canonical(self.__dict__), sort_keys=True)
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha256(self.json.encode()).hexdigest()
+
+    def __hash__(self):
+        return hash(self.key)
+
+
+class ExperimentCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes: int = 1 << 30):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, config: ExperimentConfig) -> Path:
+        key = config.key
+        return self.root / key[:2] / f'{key}{SUFFIX}'
+
+    def get(self, config: ExperimentConfig) -> Optional[pd.DataFrame]:
+        path = self.path(config)
+        if not path.exists():
+            self.misses += 1
+            return None
+        self.hits += 1
+        # access time is kept in mtime, atime is often not updated by the file system
+        os.utime(path)
+        return ColumnarStore(path).load()
+
+    def put(self, config: ExperimentConfig, records: Iterable[Any]) -> pd.DataFrame:
+        """
+        records are logged records (UtilizationRecord and alike) or dicts
+        """
+        path = self.path(config)
+        # the store is renamed into place when complete, a concurrent reader never sees a partial result
+        write_columns(path, records, metadata=json.loads(config.json))
+        self.evict(keep=path)
+        return ColumnarStore(path).load()
+
+    def run(self, config: ExperimentConfig, experiment: Callable[[ExperimentConfig], Iterable[Any]]) -> pd.DataFrame:
+        """
+        Cached result of experiment(config). The global random generators are seeded with config.seed before the run.
+        """
+        data = self.get(config)
+        if data is not None:
+            return data
+        random.seed(config.seed)
+        np.random.seed(config.seed)
+        return self.put(config, experiment(config))
+
+    def _entries(self) -> List[Path]:
+        return list(self.root.glob(f'*/*{SUFFIX}')) if self.root.exists() else []
+
+    @staticmethod
+    def _entry_size(path: Path) -> int:
+        return sum(file.stat().st_size for file in path.iterdir())
+
+    def size(self) -> int:
+        return sum(self._entry_size(path) for path in self._entries())
+
+    def _remove(self, path: Path):
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            path.parent.rmdir()
+        except OSError:
+            pass
+
+    def evict(self, keep: Optional[Path] = None):
+        """
+        Removes the least recently used results until the cache fits into max_bytes
+        """
+        entries = [(path.stat().st_mtime, self._entry_size(path), path) for path in self._entries()]
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total -= size
+
+    def configs(self) -> List[Dict[str, Any]]:
+        return [ColumnarStore(path).metadata for path in self._entries()]
+
+    def invalidate(self, config: Optional[ExperimentConfig] = None,
+                   predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> int:
+        """
+        Removes the result of config, or every result whose config (as a dict) satisfies predicate,
+        or everything if neither is given. Returns the number of removed results.
+        """
+        if config is not None:
+            path = self.path(config)
+            existed = path.exists()
+            self._remove(path)
+            return int(existed)
+
+        removed = 0
+        for path in self._entries():
+            if predicate is not None and not predicate(ColumnarStore(path).metadata):
+                continue
+            self._remove(path)
+            removed += 1
+        return removed
+
+    def invalidate_stale(self) -> int:
+        """
+        Removes the results computed by other versions of the code
+        """
+        version = code_version()
+        return self.invalidate(predicate=lambda config: config['code_version'] != version)
@@ -0,0 +1,262 @@
+"""
+Python port of parallel_graphs (Rust): layered graphs executed with a shared bandwidth of operations
+("cubes") per iteration, either one graph after another or all in parallel.
+"""
+import csv
+import dataclasses
+import heapq
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from records import LoggedRecord
+
+
+@dataclasses.dataclass(frozen=True)
+class Graph:
+    depth: int
+    width: int
+
+
+def graph_batch(n: int, depth: int, width: int) -> List[Graph]:
+    return [Graph(depth, width) for _ in range(n)]
+
+
+class GraphInstance:
+    __slots__ = ('id', 'graph', 'left_on_first_layer', 'left_layers')
+
+    def __init__(self, id: int, graph: Graph):
+        assert graph.depth > 0
+        assert graph.width > 0
+        self.id = id
+        self.graph = graph
+        self.left_on_first_layer: Optional[int] = graph.width
+        self.left_layers = graph.depth - 1
+
+    def left_cubes(self) -> int:
+        return self.left_layers * self.graph.width + (self.left_on_first_layer or 0)
+
+    def remove_from_first(self, n: int) -> bool:
+        """
+        Removes n operations from the first layer.
+        Replaces the first layer with the next one if it became empty, in which case returns True.
+        """
+        assert n <= self.left_on_first_layer
+        self.left_on_first_layer -= n
+        if self.left_on_first_layer == 0:
+            if self.left_layers == 0:
+                self.left_on_first_layer = None
+            else:
+                self.left_layers -= 1
+                self.left_on_first_layer = self.graph.width
+            return True
+        return False
+
+
+class ParallelExecution:
+    """
+    Every iteration the graph with the most cubes left is advanced first,
+    only as far as needed to catch up with the next one.
+    """
+
+    def __init__(self, bandwidth: int, graphs: List[Graph]):
+        self.bandwidth = bandwidth
+        # max-heap by left cubes, the smaller id goes first among equal ones
+        self.left_instances = []
+        for i, graph in enumerate(graphs):
+            self.add(GraphInstance(i, graph))
+
+    def add(self, instance: GraphInstance):
+        heapq.heappush(self.left_instances, (-instance.left_cubes(), instance.id, instance))
+
+    def finished(self) -> bool:
+        return not self.left_instances
+
+    def left_cubes(self) -> int:
+        return -sum(entry[0] for entry in self.left_instances)
+
+    def iterate(self) -> List[int]:
+        iterated_instances = []
+        operations_to_execute = self.bandwidth
+        while operations_to_execute > 0 and self.left_instances:
+            _, _, first = heapq.heappop(self.left_instances)
+            if self.left_instances:
+                second_left = -self.left_instances[0][0]
+                sub = max(min(operations_to_execute, first.left_on_first_layer, first.left_cubes() - second_left), 1)
+            else:
+                sub = min(operations_to_execute, first.left_on_first_layer)
+            assert sub > 0
+
+            first.remove_from_first(sub)
+            iterated_instances.append(first)
+            operations_to_execute -= sub
+
+        for instance in iterated_instances:
+            if instance.left_cubes() > 0:
+                self.add(instance)
+        return [instance.id for instance in iterated_instances]
+
+
+class SequentialExecution:
+    """
+    Graphs are executed one after another, the bandwidth left after the current graph
+    goes to the next one.
+    """
+
+    def __init__(self, bandwidth: int, graphs: List[Graph]):
+        self.bandwidth = bandwidth
+        # executed from the right end, so new graphs are added to the left
+        self.left_instances = deque(GraphInstance(i, graph) for i, graph in enumerate(graphs))
+
+    def add(self, instance: GraphInstance):
+        self.left_instances.appendleft(instance)
+
+    def finished(self) -> bool:
+        return not self.left_instances
+
+    def left_cubes(self) -> int:
+        return sum(instance.left_cubes() for instance in self.left_instances)
+
+    def iterate(self) -> List[int]:
+        touched_instances = []
+        bandwidth_left = self.bandwidth
+        for instance in reversed(self.left_instances):
+            if bandwidth_left == 0:
+                break
+            sub = min(bandwidth_left, instance.left_on_first_layer)
+            assert sub > 0
+            instance.remove_from_first(sub)
+            touched_instances.append(instance.id)
+            bandwidth_left -= sub
+        while self.left_instances and self.left_instances[-1].left_cubes() == 0:
+            self.left_instances.pop()
+        return touched_instances
+
+
+def execute(execution) -> Dict[int, int]:
+    """
+    Executes all graphs, returns the number of iterations it took to finish each graph
+    """
+    iterations_per_graph = {}
+    total_iters = 0
+    while not execution.finished():
+        touched_ids = execution.iterate()
+        total_iters += 1
+        for id in touched_ids:
+            iterations_per_graph[id] = total_iters
+    return iterations_per_graph
+
+
+@dataclasses.dataclass
+class ExecutionMetric:
+    min_iters: int
+    max_iters: int
+    sum_iters: int
+
+    @staticmethod
+    def calculate(iterations_per_graph: Dict[int, int]) -> 'ExecutionMetric':
+        iterations = iterations_per_graph.values()
+        return ExecutionMetric(
+            min_iters=min(iterations, default=0),
+            max_iters=max(iterations, default=0),
+            sum_iters=sum(iterations),
+        )
+
+
+def linspace(start: int, end: int, n: int) -> List[int]:
+    dx = (end - start) // (n - 1)
+    return [start + i * dx for i in range(n)]
+
+
+def write_dataset(execution_cls, min_graphs: int, max_graphs: int, len: int, file: str,
+                  graph_depth: int = 5, graph_width: int = 5, bandwidth: int = 5 * 200):
+    with open(file, 'w', newline='') as out:
+        # same line endings as the csv crate output
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(['graphs_number', 'graph_depth', 'graph_width', 'bandwidth',
+                         'min_iters', 'max_iters', 'sum_iters'])
+        for graphs_number in linspace(min_graphs, max_graphs, len):
+            execution = execution_cls(bandwidth, graph_batch(graphs_number, graph_depth, graph_width))
+            metric = ExecutionMetric.calculate(execute(execution))
+            writer.writerow([graphs_number, graph_depth, graph_width, bandwidth,
+                             metric.min_iters, metric.max_iters, metric.sum_iters])
+
+
+# ---------------- simulator processes ----------------
+
+class GraphExecutor:
+    """
+    Executes launched graphs, one iteration of the execution per period
+    """
+
+    def __init__(self, execution, period: float):
+        self.execution = execution
+        self.period = period
+        self.next_id = 0
+        self.running: Dict[int, GraphInstance] = {}
+        self.launched_at: Dict[int, float] = {}
+        self.finished_in: Dict[int, float] = {}
+
+    def launch(self, graph: Graph, t: float) -> int:
+        instance = GraphInstance(self.next_id, graph)
+        self.next_id += 1
+        self.running[instance.id] = instance
+        self.launched_at[instance.id] = t
+        self.execution.add(instance)
+        return instance.id
+
+    def do(self, t: float):
+        if self.execution.finished():
+            return
+        for id in self.execution.iterate():
+            if self.running[id].left_cubes() == 0:
+                del self.running[id]
+                self.finished_in[id] = t + self.period - self.launched_at.pop(id)
+
+    def get_running(self) -> int:
+        return len(self.running)
+
+    def get_demand(self) -> int:
+        return self.execution.left_cubes()
+
+
+class ParallelGraphLauncher:
+    """
+    Launches a graph from gen_graph if no graph was launched during the last launch_delay seconds,
+    like QuotaManager.can_launch_parallel_graph
+    """
+
+    def __init__(self, executor: GraphExecutor, gen_graph: Callable[[], Graph], launch_delay: float, period: float):
+        self.executor = executor
+        self.gen_graph = gen_graph
+        self.launch_delay = launch_delay
+        self.period = period
+        self.last_launch: Optional[float] = None
+
+    def do(self, t: float):
+        if self.last_launch is not None and t - self.last_launch < self.launch_delay:
+            return
+        self.executor.launch(self.gen_graph(), t)
+        self.last_launch = t
+
+
+@dataclasses.dataclass
+class GraphExecutionRecord(LoggedRecord):
+    running: int
+    demand: int
+    finished: int
+    time: float
+
+
+class GraphLogger:
+    def __init__(self, period: float, executor: GraphExecutor, output_lines):
+        self.period = period
+        self.executor = executor
+        self.output_lines = output_lines
+
+    def do(self, t: float):
+        self.output_lines.append(GraphExecutionRecord(
+            running=self.executor.get_running(),
+            demand=self.executor.get_demand(),
+            finished=len(self.executor.finished_in),
+            time=t
+        ))
@@ -0,0 +1,103 @@
+import argparse
+import dataclasses
+import os
+from typing import Optional
+
+from graph_execution import (
+    Graph,
+    GraphExecutor,
+    GraphLogger,
+    ParallelExecution,
+    ParallelGraphLauncher,
+    SequentialExecution,
+    write_dataset,
+)
+from simulator import Simulator
+from columnar_store import write_records
+
+import numpy as np
+
+
+EXECUTIONS = {
+    'parallel': ParallelExecution,
+    'sequential': SequentialExecution,
+}
+
+
+@dataclasses.dataclass
+class LaunchDelayResult:
+    finished: int
+    running: int
+    # None when no graph finished: the launcher outpaces the bandwidth and the parallel execution
+    # keeps all the graphs at the same progress
+    mean_finished_in: Optional[float]
+
+
+def simulate_launch_delay(
+    launch_delay: float,
+    execution_cls,
+    bandwidth: int,
+    gen_graph,
+    iteration_period: float,
+    simulated_duration: float,
+    logged_points: int,
+    output_file: Optional[str] = None,
+) -> LaunchDelayResult:
+    executor = GraphExecutor(execution_cls(bandwidth, []), period=iteration_period)
+    launcher = ParallelGraphLauncher(executor, gen_graph, launch_delay=launch_delay, period=iteration_period)
+    output_lines = []
+    logger = GraphLogger(simulated_duration / logged_points, executor, output_lines)
+
+    simulator = Simulator([launcher, executor, logger])
+    simulator.simulate(simulated_duration)
+
+    if output_file is not None:
+        write_records(output_lines, output_file)
+
+    finished_in = list(executor.finished_in.values())
+    return LaunchDelayResult(
+        finished=len(finished_in),
+        running=executor.get_running(),
+        mean_finished_in=float(np.mean(finished_in)) if finished_in else None,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel graphs execution model')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('datasets', help='write parallel.csv and sequential.csv, same as parallel_graphs (cargo run)')
+    delay_parser = subparsers.add_parser('launch-delay', help='mean graph duration by the parallel launch delay')
+    delay_parser.add_argument('--delays', type=float, nargs='+', default=[1, 2, 5, 10])
+    delay_parser.add_argument('--execution', choices=EXECUTIONS, default='parallel')
+    delay_parser.add_argument('--bandwidth', type=int, default=10)
+    delay_parser.add_argument('--duration', type=float, default=1000)
+    delay_parser.add_argument('--seed', type=int, default=0)
+    delay_parser.add_argument('--logs-dir', default=None, help='write the GraphExecutionRecord columns here')
+    args = parser.parse_args()
+
+    if args.command == 'datasets':
+        write_dataset(ParallelExecution, min_graphs=10, max_graphs=5_000, len=40, file='parallel.csv')
+        write_dataset(SequentialExecution, min_graphs=10, max_graphs=5_000, len=40, file='sequential.csv')
+        return
+
+    rng = np.random.default_rng(args.seed)
+
+    def gen_graph() -> Graph:
+        return Graph(depth=5, width=max(1, round(rng.normal(5, 2))))
+
+    for delay in args.delays:
+        output_file = None
+        if args.logs_dir is not None:
+            output_file = os.path.join(args.logs_dir, f'{args.execution}_delay_{delay:g}')
+        result = simulate_launch_delay(delay, EXECUTIONS[args.execution], bandwidth=args.bandwidth,
+                                       gen_graph=gen_graph, iteration_period=1, simulated_duration=args.duration,
+                                       logged_points=1000, output_file=output_file)
+        if result.mean_finished_in is None:
+            print(f'delay={delay:g}: no graph finished, {result.running} running')
+        else:
+            print(f'delay={delay:g}: mean_time={result.mean_finished_in:.1f}, '
+                  f'finished={result.finished}, running={result.running}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,13 +3,16 @@ from pathlib import Path
 
 import numpy as np
 from filterpy.kalman import KalmanFilter
-from typing import Callable
+from typing import Callable, Optional
 
+from random_streams import RandomStreams
 from simulator import Simulator
 
 
 class Barrel:
-    def __init__(self, v0: float, l0: float, d_dev: float, l_dev: float, v_dev: float, period: float):
+    def __init__(self, v0: float, l0: float, d_dev: float, l_dev: float, v_dev: float, period: float, rng=np.random):
+        # np.random, or the 'plant_noise' stream for common random numbers (see plant_noise)
+        self.rng = rng
         self.v = v0
         self.l = l0
         self.d = 0
@@ -20,9 +23,9 @@ class Barrel:
         self.period = period
 
     def do(self, t: float):
-        v = np.random.normal(self.v, self.v_dev)
-        l = np.random.normal(self.l, self.l_dev)
-        self.d = self.d + (v - l) * self.period + np.random.normal(0, self.d_dev)
+        v = self.rng.normal(self.v, self.v_dev)
+        l = self.rng.normal(self.l, self.l_dev)
+        self.d = self.d + (v - l) * self.period + self.rng.normal(0, self.d_dev)
         # self.d = max(0., self.d + (self.v - self.l) * self.period)
         # self.d = max(self.min_demand, self.d + (self.v - self.l) * self.period)
 
@@ -58,6 +61,13 @@ class KalmanBarrelEstimator:
         print(f'{self.f.P=}')
 
 
+def plant_noise(streams: Optional[RandomStreams]):
+    """
+    rng of Barrel: the 'plant_noise' stream, so runs with the same seed see the same noise, or np.random
+    """
+    return streams['plant_noise'] if streams is not None else np.random
+
+
 class LChanger:
     def __init__(self, barrel: Barrel, l_fun: Callable[[float], float]):
         self.barrel = barrel
@@ -85,7 +95,7 @@ class Logger:
         self.output_lines.append(data)
 
 
-def run_kalman_experiment():
+def run_kalman_experiment(streams: Optional[RandomStreams] = None):
     output_file = Path('./logs/kalman_normal_no_control.json')
     output_lines = []
 
@@ -98,7 +108,7 @@ def run_kalman_experiment():
     period = 1
     duration = period * 70
 
-    barrel = Barrel(7, l_fun(0), v_dev=1, l_dev=1, d_dev=1, period=period)
+    barrel = Barrel(7, l_fun(0), v_dev=1, l_dev=1, d_dev=1, period=period, rng=plant_noise(streams))
     barrel_estimator = KalmanBarrelEstimator(barrel, period)
     l_changer = LChanger(barrel, l_fun)
     logger = Logger(barrel, barrel_estimator, output_lines)
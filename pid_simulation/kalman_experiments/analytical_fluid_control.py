@@ -1,8 +1,10 @@
 import json
 from pathlib import Path
+from typing import Optional
 
-from kalman_experiments import Barrel, LChanger
+from kalman_experiments import Barrel, LChanger, plant_noise
 from kalman_experiments.p_fluid_control import Logger
+from random_streams import RandomStreams
 from simulator import Simulator
 
 
@@ -16,7 +18,7 @@ class AnalyticalInputController:
         self.barrel.v = self.barrel.v + (self.d_prev - self.barrel.d) / self.period
 
 
-def run_analytical_control():
+def run_analytical_control(streams: Optional[RandomStreams] = None):
     output_file = Path('./logs/analytical_control_normal.json')
     output_lines = []
 
@@ -30,7 +32,7 @@ def run_analytical_control():
     duration = period * 100
     under_util = 1.
 
-    barrel = Barrel(7, l_fun(0), l_dev=1, v_dev=1, d_dev=1, period=period)
+    barrel = Barrel(7, l_fun(0), l_dev=1, v_dev=1, d_dev=1, period=period, rng=plant_noise(streams))
     l_changer = LChanger(barrel, l_fun)
     logger = Logger(barrel, output_lines)
     controller = AnalyticalInputController(barrel)
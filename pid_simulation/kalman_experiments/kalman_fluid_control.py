@@ -1,7 +1,9 @@
 import json
 from pathlib import Path
+from typing import Optional
 
-from kalman_experiments import Barrel, KalmanBarrelEstimator, LChanger, Logger
+from kalman_experiments import Barrel, KalmanBarrelEstimator, LChanger, Logger, plant_noise
+from random_streams import RandomStreams
 from simulator import Simulator
 
 
@@ -17,7 +19,7 @@ class KalmanInputController:
         self.barrel.v = l * self.under_util
 
 
-def run_kalman_control():
+def run_kalman_control(streams: Optional[RandomStreams] = None):
     output_file = Path('./logs/kalman_control_normal_limit.json')
     output_lines = []
 
@@ -31,7 +33,7 @@ def run_kalman_control():
     duration = period * 100
     under_util = 1
 
-    barrel = Barrel(7, l_fun(0), v_dev=1, l_dev=1, d_dev=1, period=period)
+    barrel = Barrel(7, l_fun(0), v_dev=1, l_dev=1, d_dev=1, period=period, rng=plant_noise(streams))
     # barrel = Barrel(7, l_fun(0), -10, period)
     barrel_estimator = KalmanBarrelEstimator(barrel, period)
     l_changer = LChanger(barrel, l_fun)
@@ -0,0 +1,261 @@
+"""
+Simulation of independent partitions (pools with their own executors, launchers and loggers) in worker processes.
+
+Partitions interact only through signals exchanged at every sync_interval of simulated time: each partition
+reports a summary (for example its demand), combine() turns the reports into a signal for every partition
+(for example its share of the cluster capacity), and the partitions apply them. Between the syncs the partitions
+are simulated independently by their own Simulators, so the workers only meet at the barrier:
+
+    simulator = PartitionedSimulator(functools.partial(pool_partition, seed=1), partitions=64,
+                                     sync_interval=300, combine=ProportionalShare(total_capacity=64 * 250))
+    results = simulator.simulate(30_000)    # Partition.results() of every partition, in partition order
+    simulator.stop_reasons                  # StopReason of the partitions stopped early, None for the others
+
+make_partition(index) is called in the worker, so the processes need not be picklable, but make_partition,
+the reports, the signals and the results must be. Partitions should draw random numbers from their own
+generators: then the results do not depend on the number of workers.
+A partition whose process raised StopSimulation is not simulated any more, it keeps reporting its last state.
+"""
+import contextlib
+import dataclasses
+import multiprocessing
+import os
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from simulator import Simulator, StopReason
+
+
+@dataclasses.dataclass
+class Partition:
+    processes: list
+    # summary of the partition sent to combine at every sync
+    report: Callable[[float], Any] = lambda t: None
+    # signal computed by combine, applied before the next interval
+    apply: Callable[[Any, float], None] = lambda signal, t: None
+    # collected by simulate() at the end
+    results: Callable[[], Any] = lambda: None
+
+
+class _Partitions:
+    """
+    Partitions of one worker
+    """
+
+    def __init__(self, make_partition: Callable[[int], Partition], indices: Sequence[int]):
+        self.partitions = {i: make_partition(i) for i in indices}
+        self.simulators = {i: Simulator(x.processes) for i, x in self.partitions.items()}
+        self.stop_reasons: Dict[int, StopReason] = {}
+
+    def advance(self, t: float, until: float, signals: Dict[int, Any]) -> Dict[int, Any]:
+        reports = {}
+        for i, partition in self.partitions.items():
+            stop_reason = self.stop_reasons.get(i)
+            if stop_reason is not None:
+                reports[i] = partition.report(stop_reason.time)
+                continue
+            if signals.get(i) is not None:
+                partition.apply(signals[i], t)
+            stop_reason = self.simulators[i].simulate(until)
+            if stop_reason is not None:
+                self.stop_reasons[i] = stop_reason
+            reports[i] = partition.report(self.simulators[i].t)
+        return reports
+
+    def results(self) -> Dict[int, Any]:
+        """
+        (Partition.results(), stop reason or None) of every partition
+        """
+        return {i: (x.results(), self.stop_reasons.get(i)) for i, x in self.partitions.items()}
+
+
+def _worker(connection, make_partition, indices, quiet: bool):
+    try:
+        with contextlib.ExitStack() as stack:
+            if quiet:
+                # launchers print every decision
+                stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+            partitions = _Partitions(make_partition, indices)
+            while True:
+                command, *args = connection.recv()
+                if command == 'advance':
+                    connection.send(('ok', partitions.advance(*args)))
+                elif command == 'results':
+                    connection.send(('ok', partitions.results()))
+                    return
+    except EOFError:
+        # the coordinator has stopped, for example because another worker failed
+        pass
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+class PartitionedSimulator:
+    """
+    Conservative synchronisation by a barrier at every sync_interval: no partition gets ahead of the others
+    by more than one interval, so signals always come from the same simulated time.
+    With sync_interval None the partitions do not interact and every worker runs to the end at once.
+    workers=0 runs the partitions in this process, the reference for the parallel runs.
+    """
+
+    def __init__(
+        self,
+        make_partition: Callable[[int], Partition],
+        partitions: int,
+        sync_interval: Optional[float] = None,
+        combine: Optional[Callable[[float, List[Any]], List[Any]]] = None,
+        workers: Optional[int] = None,
+        quiet: bool = True,
+    ):
+        assert sync_interval is None or sync_interval > 0
+        self.make_partition = make_partition
+        self.partitions = partitions
+        self.sync_interval = sync_interval
+        self.combine = combine
+        self.workers = min(partitions, os.cpu_count() if workers is None else workers)
+        self.quiet = quiet
+        self.syncs = 0
+        # of the last simulate, in partition order
+        self.stop_reasons: List[Optional[StopReason]] = []
+
+    def _assignment(self) -> List[List[int]]:
+        # round robin, neighbouring partitions are usually alike in cost
+        return [list(range(w, self.partitions, self.workers)) for w in range(self.workers)]
+
+    def simulate(self, time: float) -> List[Any]:
+        if self.workers == 0:
+            with contextlib.ExitStack() as stack:
+                if self.quiet:
+                    stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+                local = _Partitions(self.make_partition, range(self.partitions))
+                self._run(time, lambda t, until, signals: local.advance(t, until, signals))
+                results = local.results()
+            return self._results(results)
+
+        connections = []
+        processes = []
+        for indices in self._assignment():
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, args=(child, self.make_partition, indices, self.quiet),
+                                              daemon=True)
+            process.start()
+            child.close()
+            connections.append(parent)
+            processes.append(process)
+        try:
+            def advance(t: float, until: float, signals: Dict[int, Any]) -> Dict[int, Any]:
+                for connection in connections:
+                    connection.send(('advance', t, until, signals))
+                reports = {}
+                for connection in connections:
+                    reports.update(self._receive(connection))
+                return reports
+
+            self._run(time, advance)
+            for connection in connections:
+                connection.send(('results',))
+            results = {}
+            for connection in connections:
+                results.update(self._receive(connection))
+        finally:
+            for connection in connections:
+                connection.close()
+            for process in processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+        return self._results(results)
+
+    def _results(self, results: Dict[int, Any]) -> List[Any]:
+        self.stop_reasons = [results[i][1] for i in range(self.partitions)]
+        return [results[i][0] for i in range(self.partitions)]
+
+    @staticmethod
+    def _receive(connection) -> Dict[int, Any]:
+        status, payload = connection.recv()
+        if status == 'error':
+            raise RuntimeError(f'Partition worker failed:\n{payload}')
+        return payload
+
+    def _run(self, time: float, advance: Callable[[float, float, Dict[int, Any]], Dict[int, Any]]):
+        interval = self.sync_interval or time
+        t = 0.0
+        signals = {}
+        while t < time:
+            until = min(t + interval, time)
+            reports = advance(t, until, signals)
+            self.syncs += 1
+            if self.combine is not None:
+                combined = self.combine(until, [reports[i] for i in range(self.partitions)])
+                signals = dict(enumerate(combined))
+            t = until
+
+
+class ProportionalShare:
+    """
+    combine for pools sharing a cluster: total_capacity is divided in proportion to the reported demands,
+    every pool keeps at least min_share of an equal split
+    """
+
+    def __init__(self, total_capacity: float, min_share: float = 0.1):
+        self.total_capacity = total_capacity
+        self.min_share = min_share
+
+    def __call__(self, t: float, demands: List[float]) -> List[float]:
+        n = len(demands)
+        reserved = self.total_capacity * self.min_share / n
+        rest = self.total_capacity - reserved * n
+        total_demand = sum(demands)
+        if total_demand <= 0:
+            return [self.total_capacity / n] * n
+        return [reserved + rest * x / total_demand for x in demands]
+
+
+class _SharedCapacity:
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+
+    def __call__(self, t: float) -> float:
+        return self.capacity
+
+    def apply(self, capacity: float, t: float):
+        self.capacity = capacity
+
+
+def pool_partition(index: int, seed: int = 0, capacity: float = 250.0, period: float = 300.0,
+                   task_duration: float = 5000.0, logged_points: int = 100, duration: float = 30_000.0) -> Partition:
+    """
+    A pool of soft_limit_with_tasks with RelativePidLauncher2, its capacity is the signal of ProportionalShare.
+    Results are the logged records as dicts.
+    """
+    from soft_limit_with_tasks.launchers import RelativePidLauncher2
+    from soft_limit_with_tasks.resources import SoftResourceProvider
+    from soft_limit_with_tasks.task_executors import ResourceLogger, TaskExecutor, TaskExetutorQueueMaintainer
+    from task_model import Task
+
+    rng = np.random.default_rng((seed, index))
+    # pools differ in their task sizes
+    size_mean = 0.5 + rng.uniform()
+
+    def gen_task() -> Task:
+        return Task(max(0.1, rng.normal(size_mean, 0.2)), max(1.0, rng.normal(task_duration, task_duration / 10)))
+
+    capacity_fun = _SharedCapacity(capacity)
+    res_provider = SoftResourceProvider(capacity_fun)
+    executor = TaskExecutor(res_provider)
+    output_lines = []
+    processes = [
+        TaskExetutorQueueMaintainer(period, executor),
+        RelativePidLauncher2(executor, gen_task, optimistic_delta=0.05, step=5, k_i=0.1, k_d=0, period=period),
+        ResourceLogger(period=duration / logged_points, executor=executor, output_lines=output_lines),
+    ]
+    return Partition(
+        processes=processes,
+        report=executor.get_demand,
+        apply=capacity_fun.apply,
+        results=lambda: [dataclasses.asdict(x) for x in output_lines],
+    )
@@ -1,24 +1,19 @@
-import json
 import dataclasses
-from records_replica import UtilizationRecord
+try:
+    from records_replica import Record, UtilizationRecord
+except ImportError:
+    # imported as plotting.modules.metrics from pid_simulation, not from a notebook
+    from plotting.modules.records_replica import Record, UtilizationRecord
 import math
 
 
 @dataclasses.dataclass
-class AverageDiffMetric:
+class AverageDiffMetric(Record):
     average_usage_util: float
     average_demand_util: float
     sum_of_deltas: float
     demand_dev: float
 
-    @property
-    def __dict__(self):
-        return dataclasses.asdict(self)
-
-    @property
-    def json(self):
-        return json.dumps(self.__dict__)
-
     @staticmethod
     def calculate(records: list[UtilizationRecord]):
         usage_util = sum([x.usage / x.actual_limit for x in records]) / len(records)
@@ -37,19 +32,11 @@ class AverageDiffMetric:
     
     
 @dataclasses.dataclass
-class AdaptingSpeedMetric:
+class AdaptingSpeedMetric(Record):
     time_to_ascend: float
     time_to_descend: float
     sum_of_times: float
 
-    @property
-    def __dict__(self):
-        return dataclasses.asdict(self)
-
-    @property
-    def json(self):
-        return json.dumps(self.__dict__)
-
     @staticmethod
     def calculate(records: list[UtilizationRecord]):
         limit_values = list(sorted(list(set([record.actual_limit for record in records]))))
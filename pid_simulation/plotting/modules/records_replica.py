@@ -1,18 +1,22 @@
 import dataclasses
-import json
+from typing import List, Optional, Tuple
+
+# records.py and columnar_store.py are in pid_simulation, a notebook puts it on sys.path next to plotting/modules
+from records import LoggedRecord, Record
+from columnar_store import read_records
 
 
 @dataclasses.dataclass
-class UtilizationRecord:
+class UtilizationRecord(LoggedRecord):
     usage: float
     demand: float
     actual_limit: float
     time: float
+    launched: int = 0
 
-    @property
-    def __dict__(self):
-        return dataclasses.asdict(self)
 
-    @property
-    def json(self):
-        return json.dumps(self.__dict__)
\ No newline at end of file
+def read_utilization_records(path, time_range: Optional[Tuple[float, float]] = None) -> List[UtilizationRecord]:
+    """
+    Records of a scenario log: a .columns store or JSON lines, see columnar_store.read_records
+    """
+    return [UtilizationRecord(**x) for x in read_records(path, time_range=time_range).to_dict('records')]
@@ -0,0 +1,134 @@
+"""
+Per-process profiling of Simulator runs.
+
+    profiler = SimulationProfiler()
+    Simulator(processes).simulate(30_000.0, profiler=profiler)
+    print(profiler.summary())
+    profiler.to_json('profile.json')
+
+While profiling, Simulator calls do() of the processes through SimulationProfiler.call, which times it.
+The processes are not changed, and a run without a profiler costs one check per event.
+Stats are kept per position in the processes list.
+"""
+import dataclasses
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+
+
+@dataclasses.dataclass
+class ProcessStats:
+    name: str
+    process_class: str
+    calls: int = 0
+    total_sec: float = 0.0
+    # bytes allocated and not freed by do() calls, only with trace_memory
+    memory_delta: int = 0
+    durations: List[float] = dataclasses.field(default_factory=list)
+
+    def report(self, simulated_sec: float) -> Dict:
+        durations = np.array(self.durations) if self.durations else np.zeros(1)
+        return {
+            'name': self.name,
+            'process_class': self.process_class,
+            'calls': self.calls,
+            'total_sec': self.total_sec,
+            'mean_sec': self.total_sec / max(1, self.calls),
+            **{f'p{q}_sec': float(np.percentile(durations, q)) for q in PERCENTILES},
+            'events_per_simulated_sec': self.calls / simulated_sec if simulated_sec > 0 else 0.0,
+            'memory_delta': self.memory_delta,
+        }
+
+
+class SimulationProfiler:
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stats: Dict[int, ProcessStats] = {}
+        self.simulated_sec = 0.0
+        self.wall_sec = 0.0
+
+    def call(self, i: int, process, t: float):
+        """
+        process.do(t) timed, for the process at position i
+        """
+        stats = self.stats[i]
+        if self.trace_memory:
+            memory = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            process.do(t)
+        finally:
+            elapsed = time.perf_counter() - started
+            if self.trace_memory:
+                stats.memory_delta += tracemalloc.get_traced_memory()[0] - memory
+            stats.calls += 1
+            stats.total_sec += elapsed
+            stats.durations.append(elapsed)
+
+    @contextmanager
+    def profiling(self, simulator):
+        """
+        Used by Simulator.simulate, collects the stats of its processes for the duration of the block
+        """
+        processes = simulator.processes
+        t_start = simulator.t
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        for i, process in enumerate(processes):
+            if i not in self.stats:
+                self.stats[i] = ProcessStats(f'{type(process).__name__}#{i}', type(process).__name__)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.wall_sec += time.perf_counter() - started
+            self.simulated_sec += simulator.t - t_start
+            if started_tracing:
+                tracemalloc.stop()
+
+    def report(self) -> Dict:
+        processes = [stats.report(self.simulated_sec) for stats in self.stats.values()]
+        classes = {}
+        for stats in self.stats.values():
+            merged = classes.setdefault(stats.process_class, ProcessStats(stats.process_class, stats.process_class))
+            merged.calls += stats.calls
+            merged.total_sec += stats.total_sec
+            merged.memory_delta += stats.memory_delta
+            merged.durations.extend(stats.durations)
+        return {
+            'simulated_sec': self.simulated_sec,
+            'wall_sec': self.wall_sec,
+            'events': sum(stats.calls for stats in self.stats.values()),
+            'processes': processes,
+            'classes': [stats.report(self.simulated_sec) for stats in classes.values()],
+        }
+
+    def to_json(self, path):
+        with open(path, 'w') as out:
+            json.dump(self.report(), out, indent=2)
+
+    def summary(self) -> str:
+        report = self.report()
+        columns = ['calls', 'total_sec', 'mean_sec'] + [f'p{q}_sec' for q in PERCENTILES] + \
+                  ['events_per_simulated_sec']
+        if self.trace_memory:
+            columns.append('memory_delta')
+        width = max([len(row['name']) for row in report['processes']] + [8])
+        lines = [
+            f"simulated {report['simulated_sec']:.1f} s in {report['wall_sec']:.3f} s wall time, "
+            f"{report['events']} events"
+        ]
+        for title, rows in (('class', report['classes']), ('process', report['processes'])):
+            lines.append('')
+            lines.append(f"{title:<{width}} " + ' '.join(f'{column:>{max(12, len(column))}}' for column in columns))
+            for row in sorted(rows, key=lambda x: -x['total_sec']):
+                lines.append(f"{row['name']:<{width}} " +
+                             ' '.join(f'{row[column]:>{max(12, len(column))}.4g}' for column in columns))
+        return '\n'.join(lines)
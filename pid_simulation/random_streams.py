@@ -0,0 +1,144 @@
+"""
+Common random numbers for launcher comparisons.
+
+Every source of randomness draws from its own named stream (task sizes, task durations, plant noise),
+seeded from one replica seed. Launchers run with the same seed see the same i-th task and the same noise,
+however many tasks they launch, so the difference of their metrics is not blurred by the workload
+and a paired comparison needs far fewer replicas than independent runs.
+
+    def run(launcher_name, streams):
+        gen_task = StreamTaskGenerator(streams, size_mean=1, size_dev=0.5, duration_mean=10, duration_dev=1)
+        return AverageDiffMetric.calculate(test_on_constant_configurable(..., gen_task=gen_task)).sum_of_deltas
+
+    report = compare_launchers(run, ['proportional', 'pid', 'constant'], seeds=range(10))
+    print(report.table())
+"""
+import dataclasses
+import itertools
+import zlib
+from typing import Callable, Dict, Iterable, List, Sequence
+
+import numpy as np
+from scipy import stats
+
+from records import Record
+from task_model import Task
+
+
+class RandomStreams:
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.streams: Dict[str, np.random.Generator] = {}
+
+    def __getitem__(self, name: str) -> np.random.Generator:
+        """
+        Generator of the stream, it depends only on the seed and the name
+        """
+        stream = self.streams.get(name)
+        if stream is None:
+            # crc32 is stable between runs, unlike hash() of a string
+            sequence = np.random.SeedSequence(self.seed, spawn_key=(zlib.crc32(name.encode()),))
+            stream = self.streams[name] = np.random.default_rng(sequence)
+        return stream
+
+
+class StreamTaskGenerator:
+    """
+    gen_task for the scenario functions: sizes and durations are normal, cut at min_size and min_duration,
+    like gen_task in comparison_with_constant_rate.py, but drawn from their own streams
+    """
+
+    def __init__(self, streams: RandomStreams, size_mean: float, size_dev: float, duration_mean: float,
+                 duration_dev: float, min_size: float = 0.1, min_duration: float = 0.1):
+        self.sizes = streams['task_size']
+        self.durations = streams['task_duration']
+        self.size_mean = size_mean
+        self.size_dev = size_dev
+        self.duration_mean = duration_mean
+        self.duration_dev = duration_dev
+        self.min_size = min_size
+        self.min_duration = min_duration
+
+    def __call__(self) -> Task:
+        size = max(self.min_size, self.sizes.normal(self.size_mean, self.size_dev))
+        duration = max(self.min_duration, self.durations.normal(self.duration_mean, self.duration_dev))
+        return Task(size, duration)
+
+
+@dataclasses.dataclass
+class PairedDifference(Record):
+    first: str
+    second: str
+    replicas: int
+    mean: float
+    std: float
+    ci_low: float
+    ci_high: float
+    # half width of the interval the same replicas would give if the runs were independent
+    independent_half_width: float
+
+    @property
+    def half_width(self) -> float:
+        return (self.ci_high - self.ci_low) / 2
+
+    @property
+    def significant(self) -> bool:
+        return self.ci_low > 0 or self.ci_high < 0
+
+    @staticmethod
+    def calculate(first: str, second: str, a: Sequence[float], b: Sequence[float],
+                  confidence: float = 0.95) -> 'PairedDifference':
+        """
+        Confidence interval of mean(a - b) by the t distribution, a[i] and b[i] come from the same seed
+        """
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        assert len(a) == len(b) and len(a) >= 2
+        n = len(a)
+        diff = a - b
+        t = stats.t.ppf((1 + confidence) / 2, df=n - 1)
+        std = float(diff.std(ddof=1))
+        half_width = t * std / np.sqrt(n)
+        independent_half_width = t * np.sqrt((a.var(ddof=1) + b.var(ddof=1)) / n)
+        return PairedDifference(
+            first=first,
+            second=second,
+            replicas=n,
+            mean=float(diff.mean()),
+            std=std,
+            ci_low=float(diff.mean() - half_width),
+            ci_high=float(diff.mean() + half_width),
+            independent_half_width=float(independent_half_width),
+        )
+
+
+@dataclasses.dataclass
+class PairedReport:
+    metrics: Dict[str, List[float]]
+    differences: List[PairedDifference]
+
+    def table(self) -> str:
+        lines = [f"{'pair':<40} {'mean':>12} {'ci_low':>12} {'ci_high':>12} {'independent ±':>14} significant"]
+        for x in self.differences:
+            lines.append(f'{x.first + " - " + x.second:<40} {x.mean:>12.5g} {x.ci_low:>12.5g} {x.ci_high:>12.5g} '
+                         f'{x.independent_half_width:>14.5g} {x.significant}')
+        return '\n'.join(lines)
+
+
+def compare_launchers(
+    run: Callable[[str, RandomStreams], float],
+    launchers: Sequence[str],
+    seeds: Iterable[int],
+    confidence: float = 0.95,
+) -> PairedReport:
+    """
+    run(launcher, streams) runs the scenario with the launcher and returns its metric.
+    Every launcher is run with the same streams seeds, every pair of launchers is compared.
+    """
+    seeds = list(seeds)
+    metrics = {launcher: [run(launcher, RandomStreams(seed)) for seed in seeds] for launcher in launchers}
+    differences = [
+        PairedDifference.calculate(first, second, metrics[first], metrics[second], confidence)
+        for first, second in itertools.combinations(launchers, 2)
+    ]
+    return PairedReport(metrics, differences)
@@ -0,0 +1,163 @@
+"""
+Runs Simulator processes against the wall clock.
+
+A process is any object with period and do(t), the same ones Simulator runs, so a controller tested in simulation
+runs in production unchanged:
+
+    runtime = RealtimeRuntime([queue_maintainer, estimator, launcher, logger], offload=[launcher])
+    asyncio.run(runtime.run(duration=3600))     # or run_realtime(processes, duration=3600)
+
+t passed to do(t) is the number of seconds since the start (plus start_time), as in simulation.
+Every process is scheduled on its own loop at start + k * period, so the time spent in do() does not accumulate
+as drift. A step that ends after its next scheduled time is an overrun: it is reported to on_overrun and
+the missed steps are skipped. Processes in offload run do() in a thread pool (for blocking calls like YT requests),
+so they do not delay the other loops. They must not share unsynchronised state with the processes run in the loop.
+"""
+import asyncio
+import concurrent.futures
+import dataclasses
+import logging
+import math
+import time
+from typing import Callable, Iterable, List, Optional
+
+from records import Record
+
+
+@dataclasses.dataclass
+class ProcessStats(Record):
+    name: str
+    steps: int = 0
+    overruns: int = 0
+    skipped_steps: int = 0
+    max_lateness: float = 0.0
+    busy_sec: float = 0.0
+
+
+def log_overrun(process, t: float, lateness: float):
+    logging.warning(f'{type(process).__name__} overran its period {process.period} at {t=:.3f} by {lateness:.3f} s')
+
+
+class RealtimeRuntime:
+    def __init__(
+        self,
+        processes,
+        offload: Iterable = (),
+        max_workers: Optional[int] = None,
+        start_time: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+        on_overrun: Callable[[object, float, float], None] = log_overrun,
+    ):
+        self.processes = processes
+        offload = list(offload)
+        self.offloaded = {id(x) for x in offload}
+        self.max_workers = max_workers or max(1, len(offload))
+        self.start_time = start_time
+        self.clock = clock
+        self.on_overrun = on_overrun
+        self.stats: List[ProcessStats] = [ProcessStats(type(x).__name__) for x in processes]
+        self._stop_requested = False
+        self._stopped: Optional[asyncio.Event] = None
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._started = None
+
+    def now(self) -> float:
+        return self.clock() - self._started + self.start_time
+
+    def stop(self):
+        """
+        Stops the loops after their current steps, can be called from do() of a process, offloaded ones too.
+        Called before run(), makes it return without running a step.
+        """
+        self._stop_requested = True
+        event_loop = self._event_loop
+        if event_loop is None:
+            return
+        try:
+            in_event_loop = asyncio.get_running_loop() is event_loop
+        except RuntimeError:
+            in_event_loop = False
+        if in_event_loop:
+            self._stopped.set()
+        else:
+            # asyncio.Event is not thread safe
+            event_loop.call_soon_threadsafe(self._stopped.set)
+
+    async def _sleep_until(self, t: float):
+        delay = t - self.now()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._stopped.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _loop(self, process, stats: ProcessStats, executor, until: float):
+        loop = asyncio.get_running_loop()
+        # scheduled is origin + k * period, so the float errors of the additions do not accumulate as drift
+        origin, period, k = self.start_time, process.period, 0
+        scheduled = origin
+        while not self._stopped.is_set() and scheduled < until:
+            await self._sleep_until(scheduled)
+            if self._stopped.is_set():
+                break
+            started = self.clock()
+            if executor is not None:
+                await loop.run_in_executor(executor, process.do, scheduled)
+            else:
+                process.do(scheduled)
+            stats.busy_sec += self.clock() - started
+            stats.steps += 1
+
+            assert process.period > 0
+            if process.period != period:
+                # the next steps are counted from the scheduled time of the step that changed the period, not from now
+                origin, period, k = scheduled, process.period, 0
+            k += 1
+            scheduled = origin + k * period
+            lateness = self.now() - scheduled
+            if lateness > 0:
+                stats.overruns += 1
+                stats.max_lateness = max(stats.max_lateness, lateness)
+                self.on_overrun(process, scheduled, lateness)
+                skipped = math.floor(lateness / period) + 1
+                stats.skipped_steps += skipped
+                k += skipped
+                scheduled = origin + k * period
+
+    async def run(self, duration: float = math.inf):
+        """
+        Runs the processes for duration seconds, or until stop() is called.
+        An exception in do() stops all the loops and is raised.
+        """
+        self._stopped = asyncio.Event()
+        if self._stop_requested:
+            self._stopped.set()
+        self._event_loop = asyncio.get_running_loop()
+        self._started = self.clock()
+        until = self.start_time + duration
+        executor = concurrent.futures.ThreadPoolExecutor(self.max_workers) if self.offloaded else None
+        loops = [
+            asyncio.ensure_future(
+                self._loop(process, stats, executor if id(process) in self.offloaded else None, until))
+            for process, stats in zip(self.processes, self.stats)
+        ]
+        try:
+            await asyncio.gather(*loops)
+        finally:
+            self._event_loop = None
+            self._stop_requested = False
+            self._stopped.set()
+            for x in loops:
+                x.cancel()
+            await asyncio.gather(*loops, return_exceptions=True)
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+
+def run_realtime(processes, duration: float = math.inf, **params) -> List[ProcessStats]:
+    """
+    Runs RealtimeRuntime(processes, **params) in a new event loop, returns the stats of the processes
+    """
+    runtime = RealtimeRuntime(processes, **params)
+    asyncio.run(runtime.run(duration))
+    return runtime.stats
@@ -0,0 +1,34 @@
+"""
+Bases of the dataclass records: logged records, reports, stats and configs.
+"""
+import dataclasses
+import json
+
+
+class Record:
+    """
+    __dict__ of a dataclass record is the dict of its fields, for pd.DataFrame([x.__dict__ for x in records])
+    """
+
+    @property
+    def __dict__(self):
+        return dataclasses.asdict(self)
+
+    @property
+    def json(self):
+        return json.dumps(self.__dict__)
+
+    def __setstate__(self, state):
+        # copy and pickle restore the fields through __dict__, which is a copy here
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+class LoggedRecord(Record):
+    """
+    Record a logger appends to output_lines. It is never changed afterwards, so checkpoints share it
+    instead of copying the whole log.
+    """
+
+    def __deepcopy__(self, memo):
+        return self
@@ -1,26 +1,202 @@
+import copy
+import heapq
+import random
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+
 class Event:
     def __init__(self, process, scheduled_time):
         self.process = process
         self.scheduled_time = scheduled_time
 
 
+class StopReason(NamedTuple):
+    # 'steady_state', 'divergence', 'wall_time' or a reason of a custom condition
+    reason: str
+    time: float
+    detail: str = ''
+
+
+class StopSimulation(Exception):
+    """
+    Raised by do() of a process (see stop_conditions.py) to end the simulation before its horizon
+    """
+
+    def __init__(self, reason: str, detail: str = ''):
+        super().__init__(f'{reason}: {detail}' if detail else reason)
+        self.reason = reason
+        self.detail = detail
+
+
+class SimulationSnapshot(NamedTuple):
+    time: float
+    # time of the next event, the simulation has processed every event before time
+    next_event_time: float
+
+
+class LatestRecord:
+    """
+    output_lines for a logger that keep only the last record, so a logger can feed simulate_iter
+    without storing the history:
+
+        latest = LatestRecord()
+        logger = ResourceLogger(period=..., executor=executor, output_lines=latest)
+        for record in simulator.simulate_iter(30_000, 300, sample=latest.sample(logger)):
+            ...
+    """
+
+    def __init__(self):
+        self.record = None
+
+    def append(self, record):
+        self.record = record
+
+    def sample(self, logger) -> Callable[[float], Any]:
+        def sample(t: float):
+            logger.do(t)
+            return self.record
+
+        return sample
+
+
+class SimulationCheckpoint:
+    """
+    Deep copy of the processes (with everything they reference), pending events, time and RNG states.
+    Objects in shared are not copied, restored processes refer to the originals.
+    """
+
+    def __init__(self, state, shared, random_state, np_random_state):
+        self.state = state
+        self.shared = shared
+        self.random_state = random_state
+        self.np_random_state = np_random_state
+
+    def _copy_state(self):
+        memo = {id(x): x for x in self.shared}
+        return copy.deepcopy(self.state, memo)
+
+
 class Simulator:
     def __init__(self, processes):
         self.processes = processes
+        self.t = 0
+        self.events = None
+        # why the last simulate ended before its time, None if it reached it
+        self.stop_reason: Optional[StopReason] = None
+        # RNG states of a restored checkpoint, applied when the simulation continues,
+        # so forks made at once all start from the same random numbers
+        self._pending_random_state = None
+
+    def _start(self):
+        # heap of (scheduled_time, index, event): on equal times the earlier process goes first, as with min()
+        self.events = [(0, i, Event(process, 0)) for i, process in enumerate(self.processes)]
+        heapq.heapify(self.events)
+
+    def simulate(self, time, profiler=None) -> Optional[StopReason]:
+        """
+        Runs the processes until time. Can be called again with a later time to continue from where it stopped.
+        With a profiler (see profiling.py), do() calls of every process are timed.
+        A process may end the simulation earlier by raising StopSimulation, the reason is returned
+        and kept in stop_reason. simulate continues a stopped simulation after the stopping event.
+        """
+        if self.events is None:
+            self._start()
+        if self._pending_random_state is not None:
+            random.setstate(self._pending_random_state[0])
+            np.random.set_state(self._pending_random_state[1])
+            self._pending_random_state = None
+
+        self.stop_reason = None
+        try:
+            if profiler is None:
+                self._run(time)
+            else:
+                with profiler.profiling(self):
+                    self._run(time, profiler)
+        except StopSimulation as e:
+            self.stop_reason = StopReason(e.reason, self.t, e.detail)
+        return self.stop_reason
 
-    def simulate(self, time):
-        t = 0
-        events = [Event(process, 0) for process in self.processes]
+    def simulate_iter(self, until, sample_every, sample: Optional[Callable[[float], Any]] = None,
+                      profiler=None) -> Iterator[Any]:
+        """
+        Lazy simulate(until): every sample_every of simulated time yields sample(t), by default a SimulationSnapshot.
+        The simulation advances only when the next value is requested, so breaking out of the loop stops it
+        (and simulate can continue it later). It also ends when a process stops the simulation, see stop_reason.
+        sample may read the processes (executor.get_demand(t)) or be LatestRecord.sample of a logger
+        that is not among the processes.
+        """
+        assert sample_every > 0
+        t = self.t
+        while t < until:
+            t = min(t + sample_every, until)
+            if self.simulate(t, profiler) is not None:
+                return
+            if sample is not None:
+                yield sample(t)
+            else:
+                yield SimulationSnapshot(t, self.events[0][0])
 
-        while t < time:
-            next_event = min(events, key=lambda ev: ev.scheduled_time)
-            assert next_event.scheduled_time >= t
-            t = next_event.scheduled_time
-            next_event.process.do(t)
+    def _run(self, time, profiler=None):
+        events = self.events
+        t = self.t
+        try:
+            # events at time and later are left for the next call, so a simulation stopped at time
+            # (and its checkpoints) has not run anything past it
+            while events and events[0][0] < time:
+                _, i, next_event = events[0]
+                assert next_event.scheduled_time >= t
+                t = next_event.scheduled_time
+                stop = None
+                try:
+                    if profiler is None:
+                        next_event.process.do(t)
+                    else:
+                        profiler.call(i, next_event.process, t)
+                except StopSimulation as e:
+                    # the stopping event has run, a resumed simulation goes on with the next one
+                    stop = e
 
-            assert next_event.process.period > 0
-            # period may change
-            next_event.scheduled_time = t + next_event.process.period
+                assert next_event.process.period > 0
+                # period may change
+                next_event.scheduled_time = t + next_event.process.period
+                heapq.heapreplace(events, (next_event.scheduled_time, i, next_event))
+                if stop is not None:
+                    raise stop
+            t = max(t, time)
+        finally:
+            self.t = t
 
+    def checkpoint(self, shared: Iterable = ()) -> SimulationCheckpoint:
+        """
+        Snapshot of the whole simulation: executors, launchers, PID and Kalman state and RNG states.
+        Pass output lists and other objects that must not be copied in shared.
+        """
+        if self.events is None:
+            self._start()
+        shared = tuple(shared)
+        memo = {id(x): x for x in shared}
+        state = copy.deepcopy((self.processes, self.events, self.t), memo)
+        random_state = self._pending_random_state or (random.getstate(), np.random.get_state())
+        return SimulationCheckpoint(state, shared, *random_state)
 
+    def restore(self, checkpoint: SimulationCheckpoint):
+        """
+        Returns to the checkpoint, it stays valid and can be restored again
+        """
+        self.processes, self.events, self.t = checkpoint._copy_state()
+        self._pending_random_state = (checkpoint.random_state, checkpoint.np_random_state)
 
+    def fork(self, checkpoint: Optional[SimulationCheckpoint] = None) -> 'Simulator':
+        """
+        Independent simulator starting from the checkpoint (by default, from the current state).
+        Processes of the fork can be changed, for example to set other controller parameters,
+        before continuing it with simulate.
+        """
+        if checkpoint is None:
+            checkpoint = self.checkpoint()
+        simulator = Simulator([])
+        simulator.restore(checkpoint)
+        return simulator
@@ -1,7 +1,8 @@
 from soft_limit_with_tasks.task_executors import (
     TaskExetutorQueueMaintainer,
     TaskExecutor,
-    ResourceLogger
+    ResourceLogger,
+    UtilizationRecord
 )
 from task_model import Task
 from soft_limit_with_tasks.resources import SoftResourceProvider
@@ -11,14 +12,18 @@ from soft_limit_with_tasks.launchers import (
     LauncherConfig,
     NaiveLauncher,
     ConstantRateLauncher,
-    RelativeErrorPidLauncher
+    RelativeErrorPidLauncher,
+    MpcLauncher
 )
 from soft_limit_with_tasks.target_demand_estimators import ExponentialEstimator
 from simulator import Simulator
+from columnar_store import write_records
+from stop_conditions import RecordLog
 
 import pandas as pd
 import math
 import numpy as np
+from typing import Callable, List, Optional
 
 
 def test_on_stair_configurable(
@@ -33,8 +38,15 @@ def test_on_stair_configurable(
     queue_maintainer_period: float,
     simulated_duration: float,
     launcher,
-    output_file: str,
-):
+    output_file: Optional[str] = None,
+    estimator=ExponentialEstimator,
+    stop_conditions: Optional[Callable[[TaskExecutor], List]] = None,
+) -> List[UtilizationRecord]:
+    """
+    estimator is a class of target_demand_estimators, its own parameters can be bound with functools.partial.
+    stop_conditions(executor) returns processes of stop_conditions that may end the scenario early,
+    the returned RecordLog has the stop reason.
+    """
     queue_maintainer_period = queue_maintainer_period
 
     def stair_fun(t: float) -> float:
@@ -43,7 +55,7 @@ def test_on_stair_configurable(
     res_provider = SoftResourceProvider(stair_fun)
     task_executor = TaskExecutor(res_provider)
     task_queue_maintainer = TaskExetutorQueueMaintainer(queue_maintainer_period, task_executor)
-    demand_estimator = ExponentialEstimator(
+    demand_estimator = estimator(
         margin=estimator_margin,
         min_optimistic_shift=min_optimistic_shift,
         res_provider=res_provider,
@@ -59,37 +71,45 @@ def test_on_stair_configurable(
     )
     task_launcher = launcher(launcher_config)
 
-    output_lines = []
+    output_lines = RecordLog()
     logger = ResourceLogger(period=simulated_duration / logged_points, executor=task_executor,
                             output_lines=output_lines)
 
     processes = [task_queue_maintainer, demand_estimator, task_launcher, logger]
+    if stop_conditions is not None:
+        processes += stop_conditions(task_executor)
     simulator = Simulator(processes)
-    simulator.simulate(simulated_duration)
+    output_lines.stop_reason = simulator.simulate(simulated_duration)
 
     # ====--------plotting--------------
-    data = pd.DataFrame([line.__dict__ for line in output_lines])
-    data.to_json(path_or_buf=output_file, orient='records', lines=True)
+    if output_file is not None:
+        write_records(output_lines, output_file)
+    return output_lines
 
 
-def test_on_stair(get_launcher, output_file: str):
-    def gen_normal_task() -> Task:
-        return Task(max(0.2, np.random.normal(1, 0)), max(0.2, np.random.normal(5000, 0)))
+def gen_stair_task() -> Task:
+    return Task(max(0.2, np.random.normal(1, 0)), max(0.2, np.random.normal(5000, 0)))
 
-    test_on_stair_configurable(gen_task=gen_normal_task, stair_start=10_000.0, stair_end=20_000.0, stair_low=200.0,
-                               stair_high=300.0, estimator_margin=0.1, min_optimistic_shift=1.5, logged_points=1000,
-                               simulated_duration=30_000.0, queue_maintainer_period=5 * 60,
-                               launcher=get_launcher, output_file=output_file)
 
+def gen_constant_task() -> Task:
+    return Task(max(0.2, np.random.normal(1, 0.0)), max(1, np.random.normal(500, 0)))
 
-def test_on_constant(get_launcher, output_file: str):
-    def gen_normal_task() -> Task:
-        return Task(max(0.2, np.random.normal(1, 0.0)), max(1, np.random.normal(500, 0)))
 
-    test_on_stair_configurable(gen_task=gen_normal_task, stair_start=0.0, stair_end=5000.0 * 100, stair_low=2.0,
-                               stair_high=2.0, estimator_margin=0.1, min_optimistic_shift=1.5, logged_points=1000,
-                               simulated_duration=5000.0 * 2.2, queue_maintainer_period=5 * 60,
-                               launcher=get_launcher, output_file=output_file)
+# parameters of test_on_stair_configurable used by test_on_stair and test_on_constant
+STAIR_SCENARIO = dict(gen_task=gen_stair_task, stair_start=10_000.0, stair_end=20_000.0, stair_low=200.0,
+                      stair_high=300.0, estimator_margin=0.1, min_optimistic_shift=1.5, logged_points=1000,
+                      simulated_duration=30_000.0, queue_maintainer_period=5 * 60)
+CONSTANT_SCENARIO = dict(gen_task=gen_constant_task, stair_start=0.0, stair_end=5000.0 * 100, stair_low=2.0,
+                         stair_high=2.0, estimator_margin=0.1, min_optimistic_shift=1.5, logged_points=1000,
+                         simulated_duration=5000.0 * 2.2, queue_maintainer_period=5 * 60)
+
+
+def test_on_stair(get_launcher, output_file: Optional[str] = None) -> List[UtilizationRecord]:
+    return test_on_stair_configurable(**STAIR_SCENARIO, launcher=get_launcher, output_file=output_file)
+
+
+def test_on_constant(get_launcher, output_file: Optional[str] = None) -> List[UtilizationRecord]:
+    return test_on_stair_configurable(**CONSTANT_SCENARIO, launcher=get_launcher, output_file=output_file)
 
 
 def pid_launcher(config: LauncherConfig, k_p, k_i, k_d) -> PidLauncher:
@@ -144,6 +164,17 @@ def relative_pid_launcher(config: LauncherConfig, k_p, k_i, k_d) -> RelativeErro
     )
 
 
+def mpc_launcher(config: LauncherConfig, optimistic_delta, step, size_mean, duration_mean, duration_dev,
+                 **params) -> MpcLauncher:
+    return MpcLauncher(
+        executor=config.executor,
+        gen_task=config.gen_task,
+        period=config.period,
+        optimistic_delta=optimistic_delta, step=step, size_mean=size_mean, duration_mean=duration_mean,
+        duration_dev=duration_dev, **params
+    )
+
+
 if __name__ == '__main__':
     # def gen_task() -> Task:
     #     return Task(1, 1)
@@ -198,3 +229,8 @@ if __name__ == '__main__':
     # ----------------- relative error pid launcher -----------------
 
     test_on_stair(lambda config: relative_pid_launcher(config, k_p=0.5, k_i=0.0001, k_d=0), 'logs/pid_stair.json')
+
+    # ----------------- model predictive launcher -----------------
+
+    # test_on_stair(lambda config: mpc_launcher(config, optimistic_delta=0.1, step=10, size_mean=1,
+    #                                           duration_mean=5000, duration_dev=0), 'logs/mpc_stair.json')
@@ -0,0 +1,110 @@
+import math
+
+
+class CusumDetector:
+    """
+    Two-sided CUSUM of a signal against its mean since the last change.
+    Deviations smaller than drift are ignored, a change is reported when the accumulated deviation
+    exceeds threshold. Both are relative to the mean, so the same parameters fit any usage scale.
+    """
+
+    def __init__(self, threshold: float, drift: float, min_samples: int = 2):
+        self.threshold = threshold
+        self.drift = drift
+        self.min_samples = min_samples
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.positive_sum = 0.0
+        self.negative_sum = 0.0
+
+    def update(self, x: float) -> int:
+        """
+        Adds a sample, returns 1 if an increase of the mean is detected, -1 for a decrease and 0 otherwise.
+        After a change the detector is reset, the sample becomes the first one of the new regime.
+        """
+        if self.count >= self.min_samples:
+            scale = max(abs(self.mean), 1e-9)
+            deviation = (x - self.mean) / scale
+            self.positive_sum = max(0.0, self.positive_sum + deviation - self.drift)
+            self.negative_sum = max(0.0, self.negative_sum - deviation - self.drift)
+            if self.positive_sum > self.threshold or self.negative_sum > self.threshold:
+                direction = 1 if self.positive_sum > self.threshold else -1
+                self.reset()
+                self._add(x)
+                return direction
+        self._add(x)
+        return 0
+
+    def _add(self, x: float):
+        self.count += 1
+        self.mean += (x - self.mean) / self.count
+
+
+class PageHinkleyDetector:
+    """
+    Two-sided Page-Hinkley test: the cumulative deviation from the running mean compared with its extremes.
+    delta is the tolerated deviation and threshold the alarm level, both relative to the mean.
+    """
+
+    def __init__(self, threshold: float, delta: float, min_samples: int = 2):
+        self.threshold = threshold
+        self.delta = delta
+        self.min_samples = min_samples
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        # cumulative sums for an increase and a decrease of the mean and their extremes
+        self.up = 0.0
+        self.up_min = 0.0
+        self.down = 0.0
+        self.down_max = 0.0
+
+    def update(self, x: float) -> int:
+        """
+        Adds a sample, returns 1 if an increase of the mean is detected, -1 for a decrease and 0 otherwise.
+        After a change the detector is reset, the sample becomes the first one of the new regime.
+        """
+        self.count += 1
+        self.mean += (x - self.mean) / self.count
+        if self.count <= self.min_samples:
+            return 0
+
+        scale = max(abs(self.mean), 1e-9)
+        deviation = (x - self.mean) / scale
+        self.up += deviation - self.delta
+        self.up_min = min(self.up_min, self.up)
+        self.down += deviation + self.delta
+        self.down_max = max(self.down_max, self.down)
+        if self.up - self.up_min > self.threshold or self.down_max - self.down > self.threshold:
+            direction = 1 if self.up - self.up_min > self.threshold else -1
+            self.reset()
+            self.count = 1
+            self.mean = x
+            return direction
+        return 0
+
+
+def detect_change(detector, x: float) -> int:
+    """
+    For the launchers: direction of a change of x by an optional detector, 0 without a detector
+    """
+    if detector is None or math.isnan(x):
+        return 0
+    return detector.update(x)
+
+
+def reset_stale_sum(sum_e: float, direction: int) -> float:
+    """
+    Integral of a launcher after a change of usage: the part pushing against the new usage is stale.
+    When usage grows, a negative sum (launch less) is dropped, when it falls, a positive one.
+    """
+    if direction > 0:
+        return max(0.0, sum_e)
+    if direction < 0:
+        return min(0.0, sum_e)
+    return sum_e
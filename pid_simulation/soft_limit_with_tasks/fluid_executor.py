@@ -0,0 +1,208 @@
+"""
+Fluid (mean-field) model of TaskExecutor: instead of task objects it keeps the amount of resource
+held by running tasks of each age, so its cost does not depend on the number of tasks.
+
+Ages are discretised into bins of bin_width seconds. Every bin_width seconds a running bin loses
+the fraction of work that finishes at this age according to the duration distribution
+(the hazard of its survival function) and moves to the next age.
+Like Barrel in kalman_experiments, the queue evolves as d' = v - l, here with l given by the kernel.
+"""
+import dataclasses
+import math
+from typing import Callable, List
+
+import numpy as np
+
+from soft_limit_with_tasks.resources import SoftResourceProvider
+from soft_limit_with_tasks.task_executors import (
+    ResourceLogger,
+    TaskExecutor,
+    TaskExetutorQueueMaintainer,
+    UtilizationRecord,
+)
+from simulator import Simulator
+from task_model import Task
+
+EPS = 1e-9
+
+
+def survival_from_samples(durations: np.ndarray, bin_width: float) -> np.ndarray:
+    """
+    S[k] = P(duration > k * bin_width), the last value is 0
+    """
+    durations = np.sort(np.asarray(durations, dtype=np.float64))
+    bins = int(math.ceil(durations[-1] / bin_width)) + 1
+    ages = np.arange(bins + 1) * bin_width
+    return 1.0 - np.searchsorted(durations, ages, side='right') / len(durations)
+
+
+def survival_from_cdf(cdf: Callable[[np.ndarray], np.ndarray], bin_width: float, max_duration: float) -> np.ndarray:
+    ages = np.arange(int(math.ceil(max_duration / bin_width)) + 2) * bin_width
+    survival = 1.0 - np.clip(cdf(ages), 0.0, 1.0)
+    survival[-1] = 0.0
+    return survival
+
+
+class FluidTaskExecutor:
+    """
+    Same interface as TaskExecutor (launch, get_usage, get_demand and the queue maintenance methods).
+    Running and paused work is kept per age bin, pending work is a single number.
+    Paused work keeps its age, so it continues with the remaining duration, like paused tasks do.
+    """
+
+    def __init__(self, res_provider: SoftResourceProvider, survival: np.ndarray, bin_width: float):
+        self.res_provider = res_provider
+        self.bin_width = bin_width
+
+        survival = np.asarray(survival, dtype=np.float64)
+        # fraction of work that is still running after one more bin, nothing survives the last age
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.keep = np.where(survival[:-1] > 0, survival[1:] / survival[:-1], 0.0)
+        self.keep[-1] = 0.0
+        ages = len(self.keep)
+
+        self.running = np.zeros(ages)
+        self._paused = np.zeros(ages)
+        self.pending = 0.0
+        self.usage = 0.0
+        self.paused_total = 0.0
+        self.t = 0.0
+        self.finished = 0.0
+        self.launched = 0
+
+    @property
+    def paused(self) -> List[float]:
+        # for TaskExetutorQueueMaintainer, which only checks if anything is paused
+        return [self.paused_total] if self.paused_total > EPS else []
+
+    def _advance(self, t: float):
+        steps = int((t - self.t) / self.bin_width)
+        if steps <= 0:
+            return
+        for _ in range(min(steps, len(self.running))):
+            survived = self.running * self.keep
+            self.running[1:] = survived[:-1]
+            self.running[0] = 0.0
+        if steps >= len(self.running):
+            self.running[:] = 0.0
+        self.t += steps * self.bin_width
+        usage = float(self.running.sum())
+        self.finished += self.usage - usage
+        self._set_usage(usage)
+
+    def _set_usage(self, usage: float):
+        self.usage = max(0.0, usage)
+        self.res_provider.usage = self.usage
+
+    def launch(self, task: Task, t: float):
+        self.launched += 1
+        self.pending += task.size
+        self.clear_finished(t)
+        self.try_launch_paused(t)
+        if self.paused_total <= EPS:
+            self.try_launch_pending(t)
+
+    def launch_batch(self, tasks: List[Task], t: float):
+        self.launched += len(tasks)
+        self.pending += sum(task.size for task in tasks)
+        self.clear_finished(t)
+        self.try_launch_paused(t)
+        if self.paused_total <= EPS:
+            self.try_launch_pending(t)
+
+    def clear_finished(self, t: float):
+        self._advance(t)
+
+    def pause_if_necessary(self, t: float):
+        excess = self.usage - self.res_provider.capacity_fun(t)
+        if excess <= EPS:
+            return
+        # the oldest work is paused first, as TaskExecutor pauses the earliest started tasks
+        from_oldest = np.cumsum(self.running[::-1])
+        paused = np.minimum(self.running[::-1], np.maximum(0.0, excess - (from_oldest - self.running[::-1])))[::-1]
+        self.running -= paused
+        self._paused += paused
+        self.paused_total += float(paused.sum())
+        self._set_usage(self.usage - float(paused.sum()))
+
+    def try_launch_paused(self, t: float):
+        if self.paused_total <= EPS:
+            return
+        free = self.res_provider.capacity_fun(t) - self.usage
+        if free <= EPS:
+            return
+        fraction = min(1.0, free / self.paused_total)
+        resumed = self._paused * fraction
+        self.running += resumed
+        self._paused -= resumed
+        self.paused_total = float(self._paused.sum())
+        self._set_usage(self.usage + float(resumed.sum()))
+
+    def try_launch_pending(self, t: float):
+        if self.pending <= EPS:
+            return
+        free = self.res_provider.capacity_fun(t) - self.usage
+        if free <= EPS:
+            return
+        started = min(free, self.pending)
+        self.pending -= started
+        self.running[0] += started
+        self._set_usage(self.usage + started)
+
+    def get_demand(self, t: float):
+        self.clear_finished(t)
+        return self.usage + self.paused_total + self.pending
+
+    def get_usage(self, t: float):
+        self.clear_finished(t)
+        return self.usage
+
+
+@dataclasses.dataclass
+class FluidValidationReport:
+    usage_mae: float
+    demand_mae: float
+    usage_max_error: float
+    demand_max_error: float
+    discrete: List[UtilizationRecord]
+    fluid: List[UtilizationRecord]
+
+    @staticmethod
+    def calculate(discrete: List[UtilizationRecord], fluid: List[UtilizationRecord]) -> 'FluidValidationReport':
+        usage_errors = [abs(d.usage - f.usage) / max(d.actual_limit, EPS) for d, f in zip(discrete, fluid)]
+        demand_errors = [abs(d.demand - f.demand) / max(d.actual_limit, EPS) for d, f in zip(discrete, fluid)]
+        return FluidValidationReport(
+            usage_mae=float(np.mean(usage_errors)),
+            demand_mae=float(np.mean(demand_errors)),
+            usage_max_error=float(np.max(usage_errors)),
+            demand_max_error=float(np.max(demand_errors)),
+            discrete=discrete,
+            fluid=fluid,
+        )
+
+
+def validate_fluid_executor(
+    make_launcher: Callable[[TaskExecutor], object],
+    capacity_fun: Callable[[float], float],
+    survival: np.ndarray,
+    bin_width: float,
+    queue_maintainer_period: float,
+    simulated_duration: float,
+    logged_points: int,
+) -> FluidValidationReport:
+    """
+    Runs the same launcher against TaskExecutor and FluidTaskExecutor.
+    Errors are relative to the capacity at the logged time.
+    """
+    output = []
+    for make_executor in (TaskExecutor, lambda res_provider: FluidTaskExecutor(res_provider, survival, bin_width)):
+        executor = make_executor(SoftResourceProvider(capacity_fun))
+        output_lines = []
+        processes = [
+            TaskExetutorQueueMaintainer(queue_maintainer_period, executor),
+            make_launcher(executor),
+            ResourceLogger(period=simulated_duration / logged_points, executor=executor, output_lines=output_lines),
+        ]
+        Simulator(processes).simulate(simulated_duration)
+        output.append(output_lines)
+    return FluidValidationReport.calculate(*output)
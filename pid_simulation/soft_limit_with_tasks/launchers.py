@@ -4,9 +4,11 @@ from typing import Any
 from filterpy.kalman import KalmanFilter
 import numpy as np
 
+from soft_limit_with_tasks.change_detectors import detect_change, reset_stale_sum
 from soft_limit_with_tasks.resources import SoftResourceProvider
 from soft_limit_with_tasks.task_executors import TaskExecutor
 from soft_limit_with_tasks.target_demand_estimators import ExponentialEstimator
+from stop_conditions import check_slots
 
 
 @dataclasses.dataclass
@@ -62,7 +64,8 @@ class PidLauncher:
             k_p: float,
             k_i: float,
             k_d: float,
-            period: float
+            period: float,
+            change_detector=None
     ):
         self.res_provider = res_provider
         self.executor = executor
@@ -76,6 +79,8 @@ class PidLauncher:
 
         self.e_prev = 0
         self.sum_e_prev = 0
+        # detector of change_detectors on usage, the integral is reset when capacity changes
+        self.change_detector = change_detector
 
     def _pid(self, e: float) -> float:
         return self.k_p * e \
@@ -85,6 +90,10 @@ class PidLauncher:
     def do(self, t):
         demand = self.executor.get_demand(t)
         target_demand = self.demand_estimator.get_target_demand(t)
+        direction = detect_change(self.change_detector, self.executor.get_usage(t))
+        if direction:
+            self.sum_e_prev = reset_stale_sum(self.sum_e_prev, direction)
+            print(f'usage changed, sum = {self.sum_e_prev}')
 
         e = target_demand - demand
         u = self._pid(e)
@@ -100,7 +109,7 @@ class PidLauncher:
         slots = math.floor(max(0.0, self.period * u))
         # slots = math.floor(max(0.0, u))
         print(f'slots={slots}')
-        assert slots < 1000
+        check_slots(slots)
         for i in range(slots):
             task = self.gen_task()
             self.executor.launch(task, t)
@@ -158,7 +167,7 @@ class RelativeErrorPidLauncher:
         slots = math.floor(max(0.0, self.period * u))
         # slots = math.floor(max(0.0, u))
         print(f'slots={slots}')
-        assert slots < 1000
+        check_slots(slots)
         for i in range(slots):
             task = self.gen_task()
             self.executor.launch(task, t)
@@ -232,7 +241,7 @@ class ProportionalLauncher:
     def do(self, t):
         slots = self.get_slots(t)
         print(f'slots={slots}')
-        assert slots < 1000
+        check_slots(slots)
         for i in range(slots):
             task = self.gen_task()
             self.executor.launch(task, t)
@@ -255,7 +264,8 @@ class RelativePidLauncher2:
             step: float,
             k_i: float,
             k_d: float,
-            period: float
+            period: float,
+            change_detector=None
     ):
         self.executor = executor
         self.gen_task = gen_task
@@ -268,6 +278,8 @@ class RelativePidLauncher2:
 
         self.e_prev = 0
         self.sum_e_prev = 0
+        # detector of change_detectors on usage, the integral is reset when capacity changes
+        self.change_detector = change_detector
 
     def _p(self, demand: float, usage: float) -> float:
         x = demand / usage
@@ -282,6 +294,10 @@ class RelativePidLauncher2:
     def _get_slots(self, t) -> int:
         demand = self.executor.get_demand(t)
         usage = self.executor.get_usage(t)
+        direction = detect_change(self.change_detector, usage)
+        if direction:
+            self.sum_e_prev = reset_stale_sum(self.sum_e_prev, direction)
+            print(f'usage changed, sum = {self.sum_e_prev}')
         if usage == 0:
             return 0 if demand > 0 else round(self.step)
 
@@ -301,7 +317,7 @@ class RelativePidLauncher2:
     def do(self, t):
         slots = self._get_slots(t)
         print(f'slots={slots}')
-        assert slots < 1000
+        check_slots(slots)
         for i in range(slots):
             task = self.gen_task()
             self.executor.launch(task, t)
@@ -316,7 +332,9 @@ class KalmanLauncher:
             s_dev: float,
             l_dev: float,
             v_underutil: float,
-            period: float
+            period: float,
+            change_detector=None,
+            covariance_inflation: float = 100
     ):
         self.executor = executor
         self.gen_task = gen_task
@@ -340,6 +358,10 @@ class KalmanLauncher:
                              [0., 0., self.s_dev ** 2]])
         self.s_mean = s_mean
         self.v = 1
+        # detector of change_detectors on usage, covariance_inflation is added to the state covariance
+        # when capacity changes, so the filter trusts the new measurements
+        self.change_detector = change_detector
+        self.covariance_inflation = covariance_inflation
 
     def _get_slots(self, t) -> int:
         print(f'===========get slots start, {t=}===========')
@@ -347,7 +369,11 @@ class KalmanLauncher:
                              [0., 1., 0.],
                              [-self.period, self.s_mean * self.period, 1.]])
         self.f.B = np.array([0, 1, self.s_mean * self.period])
-        d = (self.executor.get_demand(t) - self.executor.get_usage(t)) * self.s_mean
+        usage = self.executor.get_usage(t)
+        if detect_change(self.change_detector, usage):
+            self.f.P = self.f.P + np.eye(3) * self.covariance_inflation
+            print(f'usage changed, inflated covariance = {self.f.P}')
+        d = (self.executor.get_demand(t) - usage) * self.s_mean
         print(f'{d=}')
         z = np.array([self.v, d])
         print(f'{z=}')
@@ -364,8 +390,133 @@ class KalmanLauncher:
     def do(self, t):
         slots = self._get_slots(t)
         print(f'slots={slots}')
-        assert slots < 1000
+        check_slots(slots)
         for i in range(slots):
             task = self.gen_task()
             # assert task.size == 1
             self.executor.launch(task, t)
+
+
+class MpcLauncher:
+    """
+    Model predictive control: every period the launches of the next horizon periods are planned so that the
+    predicted demand stays at (1 + optimistic_delta) * usage, but at least step tasks over usage,
+    and the first of them is applied.
+
+    Demand is predicted by a fluid model. Work started k periods ago is still running with probability
+    P(duration > k * period), the durations are normal(duration_mean, duration_dev). The started work is estimated
+    every period as the usage not explained by the earlier starts, demand decreases by the predicted completions.
+    Launches u >= 0 minimise
+        |A u - (target - predicted demand)|^2 + move_penalty * |u|^2,
+    the prediction matrices and the inverse Hessian are built once. If the unconstrained optimum has negative
+    launches, projected gradient iterations start from the shifted previous plan.
+    """
+
+    def __init__(
+            self,
+            executor: TaskExecutor,
+            gen_task,
+            optimistic_delta: float,
+            step: float,
+            size_mean: float,
+            duration_mean: float,
+            duration_dev: float,
+            period: float,
+            horizon: int = 20,
+            move_penalty: float = 0.01,
+            max_slots: int = 999,
+            max_iterations: int = 100,
+            tolerance: float = 1e-2
+    ):
+        self.executor = executor
+        self.gen_task = gen_task
+        self.period = period
+
+        self.optimistic_delta = optimistic_delta
+        self.step = step
+        self.size_mean = size_mean
+        self.duration_mean = duration_mean
+        self.horizon = horizon
+        self.max_slots = max_slots
+        self.max_launch = max_slots * size_mean
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+
+        # launches older than history_length periods have finished
+        history_length = math.ceil((duration_mean + 4 * duration_dev) / period) + 1
+        survival = np.array([self._survival(lag * period, duration_mean, duration_dev)
+                             for lag in range(history_length + horizon + 1)])
+        # a[j, i]: part of the work launched at the start of period i still present after period j
+        lags = np.arange(1, horizon + 1)[:, None] - np.arange(horizon)[None, :]
+        self.a = np.where(lags > 0, survival[np.clip(lags, 0, None)], 0.0)
+        # history_survival[j, k]: part of the work started k periods ago still running after j more periods
+        self.history_survival = survival[np.arange(horizon + 1)[:, None] + np.arange(history_length)[None, :]]
+        self.started = np.zeros(history_length)
+
+        self.hessian = self.a.T @ self.a + move_penalty * np.eye(horizon)
+        self.inverse_hessian = np.linalg.inv(self.hessian)
+        self.step_size = 1 / np.linalg.eigvalsh(self.hessian)[-1]
+        self.plan = np.zeros(horizon)
+        # planned work not launched because of rounding to whole tasks
+        self.carry = 0.0
+
+    @staticmethod
+    def _survival(elapsed: float, mean: float, dev: float) -> float:
+        if dev <= 0:
+            return float(elapsed < mean)
+        return 0.5 * math.erfc((elapsed - mean) / (dev * math.sqrt(2)))
+
+    def _update_started(self, usage: float):
+        still_running = self.history_survival[1] @ self.started
+        self.started = np.roll(self.started, 1)
+        self.started[0] = max(0.0, usage - still_running)
+
+    def _predicted_demand(self, demand: float, usage: float) -> np.ndarray:
+        running = self.history_survival @ self.started
+        if running[0] <= 0:
+            return np.full(self.horizon, demand)
+        completed = usage * (1 - running[1:] / running[0])
+        return demand - completed
+
+    def _solve(self, reference: np.ndarray) -> np.ndarray:
+        linear = self.a.T @ reference
+        unconstrained = self.inverse_hessian @ linear
+        if unconstrained.min() >= 0 and unconstrained.max() <= self.max_launch:
+            return unconstrained
+
+        # projected accelerated gradient on the box 0 <= u <= max_launch
+        u = np.append(self.plan[1:], self.plan[-1])
+        y = u
+        momentum = 1.0
+        for _ in range(self.max_iterations):
+            u_next = np.clip(y - self.step_size * (self.hessian @ y - linear), 0.0, self.max_launch)
+            if np.abs(u_next - u).max() < self.tolerance:
+                u = u_next
+                break
+            momentum_next = (1 + math.sqrt(1 + 4 * momentum ** 2)) / 2
+            y = u_next + (momentum - 1) / momentum_next * (u_next - u)
+            u, momentum = u_next, momentum_next
+        return u
+
+    def _get_slots(self, t) -> int:
+        demand = self.executor.get_demand(t)
+        usage = self.executor.get_usage(t)
+        self._update_started(usage)
+        if usage == 0:
+            return 0 if demand > 0 else round(self.step)
+
+        target = max((1 + self.optimistic_delta) * usage, usage + self.step * self.size_mean)
+        self.plan = self._solve(target - self._predicted_demand(demand, usage))
+        work = self.plan[0] + self.carry
+        # the carry may take the work over max_slots, the rest is launched in the next periods
+        slots = min(round(work / self.size_mean), self.max_slots)
+        self.carry = work - slots * self.size_mean if self.plan[0] > 0 else 0.0
+        return slots
+
+    def do(self, t):
+        slots = self._get_slots(t)
+        print(f'slots={slots}')
+        check_slots(slots)
+        for i in range(slots):
+            task = self.gen_task()
+            self.executor.launch(task, t)
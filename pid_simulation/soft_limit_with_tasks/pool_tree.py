@@ -0,0 +1,230 @@
+"""
+Hierarchical fair-share model of a YT pool tree.
+
+Capacity of the cluster is split among pools recursively. Each pool first gets its guarantee
+(but not more than its demand), the rest is split among children by weights, water-filling:
+a child never gets more than its demand, and what it does not need goes to the others.
+
+Fair shares are recomputed lazily and incrementally. A demand change bumps the version of the pool
+and of its ancestors, and a subtree is distributed again only if its version or its allotted share changed,
+so a tick with a few changed demands costs O(depth * siblings) instead of the whole tree.
+
+Every leaf pool is a resource provider for its own TaskExecutor, with the pool fair share as capacity.
+"""
+import dataclasses
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from records import LoggedRecord
+from soft_limit_with_tasks.task_executors import TaskExecutor, TaskExetutorQueueMaintainer
+
+EPS = 1e-9
+
+
+class Pool:
+    def __init__(self, name: str, weight: float = 1.0, guarantee: float = 0.0, children: Iterable['Pool'] = ()):
+        assert weight > 0
+        self.name = name
+        self.weight = weight
+        self.guarantee = guarantee
+        self.children: List[Pool] = list(children)
+        self.parent: Optional[Pool] = None
+        for child in self.children:
+            child.parent = self
+
+        # demand and usage of the subtree
+        self.demand = 0.0
+        self.usage = 0.0
+        self.fair_share = 0.0
+
+        # the subtree is distributed again only if (allotted share, version) differs from the memo
+        self.version = 0
+        self._memo = None
+
+    def is_leaf(self) -> bool:
+        return not self.children
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+def water_fill(pools: List[Pool], allotted: float) -> List[float]:
+    """
+    Shares of sibling pools in allotted capacity: guarantees first, then the rest by weights,
+    no pool gets more than its demand
+    """
+    base = [min(pool.guarantee, pool.demand) for pool in pools]
+    guaranteed = sum(base)
+    if guaranteed >= allotted:
+        # guarantees are not satisfiable, they are cut proportionally
+        scale = allotted / guaranteed if guaranteed > 0 else 0.0
+        return [x * scale for x in base]
+
+    shares = list(base)
+    left = allotted - guaranteed
+    hungry = [i for i, pool in enumerate(pools) if pool.demand - base[i] > EPS]
+    # the pool with the smallest need per weight is satisfied first, the last ones share the rest
+    hungry.sort(key=lambda i: (pools[i].demand - base[i]) / pools[i].weight)
+    total_weight = sum(pools[i].weight for i in hungry)
+    for i in hungry:
+        pool = pools[i]
+        given = min(pool.demand - base[i], left * pool.weight / total_weight)
+        shares[i] += given
+        left -= given
+        total_weight -= pool.weight
+    return shares
+
+
+class PoolTree:
+    def __init__(self, capacity_fun: Callable[[float], float], root: Pool):
+        self.capacity_fun = capacity_fun
+        self.root = root
+        self.pools: Dict[str, Pool] = {}
+        for pool in root.walk():
+            assert pool.name not in self.pools, f'Duplicate pool {pool.name}'
+            self.pools[pool.name] = pool
+
+        self.recomputed_pools = 0
+
+    def leaves(self) -> List[Pool]:
+        return [pool for pool in self.pools.values() if pool.is_leaf()]
+
+    def set_demand(self, name: str, demand: float):
+        pool = self.pools[name]
+        assert pool.is_leaf()
+        delta = demand - pool.demand
+        if abs(delta) <= EPS:
+            return
+        while pool is not None:
+            pool.demand += delta
+            pool.version += 1
+            pool = pool.parent
+
+    def add_usage(self, name: str, delta: float):
+        pool = self.pools[name]
+        while pool is not None:
+            pool.usage = max(0.0, pool.usage + delta)
+            pool = pool.parent
+
+    def fair_share(self, name: str, t: float) -> float:
+        self._distribute(self.root, self.capacity_fun(t))
+        return self.pools[name].fair_share
+
+    def _distribute(self, pool: Pool, allotted: float):
+        if pool._memo == (allotted, pool.version):
+            return
+        pool.fair_share = allotted
+        pool._memo = (allotted, pool.version)
+        self.recomputed_pools += 1
+        if pool.children:
+            for child, share in zip(pool.children, water_fill(pool.children, allotted)):
+                self._distribute(child, share)
+
+    def orchid(self, name: str, t: float) -> Dict[str, Dict[str, float]]:
+        """
+        Pool state in the shape of the scheduler orchid node read by ResourceQuotaManager.
+        The tree has one resource, so it is reported as both cpu and user_memory.
+        """
+        pool = self.pools[name]
+        fair_share = self.fair_share(name, t)
+        return {
+            'resource_usage': {'cpu': pool.usage, 'user_memory': pool.usage},
+            'resource_demand': {'cpu': pool.demand, 'user_memory': pool.demand},
+            'fair_share': {'cpu': fair_share, 'user_memory': fair_share},
+        }
+
+
+# SoftResourceProvider of a leaf pool, capacity is the pool fair share
+class PoolResourceProvider:
+    def __init__(self, tree: PoolTree, name: str):
+        assert tree.pools[name].is_leaf()
+        self.tree = tree
+        self.name = name
+        self.usage = 0
+
+    def capacity_fun(self, t):
+        return self.tree.fair_share(self.name, t)
+
+    def try_alloc(self, t, x) -> bool:
+        if self.usage + x <= self.capacity_fun(t):
+            self.usage += x
+            self.tree.add_usage(self.name, x)
+            return True
+        else:
+            return False
+
+    def free(self, t, x):
+        assert x > 0
+        freed = min(self.usage, x)
+        self.usage -= freed
+        self.tree.add_usage(self.name, -freed)
+
+    def limit_exceeded(self, t) -> bool:
+        return self.usage > self.capacity_fun(t)
+
+
+class PoolTreeDemandUpdater:
+    """
+    Reports executor demands to the tree each period, like the scheduler updates pool demands
+    between fair share updates. executors maps leaf pool names to their executors.
+    """
+
+    def __init__(self, period: float, tree: PoolTree, executors):
+        self.period = period
+        self.tree = tree
+        self.executors = executors
+
+    def do(self, t):
+        for name, executor in self.executors.items():
+            self.tree.set_demand(name, executor.get_demand(t))
+
+
+class PoolTreeLogger:
+    def __init__(self, period: float, tree: PoolTree, names: Iterable[str], output_lines):
+        self.period = period
+        self.tree = tree
+        self.names = list(names)
+        self.output_lines = output_lines
+
+    def do(self, t):
+        for name in self.names:
+            pool = self.tree.pools[name]
+            self.output_lines.append(PoolRecord(
+                pool=name,
+                usage=pool.usage,
+                demand=pool.demand,
+                fair_share=self.tree.fair_share(name, t),
+                time=t
+            ))
+
+
+@dataclasses.dataclass
+class PoolRecord(LoggedRecord):
+    pool: str
+    usage: float
+    demand: float
+    fair_share: float
+    time: float
+
+
+def pool_tree_processes(
+    tree: PoolTree,
+    make_launcher: Callable[[TaskExecutor], object],
+    queue_maintainer_period: float,
+    demand_update_period: float,
+) -> Tuple[Dict[str, TaskExecutor], List[object]]:
+    """
+    TaskExecutor with its own launcher and queue maintainer for every leaf pool,
+    plus the process reporting their demands to the tree.
+    Returns the executors by pool name and the processes for Simulator.
+    """
+    executors = {}
+    processes = []
+    for pool in tree.leaves():
+        executor = TaskExecutor(PoolResourceProvider(tree, pool.name))
+        executors[pool.name] = executor
+        processes.append(TaskExetutorQueueMaintainer(queue_maintainer_period, executor))
+        processes.append(make_launcher(executor))
+    processes.append(PoolTreeDemandUpdater(demand_update_period, tree, executors))
+    return executors, processes
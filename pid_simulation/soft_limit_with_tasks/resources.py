@@ -1,3 +1,6 @@
+import numpy as np
+
+
 # Assume that if task started, it continues to execute no matter what capacity of resources is
 class SoftResourceProvider:
     def __init__(self, capacity_fun):
@@ -17,3 +20,25 @@ class SoftResourceProvider:
 
     def limit_exceeded(self, t) -> bool:
         return self.usage > self.capacity_fun(t)
+
+
+# Same as SoftResourceProvider, but for K resources at once.
+# capacity_fun returns K capacities, a task fits only if it fits in every resource.
+class VectorResourceProvider:
+    def __init__(self, capacity_fun, names):
+        self.capacity_fun = capacity_fun
+        self.names = list(names)
+        self.usage = np.zeros(len(self.names))
+
+    def try_alloc(self, t, x: np.ndarray) -> bool:
+        if np.all(self.usage + x <= self.capacity_fun(t)):
+            self.usage += x
+            return True
+        else:
+            return False
+
+    def free(self, t, x: np.ndarray):
+        np.maximum(0, self.usage - x, out=self.usage)
+
+    def limit_exceeded(self, t) -> bool:
+        return bool(np.any(self.usage > self.capacity_fun(t)))
@@ -1,3 +1,5 @@
+import bisect
+
 from soft_limit_with_tasks.resources import SoftResourceProvider
 from soft_limit_with_tasks.task_executors import TaskExecutor
 
@@ -25,3 +27,145 @@ class ExponentialEstimator:
 
     def get_target_demand(self, t) -> float:
         return self.target_demand
+
+
+class EwmaEstimator(ExponentialEstimator):
+    """
+    Target demand from the exponentially weighted moving average of usage instead of the last usage
+    """
+
+    def __init__(
+        self,
+        margin,
+        min_optimistic_shift: float,
+        res_provider: SoftResourceProvider,
+        period: float,
+        alpha: float
+    ):
+        assert 0 < alpha <= 1
+        self.alpha = alpha
+        self.level = res_provider.usage
+        super().__init__(margin, min_optimistic_shift, res_provider, period)
+
+    def do(self, t):
+        self.level += self.alpha * (self.res_provider.usage - self.level)
+        self.target_demand = self._calculate_target_demand(self.level)
+
+
+class HoltEstimator(ExponentialEstimator):
+    """
+    Holt's linear trend: level and trend of usage, target demand is built on the forecast
+    horizon periods ahead, so a growing usage is anticipated instead of chased
+    """
+
+    def __init__(
+        self,
+        margin,
+        min_optimistic_shift: float,
+        res_provider: SoftResourceProvider,
+        period: float,
+        alpha: float,
+        beta: float,
+        horizon: float = 1
+    ):
+        assert 0 < alpha <= 1 and 0 <= beta <= 1
+        self.alpha = alpha
+        self.beta = beta
+        self.horizon = horizon
+        self.level = res_provider.usage
+        self.trend = 0.0
+        super().__init__(margin, min_optimistic_shift, res_provider, period)
+
+    def forecast(self) -> float:
+        return max(0.0, self.level + self.horizon * self.trend)
+
+    def do(self, t):
+        level = self.level
+        self.level = self.alpha * self.res_provider.usage + (1 - self.alpha) * (level + self.trend)
+        self.trend = self.beta * (self.level - level) + (1 - self.beta) * self.trend
+        self.target_demand = self._calculate_target_demand(self.forecast())
+
+
+class HoltWintersEstimator(ExponentialEstimator):
+    """
+    Additive Holt-Winters: level, trend and a seasonal component for each of season_length periods,
+    for example season_length = 24 * 3600 / period for a diurnal capacity
+    """
+
+    def __init__(
+        self,
+        margin,
+        min_optimistic_shift: float,
+        res_provider: SoftResourceProvider,
+        period: float,
+        alpha: float,
+        beta: float,
+        gamma: float,
+        season_length: int,
+        horizon: int = 1
+    ):
+        assert 0 < alpha <= 1 and 0 <= beta <= 1 and 0 <= gamma <= 1
+        assert season_length >= 1 and 0 < horizon
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.horizon = horizon
+        self.level = res_provider.usage
+        self.trend = 0.0
+        self.seasonal = [0.0] * season_length
+        # index of the current period in the season
+        self.phase = 0
+        super().__init__(margin, min_optimistic_shift, res_provider, period)
+
+    def forecast(self) -> float:
+        season_length = len(self.seasonal)
+        seasonal = self.seasonal[(self.phase + self.horizon) % season_length]
+        return max(0.0, self.level + self.horizon * self.trend + seasonal)
+
+    def do(self, t):
+        usage = self.res_provider.usage
+        season_length = len(self.seasonal)
+        self.phase = (self.phase + 1) % season_length
+        seasonal = self.seasonal[self.phase]
+        level = self.level
+        self.level = self.alpha * (usage - seasonal) + (1 - self.alpha) * (level + self.trend)
+        self.trend = self.beta * (self.level - level) + (1 - self.beta) * self.trend
+        self.seasonal[self.phase] = self.gamma * (usage - self.level) + (1 - self.gamma) * seasonal
+        self.target_demand = self._calculate_target_demand(self.forecast())
+
+
+class QuantileEstimator(ExponentialEstimator):
+    """
+    Target demand from the quantile of usage over the last window periods.
+    The window is a ring buffer, a sorted copy of it is updated by bisection on every period.
+    An update is O(window): the bisection is O(log window), but the delete and the insert shift
+    the sorted list. The shift is a memmove, an update takes a few microseconds up to window = 10_000.
+    """
+
+    def __init__(
+        self,
+        margin,
+        min_optimistic_shift: float,
+        res_provider: SoftResourceProvider,
+        period: float,
+        window: int,
+        quantile: float
+    ):
+        assert window >= 1 and 0 <= quantile <= 1
+        self.quantile = quantile
+        self.ring = [res_provider.usage] * window
+        self.position = 0
+        self.sorted = list(self.ring)
+        super().__init__(margin, min_optimistic_shift, res_provider, period)
+
+    def value(self) -> float:
+        return self.sorted[round(self.quantile * (len(self.sorted) - 1))]
+
+    def do(self, t):
+        usage = self.res_provider.usage
+        oldest = self.ring[self.position]
+        self.ring[self.position] = usage
+        self.position = (self.position + 1) % len(self.ring)
+        del self.sorted[bisect.bisect_left(self.sorted, oldest)]
+        bisect.insort(self.sorted, usage)
+        self.target_demand = self._calculate_target_demand(self.value())
@@ -1,8 +1,9 @@
 import dataclasses
 from collections import deque
+from typing import List
+from records import LoggedRecord
 from task_model import Task, TaskInstance
 from soft_limit_with_tasks.resources import SoftResourceProvider
-import json
 
 
 # executor of tasks that immediately allocates resources after starting
@@ -12,8 +13,11 @@ class TaskExecutor:
         self.pending = deque()
         self.paused = deque()
         self.running = []
+        # tasks submitted by launchers, logged for system identification
+        self.launched = 0
 
     def launch(self, task: Task, t: float):
+        self.launched += 1
         self.pending.append(task)
         # print('new pending task')
         self.clear_finished(t)
@@ -21,13 +25,31 @@ class TaskExecutor:
         if len(self.paused) == 0:
             self.try_launch_pending(t)
 
+    def launch_batch(self, tasks: List[Task], t: float):
+        """
+        Same as launching the tasks one by one at time t, but clears finished tasks once
+        """
+        self.launched += len(tasks)
+        self.pending.extend(tasks)
+        self.clear_finished(t)
+        self.try_launch_paused(t)
+        if len(self.paused) == 0:
+            self.try_launch_pending(t)
+
     def clear_finished(self, t: float):
         now = t
-        expired = [task for task in self.running if task.started + task.task.duration < now]
+        expired = []
+        still_running = []
+        # one pass without hashing TaskInstance, running order is kept for pause_if_necessary
+        for task in self.running:
+            if task.started + task.task.duration < now:
+                expired.append(task)
+            else:
+                still_running.append(task)
         # print(f'found expired tasks: {expired}')
-        expired_set = set(expired)
-        # print(f'running before clearing: {self.running}')
-        self.running[:] = [t for t in self.running if t not in expired_set]
+        if not expired:
+            return
+        self.running[:] = still_running
         # print(f'running after clearing: {self.running}')
         for t in expired:
             self.res_provider.free(t, t.task.size)
@@ -104,23 +126,18 @@ class ResourceLogger:
             usage=self.executor.get_usage(t),
             demand=self.executor.get_demand(t),
             actual_limit=self.executor.res_provider.capacity_fun(t),
-            time=t
+            time=t,
+            launched=self.executor.launched
         )
         self.output_lines.append(record)
         print(record)
 
 
 @dataclasses.dataclass
-class UtilizationRecord:
+class UtilizationRecord(LoggedRecord):
     usage: float
     demand: float
     actual_limit: float
     time: float
-
-    @property
-    def __dict__(self):
-        return dataclasses.asdict(self)
-
-    @property
-    def json(self):
-        return json.dumps(self.__dict__)
+    # cumulative number of launched tasks
+    launched: int = 0
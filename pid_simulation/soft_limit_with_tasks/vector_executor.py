@@ -0,0 +1,176 @@
+import dataclasses
+from collections import deque
+from typing import List, Tuple
+
+import numpy as np
+
+from records import LoggedRecord
+from soft_limit_with_tasks.resources import VectorResourceProvider
+from task_model import VectorTask
+
+
+# executor of tasks with K resources, behaves like TaskExecutor.
+# Running tasks are kept as arrays (start, end, sizes[K]) in the launch order,
+# so clearing, pausing and summing are done by numpy in one pass.
+class VectorTaskExecutor:
+    def __init__(self, res_provider: VectorResourceProvider):
+        self.res_provider = res_provider
+        dims = len(res_provider.names)
+        self.pending = deque()
+        self.paused = deque()
+        self.pending_sum = np.zeros(dims)
+        self.paused_sum = np.zeros(dims)
+
+        self.n = 0
+        self.starts = np.empty(16)
+        self.ends = np.empty(16)
+        self.sizes = np.empty((16, dims))
+
+    def launch(self, task: VectorTask, t: float):
+        self.pending.append(task)
+        self.pending_sum += task.size
+        self.clear_finished(t)
+        self.try_launch_paused(t)
+        if len(self.paused) == 0:
+            self.try_launch_pending(t)
+
+    def _append_running(self, t: float, task: VectorTask):
+        if self.n == len(self.starts):
+            self.starts = np.resize(self.starts, 2 * self.n)
+            self.ends = np.resize(self.ends, 2 * self.n)
+            self.sizes = np.resize(self.sizes, (2 * self.n, self.sizes.shape[1]))
+        self.starts[self.n] = t
+        self.ends[self.n] = t + task.duration
+        self.sizes[self.n] = task.size
+        self.n += 1
+
+    def _keep_running(self, mask: np.ndarray):
+        kept = int(mask.sum())
+        self.starts[:kept] = self.starts[:self.n][mask]
+        self.ends[:kept] = self.ends[:self.n][mask]
+        self.sizes[:kept] = self.sizes[:self.n][mask]
+        self.n = kept
+
+    def clear_finished(self, t: float):
+        if self.n == 0:
+            return
+        finished = self.ends[:self.n] < t
+        if not finished.any():
+            return
+        self.res_provider.free(t, self.sizes[:self.n][finished].sum(axis=0))
+        self._keep_running(~finished)
+
+    def try_launch(self, t: float, task: VectorTask) -> bool:
+        if self.res_provider.try_alloc(t, np.asarray(task.size)):
+            self._append_running(t, task)
+            return True
+        else:
+            return False
+
+    def pause_if_necessary(self, t: float):
+        if not self.res_provider.limit_exceeded(t):
+            return
+        # the earliest started tasks are paused until every resource is within its limit
+        capacity = self.res_provider.capacity_fun(t)
+        freed = np.cumsum(self.sizes[:self.n], axis=0)
+        fits = np.all(self.res_provider.usage - freed <= capacity, axis=1)
+        assert fits.any()
+        paused_count = int(np.argmax(fits)) + 1
+
+        for i in range(paused_count):
+            left_dur = self.ends[i] - t
+            assert t >= self.starts[i]
+            assert left_dur > 0
+            self.paused.append(VectorTask(tuple(self.sizes[i].tolist()), left_dur))
+        paused_sizes = freed[paused_count - 1]
+        self.paused_sum += paused_sizes
+        self.res_provider.free(t, paused_sizes)
+        mask = np.zeros(self.n, dtype=bool)
+        mask[paused_count:] = True
+        self._keep_running(mask)
+
+    def try_launch_paused(self, t: float):
+        while len(self.paused) > 0:
+            if self.try_launch(t, self.paused[0]):
+                self.paused_sum -= self.paused.popleft().size
+            else:
+                return
+
+    def try_launch_pending(self, t: float):
+        while len(self.pending) > 0:
+            if self.try_launch(t, self.pending[0]):
+                self.pending_sum -= self.pending.popleft().size
+            else:
+                return
+
+    def get_usage_demand(self, t: float) -> Tuple[np.ndarray, np.ndarray]:
+        self.clear_finished(t)
+        usage = self.sizes[:self.n].sum(axis=0)
+        return usage, usage + np.maximum(0, self.pending_sum) + np.maximum(0, self.paused_sum)
+
+    def get_demand(self, t: float) -> np.ndarray:
+        return self.get_usage_demand(t)[1]
+
+    def get_usage(self, t: float) -> np.ndarray:
+        return self.get_usage_demand(t)[0]
+
+
+# Scalar view of the resource with the largest demand / usage,
+# like ResourceQuotaManager picks the limiting resource. Lets the scalar launchers run on K resources.
+class LimitingResourceView:
+    def __init__(self, executor: VectorTaskExecutor):
+        self.executor = executor
+        self.res_provider = executor.res_provider
+
+    def limiting(self, t: float) -> Tuple[int, float, float]:
+        usage, demand = self.executor.get_usage_demand(t)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            coef = np.where(usage > 0, demand / usage, np.where(demand > 0, np.inf, 1.0))
+        i = int(np.argmax(coef))
+        return i, float(usage[i]), float(demand[i])
+
+    def launch(self, task: VectorTask, t: float):
+        self.executor.launch(task, t)
+
+    def get_usage(self, t: float) -> float:
+        return self.limiting(t)[1]
+
+    def get_demand(self, t: float) -> float:
+        return self.limiting(t)[2]
+
+
+class VectorResourceLogger:
+    def __init__(self, period: float, executor: VectorTaskExecutor, output_lines):
+        self.period = period
+        self.executor = executor
+        self.output_lines = output_lines
+
+    def do(self, t):
+        usage, demand = self.executor.get_usage_demand(t)
+        record = VectorUtilizationRecord(
+            names=self.executor.res_provider.names,
+            usage=usage.tolist(),
+            demand=demand.tolist(),
+            actual_limit=np.asarray(self.executor.res_provider.capacity_fun(t)).tolist(),
+            time=t
+        )
+        self.output_lines.append(record)
+
+
+@dataclasses.dataclass
+class VectorUtilizationRecord(LoggedRecord):
+    names: List[str]
+    usage: List[float]
+    demand: List[float]
+    actual_limit: List[float]
+    time: float
+
+    @property
+    def __dict__(self):
+        # flat columns (usage_ram, demand_cpu, ...) for pd.DataFrame
+        record = {'time': self.time}
+        for i, name in enumerate(self.names):
+            record[f'usage_{name}'] = self.usage[i]
+            record[f'demand_{name}'] = self.demand[i]
+            record[f'actual_limit_{name}'] = self.actual_limit[i]
+        return record
@@ -0,0 +1,156 @@
+"""
+Trace-driven workloads: tasks are launched at recorded arrival times with recorded sizes and durations.
+
+Traces are read in chunks of numpy arrays (arrival, size, duration), so memory does not depend on the trace length.
+Supported formats, chosen by the file suffix:
+    .bin     raw little-endian float64 records (arrival, size, duration), read through np.memmap
+    .csv     columns arrival,size,duration, read with pandas in chunks
+    .parquet same columns, read with pyarrow in record batches
+Arrivals must be sorted. Every reader can start from a row offset, so TraceWorkload keeps only the offset
+in checkpoints and reopens the trace at it.
+"""
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from soft_limit_with_tasks.task_executors import TaskExecutor
+from task_model import Task
+
+TRACE_DTYPE = np.dtype([('arrival', '<f8'), ('size', '<f8'), ('duration', '<f8')])
+TRACE_COLUMNS = list(TRACE_DTYPE.names)
+
+TraceChunk = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def iter_binary_trace(path, chunk_size: int = 1 << 16, start: int = 0) -> Iterator[TraceChunk]:
+    records = np.memmap(path, dtype=TRACE_DTYPE, mode='r')
+    for begin in range(start, len(records), chunk_size):
+        chunk = records[begin:begin + chunk_size]
+        yield chunk['arrival'], chunk['size'], chunk['duration']
+
+
+def iter_csv_trace(path, chunk_size: int = 1 << 16, start: int = 0) -> Iterator[TraceChunk]:
+    import pandas as pd
+
+    reader = pd.read_csv(path, usecols=TRACE_COLUMNS, dtype=np.float64, chunksize=chunk_size,
+                         skiprows=range(1, start + 1))
+    for chunk in reader:
+        yield tuple(chunk[column].to_numpy() for column in TRACE_COLUMNS)
+
+
+def iter_parquet_trace(path, chunk_size: int = 1 << 16, start: int = 0) -> Iterator[TraceChunk]:
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=TRACE_COLUMNS):
+        if start >= batch.num_rows:
+            start -= batch.num_rows
+            continue
+        batch = batch.slice(start)
+        start = 0
+        yield tuple(batch.column(column).to_numpy().astype(np.float64, copy=False) for column in TRACE_COLUMNS)
+
+
+def iter_trace(path, chunk_size: int = 1 << 16, start: int = 0) -> Iterator[TraceChunk]:
+    """
+    Chunks of the trace from row start
+    """
+    suffix = Path(path).suffix
+    if suffix == '.csv':
+        return iter_csv_trace(path, chunk_size, start)
+    if suffix == '.parquet':
+        return iter_parquet_trace(path, chunk_size, start)
+    return iter_binary_trace(path, chunk_size, start)
+
+
+def write_binary_trace(chunks: Iterable[TraceChunk], path):
+    """
+    Converts a trace (for example, iter_csv_trace) into the binary format once,
+    so the following replays read it through np.memmap
+    """
+    with open(path, 'wb') as out:
+        for arrival, size, duration in chunks:
+            records = np.empty(len(arrival), dtype=TRACE_DTYPE)
+            records['arrival'] = arrival
+            records['size'] = size
+            records['duration'] = duration
+            records.tofile(out)
+
+
+class TraceWorkload:
+    """
+    Launches trace tasks of the trace file at path into the executor at their arrival times.
+    The period is set to the time left until the next arrival.
+    Checkpoints keep the row offset of the current chunk instead of the open reader.
+    """
+
+    def __init__(self, executor: TaskExecutor, path, chunk_size: int = 1 << 16, time_shift: float = 0.0,
+                 idle_period: float = float('inf')):
+        self.executor = executor
+        self.path = path
+        self.chunk_size = chunk_size
+        self.time_shift = time_shift
+        self.idle_period = idle_period
+        self.launched = 0
+
+        # row of the trace where the current chunk starts
+        self.offset = 0
+        self.chunks: Optional[Iterator[TraceChunk]] = None
+        self.arrival: Optional[np.ndarray] = None
+        self.size: Optional[np.ndarray] = None
+        self.duration: Optional[np.ndarray] = None
+        self.i = 0
+        self._open(0)
+        self.period = idle_period
+
+    def _open(self, offset: int):
+        self.chunks = iter_trace(self.path, self.chunk_size, offset)
+        self.offset = offset
+        self.arrival = None
+        self._load_chunk()
+
+    def _load_chunk(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.arrival = None
+            return
+        arrival, self.size, self.duration = chunk
+        self.arrival = arrival - self.time_shift if self.time_shift else arrival
+        self.i = 0
+
+    def _next_chunk(self):
+        self.offset += len(self.arrival)
+        self._load_chunk()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(chunks=None, arrival=None, size=None, duration=None)
+        state['exhausted'] = self.arrival is None
+        return state
+
+    def __setstate__(self, state):
+        exhausted = state.pop('exhausted')
+        self.__dict__.update(state)
+        if not exhausted:
+            i = self.i
+            self._open(self.offset)
+            self.i = i
+
+    def do(self, t: float):
+        # tasks arrived by t may span several chunks, they are launched in one batch
+        tasks = []
+        while self.arrival is not None:
+            end = int(np.searchsorted(self.arrival, t, side='right'))
+            if end > self.i:
+                sizes = self.size[self.i:end].tolist()
+                durations = self.duration[self.i:end].tolist()
+                tasks.extend(Task(size, duration) for size, duration in zip(sizes, durations))
+            self.i = end
+            if end < len(self.arrival):
+                break
+            self._next_chunk()
+        if tasks:
+            self.executor.launch_batch(tasks, t)
+            self.launched += len(tasks)
+        # everything arrived by t is launched, so the next arrival is strictly later
+        self.period = self.idle_period if self.arrival is None else float(self.arrival[self.i]) - t
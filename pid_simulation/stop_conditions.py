@@ -0,0 +1,121 @@
+"""
+Stop conditions: processes that end a simulation before its horizon when running it further tells nothing new.
+
+    demand = lambda t: executor.get_demand(t)
+    simulator = Simulator(processes + [
+        SteadyState(demand, period=300, window=20, tolerance=0.02, min_time=25_000),
+        Divergence(demand, period=300, bound=10_000),
+        WallTimeBudget(period=300, budget_sec=60),
+    ])
+    reason = simulator.simulate(30_000)     # None, or StopReason('steady_state', t, ...)
+    simulator.simulate(40_000)              # continues after the stop
+
+Stopping is opt-in: a launcher of soft_limit_with_tasks that would launch MAX_SLOTS tasks at once still fails
+the simulation with SlotsLimitExceeded. Divergence of the demand stops it before that.
+"""
+import collections
+import math
+import time
+from typing import Callable, List, Optional
+
+from simulator import StopReason, StopSimulation
+
+MAX_SLOTS = 1000
+
+
+class SlotsLimitExceeded(AssertionError):
+    """
+    A launcher diverged, an AssertionError as the assert it replaces
+    """
+
+    def __init__(self, slots: int):
+        super().__init__(f'{slots} slots')
+        self.slots = slots
+
+
+def check_slots(slots: int):
+    if slots >= MAX_SLOTS:
+        raise SlotsLimitExceeded(slots)
+
+
+class RecordLog(list):
+    """
+    Records logged by a scenario, with the reason it stopped before its horizon (None if it did not)
+    """
+    stop_reason: Optional[StopReason] = None
+
+
+class SteadyState:
+    """
+    Stops when the last window samples of signal stay within tolerance of their mean (relative to it).
+    Not checked before min_time, so a scenario gets through its planned changes, like the stair.
+    """
+
+    def __init__(self, signal: Callable[[float], float], period: float, window: int, tolerance: float,
+                 min_time: float = 0.0):
+        self.signal = signal
+        self.period = period
+        self.tolerance = tolerance
+        self.min_time = min_time
+        self.samples = collections.deque(maxlen=window)
+
+    def do(self, t: float):
+        self.samples.append(self.signal(t))
+        if t < self.min_time or len(self.samples) < self.samples.maxlen:
+            return
+        mean = sum(self.samples) / len(self.samples)
+        spread = max(self.samples) - min(self.samples)
+        if spread <= self.tolerance * max(abs(mean), 1e-9):
+            raise StopSimulation('steady_state', f'mean {mean:.6g}, spread {spread:.6g}')
+
+
+class Divergence:
+    """
+    Stops when |signal| exceeds bound or is not finite
+    """
+
+    def __init__(self, signal: Callable[[float], float], period: float, bound: float):
+        self.signal = signal
+        self.period = period
+        self.bound = bound
+
+    def do(self, t: float):
+        x = self.signal(t)
+        if not math.isfinite(x) or abs(x) > self.bound:
+            raise StopSimulation('divergence', f'signal {x:.6g} out of ±{self.bound:.6g}')
+
+
+class WallTimeBudget:
+    """
+    Stops when the simulation has run for budget_sec of wall time since the first check.
+    clock returns the wall time in seconds.
+    """
+
+    def __init__(self, period: float, budget_sec: float, clock: Callable[[], float] = time.monotonic):
+        self.period = period
+        self.budget_sec = budget_sec
+        self.clock = clock
+        self.started: Optional[float] = None
+
+    def do(self, t: float):
+        now = self.clock()
+        if self.started is None:
+            self.started = now
+        elif now - self.started > self.budget_sec:
+            raise StopSimulation('wall_time', f'{now - self.started:.3g} s')
+
+
+def demand_stop_conditions(executor, period: float, steady_window: Optional[int] = None,
+                           steady_tolerance: float = 0.02, steady_min_time: float = 0.0,
+                           max_demand: Optional[float] = None, wall_sec: Optional[float] = None) -> List:
+    """
+    Conditions on the demand of a TaskExecutor, the ones whose parameters are given
+    """
+    conditions = []
+    if steady_window is not None:
+        conditions.append(SteadyState(executor.get_demand, period, steady_window, steady_tolerance, steady_min_time))
+    if max_demand is not None:
+        conditions.append(Divergence(executor.get_demand, period, max_demand))
+    if wall_sec is not None:
+        conditions.append(WallTimeBudget(period, wall_sec))
+    return conditions
@@ -0,0 +1,387 @@
+"""
+Resumable sweep of scenario configurations through a local SQLite queue.
+
+Jobs are configurations of the test_on_* scenarios (see SCENARIOS). Workers claim jobs with a lease,
+run them and write metric rows back. A job whose lease expired (the worker crashed or the machine rebooted)
+is claimed again, so an interrupted campaign continues where it stopped when workers are restarted.
+
+    queue = SweepQueue('sweep.db')
+    queue.add_jobs('stair_pid', 'stair', grid(launcher=['relative_pid'],
+                                              launcher_params=[dict(k_p=k_p, k_i=0.0001, k_d=0) for k_p in (0.1, 0.5)]))
+
+    python sweep_queue.py work sweep.db --workers 8      # on every machine
+    python sweep_queue.py status sweep.db
+
+Workers on several machines may share the database file over a network file system,
+as long as it supports POSIX locks (the rollback journal is used, WAL does not work over the network).
+"""
+import argparse
+import contextlib
+import dataclasses
+import functools
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from experiment_cache import ExperimentCache, ExperimentConfig
+from plotting.modules.metrics import AdaptingSpeedMetric, AverageDiffMetric
+from soft_limit_with_tasks.__main__ import (
+    CONSTANT_SCENARIO,
+    STAIR_SCENARIO,
+    cheating_launcher,
+    constant_rate_launcher,
+    mpc_launcher,
+    naive_launcher,
+    pid_launcher,
+    relative_pid_launcher,
+    test_on_stair_configurable,
+)
+from soft_limit_with_tasks.task_executors import UtilizationRecord
+from stop_conditions import RecordLog, demand_stop_conditions
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    campaign TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    finished REAL,
+    UNIQUE (campaign, scenario, params)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS metrics (
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (job_id, name)
+);
+'''
+
+
+@dataclasses.dataclass
+class Job:
+    id: int
+    campaign: str
+    scenario: str
+    params: Dict[str, Any]
+    attempts: int
+    lease_owner: str
+
+
+def grid(**values: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    All combinations of the values: grid(a=[1, 2], b=[3]) == [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]
+    """
+    return [dict(zip(values, combination)) for combination in itertools.product(*values.values())]
+
+
+class SweepQueue:
+    def __init__(self, path, max_attempts: int = 3, timeout_sec: float = 60):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.timeout_sec = timeout_sec
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=self.timeout_sec, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # the write lock is taken at the start, so two workers never claim the same job
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                yield db
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+
+    def add_jobs(self, campaign: str, scenario: str, params_list: Iterable[Dict[str, Any]]) -> int:
+        """
+        Adds the configurations, the ones already present in the campaign are skipped.
+        Returns the number of added jobs.
+        """
+        rows = [(campaign, scenario, json.dumps(params, sort_keys=True)) for params in params_list]
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany('INSERT OR IGNORE INTO jobs (campaign, scenario, params) VALUES (?, ?, ?)', rows)
+            return db.total_changes - before
+
+    def claim(self, worker: str, lease_sec: float) -> Optional[Job]:
+        """
+        A pending job, or a running one whose lease has expired
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT id, campaign, scenario, params, attempts FROM jobs '
+                'WHERE (status = ? OR (status = ? AND lease_expires < ?)) AND attempts < ? '
+                'ORDER BY id LIMIT 1',
+                (PENDING, RUNNING, now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                self._fail_exhausted(db, now)
+                return None
+            job_id, campaign, scenario, params, attempts = row
+            db.execute(
+                'UPDATE jobs SET status = ?, attempts = ?, lease_owner = ?, lease_expires = ? WHERE id = ?',
+                (RUNNING, attempts + 1, worker, now + lease_sec, job_id)
+            )
+        return Job(job_id, campaign, scenario, json.loads(params), attempts + 1, worker)
+
+    def _fail_exhausted(self, db, now: float):
+        # jobs that crashed their workers max_attempts times
+        db.execute(
+            'UPDATE jobs SET status = ?, error = ? WHERE status = ? AND lease_expires < ? AND attempts >= ?',
+            (FAILED, 'lease expired too many times', RUNNING, now, self.max_attempts)
+        )
+
+    def extend_lease(self, job: Job, lease_sec: float) -> bool:
+        with self._transaction() as db:
+            updated = db.execute(
+                'UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = ? AND lease_owner = ?',
+                (time.time() + lease_sec, job.id, RUNNING, job.lease_owner)
+            ).rowcount
+        return updated == 1
+
+    def complete(self, job: Job, metrics: Dict[str, float]) -> bool:
+        """
+        Stores the metrics if the job is still leased by this worker.
+        Returns False if the lease was lost and the job was given to another worker.
+        """
+        with self._transaction() as db:
+            updated = db.execute(
+                'UPDATE jobs SET status = ?, finished = ?, lease_expires = NULL WHERE id = ? AND status = ? '
+                'AND lease_owner = ?',
+                (DONE, time.time(), job.id, RUNNING, job.lease_owner)
+            ).rowcount
+            if updated == 1:
+                db.executemany('INSERT OR REPLACE INTO metrics (job_id, name, value) VALUES (?, ?, ?)',
+                               [(job.id, name, value) for name, value in metrics.items()])
+        return updated == 1
+
+    def fail(self, job: Job, error: str):
+        """
+        The scenario itself failed (for example, a launcher diverged), such a job is not retried
+        """
+        with self._transaction() as db:
+            db.execute(
+                'UPDATE jobs SET status = ?, error = ?, finished = ?, lease_expires = NULL '
+                'WHERE id = ? AND lease_owner = ?',
+                (FAILED, error, time.time(), job.id, job.lease_owner)
+            )
+
+    def retry_failed(self, campaign: Optional[str] = None) -> int:
+        with self._transaction() as db:
+            return db.execute(
+                'UPDATE jobs SET status = ?, attempts = 0, error = NULL WHERE status = ? AND campaign = IFNULL(?, campaign)',
+                (PENDING, FAILED, campaign)
+            ).rowcount
+
+    def status(self, campaign: Optional[str] = None) -> Dict[str, int]:
+        with self._connect() as db:
+            rows = db.execute(
+                'SELECT status, COUNT(*) FROM jobs WHERE campaign = IFNULL(?, campaign) GROUP BY status',
+                (campaign,)
+            ).fetchall()
+        return dict(rows)
+
+    def results(self, campaign: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        One row per finished job: its params and metrics
+        """
+        with self._connect() as db:
+            jobs = db.execute(
+                'SELECT id, campaign, scenario, params FROM jobs WHERE status = ? AND campaign = IFNULL(?, campaign) '
+                'ORDER BY id',
+                (DONE, campaign)
+            ).fetchall()
+            metrics = {}
+            for job_id, name, value in db.execute('SELECT job_id, name, value FROM metrics'):
+                metrics.setdefault(job_id, {})[name] = value
+        return [
+            {'id': job_id, 'campaign': job_campaign, 'scenario': scenario, **json.loads(params),
+             **metrics.get(job_id, {})}
+            for job_id, job_campaign, scenario, params in jobs
+        ]
+
+
+LAUNCHERS = {
+    'pid': pid_launcher,
+    'naive': naive_launcher,
+    'cheating': cheating_launcher,
+    'constant_rate': constant_rate_launcher,
+    'relative_pid': relative_pid_launcher,
+    'mpc': mpc_launcher,
+}
+
+
+SCENARIO_PARAMS = {
+    'stair': STAIR_SCENARIO,
+    'constant': CONSTANT_SCENARIO,
+}
+
+
+def scenario_metrics(scenario: str, params: Dict[str, Any],
+                     cache: Optional[ExperimentCache] = None) -> Dict[str, float]:
+    """
+    Runs test_on_stair_configurable of SCENARIO_PARAMS[scenario] with the launcher
+    LAUNCHERS[params['launcher']](config, **params['launcher_params']), the random generators are seeded with
+    params['seed'] (0 by default). params['scenario_params'] override the scenario parameters.
+    params['stop'] are the arguments of demand_stop_conditions (except executor and period), a run stopped
+    early gets stopped_at and stop_<reason> metrics, a diverged one fails.
+    With a cache, the records of a run with the same configuration are loaded instead of simulated.
+    Runs with stop conditions are not cached, the stop reason is not a part of the records.
+    """
+    make_launcher = LAUNCHERS[params['launcher']]
+    launcher_params = params.get('launcher_params', {})
+    stop_params = params.get('stop')
+    scenario_params = {**SCENARIO_PARAMS[scenario], **params.get('scenario_params', {})}
+    stop_conditions = None
+    if stop_params:
+        stop_conditions = lambda executor: demand_stop_conditions(
+            executor, scenario_params['queue_maintainer_period'], **stop_params)
+    # the named scenario and the code version stand for the default parameters, only the overrides are in the key
+    config = ExperimentConfig.create(scenario, params.get('scenario_params', {}), params['launcher'],
+                                     launcher_params, params.get('seed', 0))
+
+    def experiment(_: ExperimentConfig) -> RecordLog:
+        return test_on_stair_configurable(
+            **scenario_params,
+            launcher=lambda launcher_config: make_launcher(launcher_config, **launcher_params),
+            stop_conditions=stop_conditions,
+        )
+
+    if cache is not None and not stop_params:
+        data = cache.run(config, experiment)
+        output_lines = RecordLog(UtilizationRecord(**row) for row in data.to_dict('records'))
+    else:
+        random.seed(config.seed)
+        np.random.seed(config.seed)
+        output_lines = experiment(config)
+    stop_reason = output_lines.stop_reason
+    if stop_reason is not None and stop_reason.reason == 'divergence':
+        raise RuntimeError(f'Diverged at {stop_reason.time}: {stop_reason.detail}')
+    metrics = AverageDiffMetric.calculate(output_lines).__dict__
+    if stop_reason is not None:
+        metrics['stopped_at'] = float(stop_reason.time)
+        metrics[f'stop_{stop_reason.reason}'] = 1.0
+    adapting_speed = AdaptingSpeedMetric.calculate(output_lines)
+    if adapting_speed is not None:
+        metrics.update(adapting_speed.__dict__)
+    return metrics
+
+
+# scenario(params, cache) returns the metrics of a job
+SCENARIOS: Dict[str, Callable[[Dict[str, Any], Optional[ExperimentCache]], Dict[str, float]]] = {
+    name: functools.partial(scenario_metrics, name) for name in SCENARIO_PARAMS
+}
+
+
+class _LeaseKeeper(threading.Thread):
+    def __init__(self, queue: SweepQueue, job: Job, lease_sec: float):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job = job
+        self.lease_sec = lease_sec
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.lease_sec / 3):
+            if not self.queue.extend_lease(self.job, self.lease_sec):
+                return
+
+
+def work(path, worker: Optional[str] = None, lease_sec: float = 300, poll_sec: float = 5,
+         exit_when_empty: bool = True, scenarios: Optional[Dict[str, Callable]] = None,
+         cache_dir: Optional[str] = None) -> int:
+    """
+    Runs jobs until the queue is empty. Returns the number of completed jobs.
+    With cache_dir, the scenario runs are cached in an ExperimentCache there, so a job repeated
+    in another campaign is not simulated again.
+    """
+    queue = SweepQueue(path)
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    scenarios = scenarios or SCENARIOS
+    cache = ExperimentCache(cache_dir) if cache_dir is not None else None
+    completed = 0
+    while True:
+        job = queue.claim(worker, lease_sec)
+        if job is None:
+            if exit_when_empty and not queue.status().get(RUNNING):
+                return completed
+            time.sleep(poll_sec)
+            continue
+
+        keeper = _LeaseKeeper(queue, job, lease_sec)
+        keeper.start()
+        try:
+            # launchers print every decision
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                metrics = scenarios[job.scenario](job.params, cache)
+        except Exception as e:
+            logging.exception(f'Job {job.id} failed')
+            queue.fail(job, f'{type(e).__name__}: {e}')
+            continue
+        finally:
+            keeper.stopped.set()
+        if queue.complete(job, metrics):
+            completed += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite sweep queue')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    work_parser = subparsers.add_parser('work', help='run worker processes until the queue is empty')
+    work_parser.add_argument('db')
+    work_parser.add_argument('--workers', type=int, default=os.cpu_count())
+    work_parser.add_argument('--lease-sec', type=float, default=300)
+    work_parser.add_argument('--cache-dir', default=None, help='ExperimentCache directory of the scenario runs')
+    status_parser = subparsers.add_parser('status', help='number of jobs by status')
+    status_parser.add_argument('db')
+    status_parser.add_argument('--campaign', default=None)
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        print(SweepQueue(args.db).status(args.campaign))
+        return
+
+    SweepQueue(args.db)
+    kwargs = {'lease_sec': args.lease_sec, 'cache_dir': args.cache_dir}
+    workers = [multiprocessing.Process(target=work, args=(args.db,), kwargs=kwargs) for _ in range(args.workers)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    print(SweepQueue(args.db).status())
+
+
+if __name__ == '__main__':
+    main()
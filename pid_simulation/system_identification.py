@@ -0,0 +1,279 @@
+"""
+System identification of the plant from simulation logs, and surrogate plants for pre-screening controllers.
+
+The input is the number of tasks launched in every logger period (UtilizationRecord.launched is cumulative),
+the output is demand or usage. Two linear models are fitted by least squares:
+
+    ARX(na, nb, nk):  y[k] = a_1 y[k-1] + ... + a_na y[k-na] + b_1 u[k-nk] + ... + b_nb u[k-nk-nb+1] + c
+    FOPDT:            first order plus dead time, ARX(1, 1, delay) with the delay chosen by the fit,
+                      reported as gain, time constant and dead time
+
+A fitted model becomes a ControlledObject of abstract_pid, so gains can be compared on the surrogate
+in milliseconds before running the task-level simulation:
+
+    u, y, period = identification_data(output_lines, output='demand')
+    model, report = fit_fopdt(u, y, period)
+    print(report)
+    results = prescreen_pid(model, [(0.1, 0.01, 0), (0.5, 0.05, 0)], target=lambda t: 250, duration=300)
+"""
+import contextlib
+import dataclasses
+import math
+import os
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from abstract_pid.logger import Logger
+from abstract_pid.pid import PID, ControlledObject
+from abstract_pid.target_providers import TargetProviderFromFunction
+from records import Record
+from simulator import Simulator
+
+
+def identification_data(records: Iterable[Any], output: str = 'demand') -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    u[k] is the number of tasks launched between records k - 1 and k, y[k] is the output of record k.
+    records are UtilizationRecords, dicts or a DataFrame of a ResourceLogger log with a constant period.
+    Returns u, y and the period.
+    """
+    if not isinstance(records, pd.DataFrame):
+        records = pd.DataFrame([x if isinstance(x, dict) else x.__dict__ for x in records])
+    assert 'launched' in records, 'the log has no launched column, it was written before launches were logged'
+    time = records['time'].to_numpy(dtype=np.float64)
+    launched = records['launched'].to_numpy(dtype=np.float64)
+    y = records[output].to_numpy(dtype=np.float64)
+    assert len(time) >= 3
+    period = float(np.median(np.diff(time)))
+    u = np.diff(launched, prepend=launched[0])
+    return u, y, period
+
+
+@dataclasses.dataclass
+class FitReport(Record):
+    model: str
+    samples: int
+    # coefficient of determination of the one step ahead prediction
+    r2_one_step: float
+    # 100 * (1 - NRMSE) of the free run simulation from the measured input, 100 is a perfect fit
+    fit_percent: float
+    residual_std: float
+    # fit_fopdt chose its max_delay: the dead time may be longer than the searched range, refit with a larger one
+    delay_at_max: bool = False
+
+
+@dataclasses.dataclass
+class ArxModel:
+    a: np.ndarray
+    b: np.ndarray
+    c: float
+    nk: int
+    sample_period: float
+
+    @property
+    def na(self) -> int:
+        return len(self.a)
+
+    @property
+    def nb(self) -> int:
+        return len(self.b)
+
+    @property
+    def lag(self) -> int:
+        """
+        Number of past samples the model needs
+        """
+        return max(self.na, self.nk + self.nb - 1)
+
+    @property
+    def steady_state_gain(self) -> float:
+        return float(self.b.sum() / (1 - self.a.sum()))
+
+    def step(self, y_history: Sequence[float], u_history: Sequence[float]) -> float:
+        """
+        Next output. y_history and u_history are the latest samples first: y_history[0] is y[k-1],
+        u_history[0] is u[k]
+        """
+        y_part = sum(a * y for a, y in zip(self.a, y_history))
+        u_part = sum(b * u_history[self.nk + j] for j, b in enumerate(self.b))
+        return y_part + u_part + self.c
+
+    def predict(self, u: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        One step ahead predictions from the measured outputs, starting from sample lag
+        """
+        regressors, _ = _regressors(u, y, self.na, self.nb, self.nk)
+        return regressors @ np.concatenate([self.a, self.b, [self.c]])
+
+    def simulate(self, u: np.ndarray, y_initial: Sequence[float]) -> np.ndarray:
+        """
+        Free run from the input: the first lag outputs are y_initial, the following ones are predicted
+        from the previous predictions
+        """
+        y = np.empty(len(u))
+        y[:self.lag] = y_initial[:self.lag]
+        for k in range(self.lag, len(u)):
+            y[k] = self.step(y[k - 1::-1], u[k::-1])
+        return y
+
+
+@dataclasses.dataclass
+class FopdtModel:
+    gain: float
+    time_constant: float
+    # in samples of sample_period
+    delay: int
+    offset: float
+    sample_period: float
+
+    @property
+    def dead_time(self) -> float:
+        return self.delay * self.sample_period
+
+    @property
+    def arx(self) -> ArxModel:
+        a = math.exp(-self.sample_period / self.time_constant) if self.time_constant > 0 else 0.0
+        return ArxModel(np.array([a]), np.array([self.gain * (1 - a)]), self.offset * (1 - a), self.delay,
+                        self.sample_period)
+
+
+def _regressors(u: np.ndarray, y: np.ndarray, na: int, nb: int, nk: int) -> Tuple[np.ndarray, np.ndarray]:
+    lag = max(na, nk + nb - 1)
+    rows = range(lag, len(y))
+    columns = [[y[k - i] for k in rows] for i in range(1, na + 1)]
+    columns += [[u[k - nk - j] for k in rows] for j in range(nb)]
+    columns.append([1.0] * len(rows))
+    return np.array(columns, dtype=np.float64).T, y[lag:]
+
+
+def _report(name: str, model: ArxModel, u: np.ndarray, y: np.ndarray) -> FitReport:
+    lag = model.lag
+    residuals = y[lag:] - model.predict(u, y)
+    variance = float(np.var(y[lag:]))
+    simulated = model.simulate(u, y)
+    error = np.linalg.norm(y[lag:] - simulated[lag:])
+    spread = np.linalg.norm(y[lag:] - y[lag:].mean())
+    return FitReport(
+        model=name,
+        samples=len(y) - lag,
+        r2_one_step=1 - float(np.var(residuals)) / variance if variance > 0 else float('nan'),
+        fit_percent=float(100 * (1 - error / spread)) if spread > 0 else float('nan'),
+        residual_std=float(np.std(residuals)),
+    )
+
+
+def fit_arx(u: np.ndarray, y: np.ndarray, sample_period: float, na: int = 2, nb: int = 2,
+            nk: int = 1) -> Tuple[ArxModel, FitReport]:
+    u = np.asarray(u, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    regressors, target = _regressors(u, y, na, nb, nk)
+    assert len(target) > regressors.shape[1], 'not enough samples for the model order'
+    theta, *_ = np.linalg.lstsq(regressors, target, rcond=None)
+    model = ArxModel(theta[:na], theta[na:na + nb], float(theta[-1]), nk, sample_period)
+    return model, _report(f'ARX({na}, {nb}, {nk})', model, u, y)
+
+
+def fit_fopdt(u: np.ndarray, y: np.ndarray, sample_period: float,
+              max_delay: int = 20) -> Tuple[FopdtModel, FitReport]:
+    """
+    ARX(1, 1, delay) for every delay up to max_delay samples, the one with the best free run fit is kept.
+    If it is max_delay, the report has delay_at_max set
+    """
+    best = None
+    for delay in range(max_delay + 1):
+        arx, report = fit_arx(u, y, sample_period, na=1, nb=1, nk=delay)
+        a, b = float(arx.a[0]), float(arx.b[0])
+        if not 0 < a < 1:
+            # not a stable first order response
+            continue
+        if best is None or report.fit_percent > best[1].fit_percent:
+            best = (FopdtModel(
+                gain=b / (1 - a),
+                time_constant=-sample_period / math.log(a),
+                delay=delay,
+                offset=arx.c / (1 - a),
+                sample_period=sample_period,
+            ), report)
+    assert best is not None, 'no delay gives a stable first order model'
+    model, report = best
+    report.model = f'FOPDT(delay={model.delay})'
+    report.delay_at_max = model.delay == max_delay
+    return model, report
+
+
+class SurrogatePlant(ControlledObject):
+    """
+    Fitted model as a controlled object: the input is the number of tasks launched per sample period,
+    the output is advanced in steps of sample_period up to the requested time.
+    noise_std adds gaussian noise of the residual size to every step.
+    """
+
+    def __init__(self, model, initial_output: float = 0.0, noise_std: float = 0.0, clip_at_zero: bool = True,
+                 rng: Optional[np.random.Generator] = None):
+        self.model = model.arx if isinstance(model, FopdtModel) else model
+        self.noise_std = noise_std
+        self.clip_at_zero = clip_at_zero
+        self.rng = rng or np.random.default_rng()
+        self.input = 0.0
+        self.t = 0.0
+        # latest samples first
+        self.y_history = [initial_output] * max(1, self.model.na)
+        self.u_history = [0.0] * (self.model.nk + self.model.nb)
+
+    def set_input(self, x: float, t: float):
+        self.get_output(t)
+        # negative launches do not exist
+        self.input = max(0.0, x) if self.clip_at_zero else x
+
+    def _step(self):
+        self.u_history = [self.input] + self.u_history[:-1]
+        y = self.model.step(self.y_history, self.u_history)
+        if self.noise_std > 0:
+            y += self.rng.normal(0, self.noise_std)
+        if self.clip_at_zero:
+            y = max(0.0, y)
+        self.y_history = [y] + self.y_history[:-1]
+
+    def get_output(self, t: float) -> float:
+        while self.t + self.model.sample_period <= t + 1e-9:
+            self._step()
+            self.t += self.model.sample_period
+        return self.y_history[0]
+
+
+@dataclasses.dataclass
+class PrescreenResult(Record):
+    k_p: float
+    k_i: float
+    k_d: float
+    # integral of the absolute error
+    iae: float
+    max_overshoot: float
+
+
+def prescreen_pid(model, gains: Iterable[Tuple[float, float, float]], target: Callable[[float], float],
+                  duration: float, period: Optional[float] = None,
+                  make_plant: Optional[Callable[[], ControlledObject]] = None) -> List[PrescreenResult]:
+    """
+    Runs the PID of abstract_pid with every (k_p, k_i, k_d) against a fresh surrogate of the model.
+    The results are sorted by IAE, the first ones are worth a full simulation.
+    """
+    period = period or model.sample_period
+    results = []
+    for k_p, k_i, k_d in gains:
+        plant = make_plant() if make_plant is not None else SurrogatePlant(model)
+        target_provider = TargetProviderFromFunction(target)
+        pid = PID(k_p, k_i, k_d, plant, target_provider, period)
+        output_lines = []
+        logger = Logger(plant, target_provider, pid, output_lines, period)
+        # PID and Logger print every step
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            Simulator([pid, logger]).simulate(duration)
+        errors = np.array([x['target_output'] - x['actual_output'] for x in output_lines])
+        targets = np.array([x['target_output'] for x in output_lines])
+        iae = float(np.abs(errors).sum() * period)
+        overshoot = float(max(0.0, -errors.min()) / np.abs(targets).max()) if len(errors) else 0.0
+        results.append(PrescreenResult(k_p, k_i, k_d, iae if math.isfinite(iae) else math.inf, overshoot))
+    results.sort(key=lambda x: x.iae)
+    return results
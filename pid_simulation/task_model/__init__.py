@@ -8,6 +8,13 @@ class Task:
     duration: float
 
 
+# task that needs several resources at once (e.g. ram and cpu), size is a tuple to keep it hashable
+@dataclass(frozen=True, eq=True)
+class VectorTask:
+    size: tuple
+    duration: float
+
+
 @dataclass(frozen=True, eq=True)
 class TaskInstance:
     started: float
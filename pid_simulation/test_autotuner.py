@@ -0,0 +1,95 @@
+import copy
+import functools
+import math
+import pickle
+
+import pytest
+
+from autotuner import (
+    Choice,
+    ScenarioObjective,
+    hyperband,
+    relative_pid2_stair_objective,
+    scaled_task_generator,
+    tune_successive_halving,
+)
+from soft_limit_with_tasks.task_executors import UtilizationRecord
+
+
+def toy_scenario(gen_task, simulated_duration: float, launcher):
+    # the records of the toy scenario show the drawn tasks, the launcher is a number: the usage error
+    tasks = [gen_task() for _ in range(3)]
+    error = launcher(None)
+    return [UtilizationRecord(usage=100 * (1 + error), demand=100.0, actual_limit=100.0, time=task.duration)
+            for task in tasks]
+
+
+def toy_launcher(config, x: float) -> float:
+    return abs(x - 0.3)
+
+
+def toy_objective(**kwargs) -> ScenarioObjective:
+    gen_task = functools.partial(scaled_task_generator, size_mean=1, size_dev=0.5, duration_mean=10, duration_dev=1)
+    return ScenarioObjective(toy_scenario, dict(simulated_duration=100), toy_launcher,
+                             time_params=['simulated_duration'], weights={'sum_of_deltas': 1.0}, gen_task=gen_task,
+                             **kwargs)
+
+
+def drawn_durations(objective: ScenarioObjective, budget: float) -> list:
+    scenario = objective.scenario
+    durations = []
+
+    def recording(**kwargs):
+        records = scenario(**kwargs)
+        durations.append([x.time for x in records])
+        return records
+
+    objective.scenario = recording
+    objective({'x': 0.0}, budget)
+    objective.scenario = scenario
+    return durations[0]
+
+
+class TestScenarioObjective:
+    def test_every_evaluation_sees_the_same_tasks(self):
+        objective = toy_objective(seed=1)
+        first = drawn_durations(objective, 1.0)
+        assert drawn_durations(objective, 1.0) == first
+        # a worker process gets a pickled objective
+        assert drawn_durations(pickle.loads(pickle.dumps(objective)), 1.0) == first
+        assert drawn_durations(toy_objective(seed=2), 1.0) != first
+
+    def test_task_durations_are_scaled_by_budget(self):
+        objective = toy_objective()
+        assert drawn_durations(objective, 0.5) == pytest.approx([x * 0.5 for x in drawn_durations(objective, 1.0)])
+
+    def test_min_budget(self):
+        objective = toy_objective(min_budget=0.25)
+        assert objective({'x': 0.0}, 0.1).budget == 0.25
+        assert objective({'x': 0.0}, 0.5).budget == 0.5
+
+    def test_failed_run_is_inf(self):
+        evaluation = toy_objective()({'y': 1.0}, 1.0)
+        assert evaluation.value == math.inf and evaluation.error.startswith('TypeError')
+
+    def test_stair_objective_min_budget(self):
+        # a third of the horizon, the stair step, spans at least 10 launcher periods
+        objective = relative_pid2_stair_objective({'sum_of_deltas': 1.0})
+        assert objective.min_budget * 100 / 3 == pytest.approx(10 * 0.1)
+        copy.deepcopy(objective)
+
+
+class TestTuners:
+    def test_successive_halving_finds_the_best(self):
+        result = tune_successive_halving(toy_objective(), {'x': Choice([0.0, 0.1, 0.3, 0.5, 0.9])}, n_configs=9,
+                                         min_budget=1 / 9, max_budget=1.0, eta=3)
+        assert result.best_params == {'x': 0.3}
+        assert result.best_value == pytest.approx(0.0)
+        assert sorted({x.budget for x in result.evaluations}) == pytest.approx([1 / 9, 1 / 3, 1.0])
+
+    def test_hyperband_budget(self):
+        result = hyperband(toy_objective(min_budget=1 / 3), {'x': Choice([0.0, 0.3])}, min_budget=1 / 9, eta=3)
+        assert result.best_params == {'x': 0.3}
+        # the evaluations below the minimum budget of the objective are run (and counted) at it
+        assert min(x.budget for x in result.evaluations) == pytest.approx(1 / 3)
+        assert result.used_budget == pytest.approx(sum(x.budget for x in result.evaluations))
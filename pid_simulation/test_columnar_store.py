@@ -0,0 +1,95 @@
+import gc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from columnar_store import ColumnarStore, ColumnarWriter, read_records, write_columns, write_records
+from plotting.modules.records_replica import read_utilization_records
+from soft_limit_with_tasks.task_executors import UtilizationRecord
+
+
+def records(n: int, start: float = 0) -> list:
+    # time of the first record is an int, as the simulator passes it
+    return [UtilizationRecord(usage=i * 0.5, demand=i * 1.5, actual_limit=10.0, time=start + i * 30 if i else 0,
+                              launched=i) for i in range(n)]
+
+
+def test_roundtrip_by_field_types(tmp_path):
+    path = write_columns(tmp_path / 'log.columns', records(100), metadata={'seed': 1})
+    store = ColumnarStore(path)
+    assert len(store) == 100 and store.metadata == {'seed': 1}
+    assert store.column('time').dtype == np.float64
+    assert store.column('launched').dtype == np.int64
+    assert store.column('time')[-1] == 99 * 30
+    assert store.load().equals(pd.DataFrame([x.__dict__ for x in records(100)]).astype({'time': float}))
+
+
+def test_time_range(tmp_path):
+    path = tmp_path / 'log.columns'
+    with ColumnarWriter(path, chunk_rows=7) as writer:
+        for record in records(100):
+            writer.append(record)
+    data = ColumnarStore(path).load(['time', 'usage'], time_range=(300, 600))
+    assert data['time'].tolist() == list(range(300, 600, 30))
+    assert list(data.columns) == ['time', 'usage']
+
+    shuffled = records(100)[::-1]
+    store = ColumnarStore(write_columns(tmp_path / 'shuffled.columns', shuffled))
+    assert not store.manifest['time_sorted']
+    assert sorted(store.load(time_range=(300, 600))['time']) == list(range(300, 600, 30))
+
+
+def test_lossy_values_are_rejected(tmp_path):
+    with pytest.raises(TypeError, match='launched'):
+        write_columns(tmp_path / 'b.columns', [UtilizationRecord(1.0, 1.0, 1.0, 0.0, launched=0.5)])
+    # a later chunk with floats in a column that started with ints
+    with pytest.raises(TypeError, match='x'):
+        with ColumnarWriter(tmp_path / 'c.columns', chunk_rows=1) as writer:
+            writer.extend([dict(time=0, x=1), dict(time=1, x=0.5)])
+    with pytest.raises(TypeError, match='not numeric'):
+        write_columns(tmp_path / 'd.columns', [dict(time=0, name='a')])
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_declared_dtypes(tmp_path):
+    path = write_columns(tmp_path / 'a.columns', [dict(time=0, x=1), dict(time=1, x=0.5)], dtypes={'x': float})
+    assert ColumnarStore(path).load()['x'].tolist() == [1.0, 0.5]
+    path = write_columns(tmp_path / 'b.columns', pd.DataFrame({'time': [0.0, 1.0], 'x': [1, 2]}),
+                         dtypes={'x': float})
+    assert ColumnarStore(path).column('x').dtype == np.float64
+    # declared types are checked too
+    with pytest.raises(TypeError, match='x'):
+        write_columns(tmp_path / 'c.columns', pd.DataFrame({'time': [0.0], 'x': [0.5]}), dtypes={'x': np.float32})
+
+
+def test_temporary_directory(tmp_path):
+    writer = ColumnarWriter(tmp_path / 'a.columns')
+    # nothing on disk before the first records
+    assert list(tmp_path.iterdir()) == []
+    writer.extend(records(10))
+    writer.flush()
+    assert len(list(tmp_path.iterdir())) == 1
+    # neither closed nor aborted
+    del writer
+    gc.collect()
+    assert list(tmp_path.iterdir()) == []
+
+    with pytest.raises(RuntimeError):
+        with ColumnarWriter(tmp_path / 'b.columns', chunk_rows=2) as writer:
+            writer.extend(records(10))
+            raise RuntimeError
+    assert list(tmp_path.iterdir()) == []
+
+    path = ColumnarWriter(tmp_path / 'empty.columns').close()
+    assert len(ColumnarStore(path)) == 0 and ColumnarStore(path).load().empty
+    assert [x.name for x in tmp_path.iterdir()] == ['empty.columns']
+
+
+@pytest.mark.parametrize('name', ['log.json', 'log.columns'])
+def test_read_records_of_both_formats(tmp_path, name):
+    write_records(records(20), tmp_path / name)
+    data = read_records(tmp_path / name, ['time', 'demand'], time_range=(60, 150))
+    assert data['time'].tolist() == [60, 90, 120]
+    assert data['demand'].tolist() == [3.0, 4.5, 6.0]
+    assert [x.__dict__ for x in read_utilization_records(tmp_path / name)] == [x.__dict__ for x in records(20)]
@@ -0,0 +1,66 @@
+import contextlib
+import io
+
+import pytest
+
+import sweep_queue
+from experiment_cache import ExperimentCache, ExperimentConfig
+
+PARAMS = dict(launcher='relative_pid', launcher_params=dict(k_p=0.5, k_i=0.0001, k_d=0),
+              scenario_params=dict(simulated_duration=3000.0, logged_points=30))
+
+
+@pytest.fixture
+def counted_runs(monkeypatch):
+    runs = []
+    simulate = sweep_queue.test_on_stair_configurable
+
+    def counted(**kwargs):
+        runs.append(kwargs)
+        return simulate(**kwargs)
+
+    monkeypatch.setattr(sweep_queue, 'test_on_stair_configurable', counted)
+    return runs
+
+
+def metrics(params, cache=None):
+    # launchers print every decision
+    with contextlib.redirect_stdout(io.StringIO()):
+        return sweep_queue.SCENARIOS['constant'](params, cache)
+
+
+def test_hit_skips_the_simulation(tmp_path, counted_runs):
+    cache = ExperimentCache(tmp_path)
+    first = metrics(PARAMS, cache)
+    assert len(counted_runs) == 1 and cache.misses == 1
+
+    assert metrics(PARAMS, cache) == first
+    assert len(counted_runs) == 1 and cache.hits == 1
+
+    # a cached run gives the same metrics as a fresh one with the same seed
+    assert metrics(PARAMS) == pytest.approx(first)
+    assert len(counted_runs) == 2
+
+
+def test_other_params_or_seed_are_simulated(tmp_path, counted_runs):
+    cache = ExperimentCache(tmp_path)
+    metrics(PARAMS, cache)
+    metrics({**PARAMS, 'seed': 1}, cache)
+    metrics({**PARAMS, 'launcher_params': dict(k_p=0.1, k_i=0.0001, k_d=0)}, cache)
+    assert len(counted_runs) == 3 and cache.hits == 0
+    assert len(cache.configs()) == 3
+
+
+def test_invalidate(tmp_path):
+    cache = ExperimentCache(tmp_path)
+    config = ExperimentConfig.create('constant', {}, 'pid', dict(k_p=1), seed=0)
+    cache.put(config, [dict(usage=1.0, time=0.0)])
+    other = ExperimentConfig.create('stair', {}, 'pid', dict(k_p=1), seed=0)
+    cache.put(other, [dict(usage=2.0, time=0.0)])
+    assert cache.get(config)['usage'].tolist() == [1.0]
+
+    assert cache.invalidate(predicate=lambda x: x['scenario'] == 'stair') == 1
+    assert cache.get(other) is None
+    assert cache.invalidate_stale() == 0
+    assert cache.invalidate() == 1
+    assert cache.size() == 0
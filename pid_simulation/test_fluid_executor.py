@@ -0,0 +1,87 @@
+import contextlib
+import io
+
+import numpy as np
+
+from soft_limit_with_tasks.fluid_executor import (
+    FluidTaskExecutor,
+    survival_from_cdf,
+    survival_from_samples,
+    validate_fluid_executor,
+)
+from soft_limit_with_tasks.launchers import ProportionalLauncher
+from soft_limit_with_tasks.resources import SoftResourceProvider
+from task_model import Task
+
+
+def test_survival_from_samples():
+    survival = survival_from_samples(np.array([1.0, 2.0, 2.0, 4.0]), bin_width=1.0)
+    np.testing.assert_allclose(survival, [1.0, 0.75, 0.25, 0.25, 0.0, 0.0])
+
+
+def test_survival_from_cdf():
+    survival = survival_from_cdf(lambda ages: ages / 4, bin_width=1.0, max_duration=4.0)
+    np.testing.assert_allclose(survival, [1.0, 0.75, 0.5, 0.25, 0.0, 0.0])
+
+
+class TestFluidTaskExecutor:
+    def make_executor(self, capacity: float) -> FluidTaskExecutor:
+        # every task runs for 3 seconds
+        survival = survival_from_samples(np.array([3.0]), bin_width=1.0)
+        return FluidTaskExecutor(SoftResourceProvider(lambda t: capacity), survival, bin_width=1.0)
+
+    def test_work_finishes_after_its_duration(self):
+        executor = self.make_executor(capacity=10)
+        executor.launch_batch([Task(2.0, 3.0), Task(3.0, 3.0)], 0.0)
+        assert executor.get_usage(0.0) == 5.0
+        assert executor.get_usage(2.0) == 5.0
+        assert executor.get_usage(3.0) == 0.0
+        assert executor.finished == 5.0
+        assert executor.launched == 2
+
+    def test_pending_work_waits_for_capacity(self):
+        executor = self.make_executor(capacity=4)
+        executor.launch_batch([Task(3.0, 3.0), Task(3.0, 3.0)], 0.0)
+        assert executor.get_usage(0.0) == 4.0
+        assert executor.get_demand(0.0) == 6.0
+        executor.clear_finished(3.0)
+        executor.try_launch_pending(3.0)
+        assert executor.get_usage(3.0) == 2.0
+        assert executor.get_demand(3.0) == 2.0
+
+    def test_pause_keeps_demand(self):
+        capacity = [10.0]
+        survival = survival_from_samples(np.array([3.0]), bin_width=1.0)
+        executor = FluidTaskExecutor(SoftResourceProvider(lambda t: capacity[0]), survival, bin_width=1.0)
+        executor.launch(Task(8.0, 3.0), 0.0)
+        capacity[0] = 5.0
+        executor.pause_if_necessary(1.0)
+        assert executor.get_usage(1.0) == 5.0
+        assert executor.get_demand(1.0) == 8.0
+        assert executor.paused
+        capacity[0] = 10.0
+        executor.try_launch_paused(1.0)
+        assert executor.get_usage(1.0) == 8.0
+        assert not executor.paused
+
+
+def test_matches_task_executor_on_stair():
+    rng = np.random.default_rng(1)
+
+    def gen_task() -> Task:
+        return Task(max(0.1, rng.normal(1, 0.5)), max(1.0, rng.normal(10, 1)))
+
+    durations = np.maximum(1.0, np.random.default_rng(2).normal(10, 1, 100_000))
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = validate_fluid_executor(
+            make_launcher=lambda executor: ProportionalLauncher(executor, gen_task, optimistic_delta=0.1, step=20,
+                                                                period=1.0),
+            capacity_fun=lambda t: 300 if 100 <= t < 200 else 200,
+            survival=survival_from_samples(durations, bin_width=1.0),
+            bin_width=1.0,
+            queue_maintainer_period=1.0,
+            simulated_duration=300,
+            logged_points=300,
+        )
+    assert len(report.discrete) == len(report.fluid) == 300
+    assert report.usage_mae <= 0.015
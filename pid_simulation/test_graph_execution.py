@@ -0,0 +1,68 @@
+import pytest
+
+from graph_execution import (
+    Graph,
+    GraphExecutor,
+    GraphLogger,
+    ExecutionMetric,
+    ParallelExecution,
+    ParallelGraphLauncher,
+    SequentialExecution,
+    execute,
+    graph_batch,
+)
+from graph_execution.__main__ import simulate_launch_delay
+from simulator import Simulator
+
+
+# rows of parallel_graphs/parallel_graphs/{parallel,sequential}.csv written by the Rust implementation:
+# graphs_number, min_iters, max_iters, sum_iters for graph_depth=5, graph_width=5, bandwidth=1000
+@pytest.mark.parametrize('execution_cls, graphs_number, min_iters, max_iters, sum_iters', [
+    (ParallelExecution, 10, 5, 14, 95),
+    (ParallelExecution, 391, 5, 25, 9565),
+    (ParallelExecution, 4963, 120, 125, 605935),
+    (SequentialExecution, 10, 5, 5, 50),
+    (SequentialExecution, 391, 5, 10, 2910),
+    (SequentialExecution, 4963, 5, 125, 320375),
+])
+def test_execute_matches_rust_datasets(execution_cls, graphs_number, min_iters, max_iters, sum_iters):
+    execution = execution_cls(1000, graph_batch(graphs_number, depth=5, width=5))
+    metric = ExecutionMetric.calculate(execute(execution))
+    assert metric == ExecutionMetric(min_iters=min_iters, max_iters=max_iters, sum_iters=sum_iters)
+
+
+def test_empty_execution():
+    assert ExecutionMetric.calculate(execute(ParallelExecution(10, []))) == ExecutionMetric(0, 0, 0)
+
+
+class TestLauncherAndExecutor:
+    def test_sequential_queue(self):
+        executor = GraphExecutor(SequentialExecution(4, []), period=1)
+        launcher = ParallelGraphLauncher(executor, lambda: Graph(depth=2, width=3), launch_delay=1, period=1)
+        output_lines = []
+        Simulator([launcher, executor, GraphLogger(1, executor, output_lines)]).simulate(6)
+
+        # 6 cubes per second are launched and 4 are executed: the first graph takes 2 iterations,
+        # then every graph waits for the bandwidth left by the previous one
+        assert executor.finished_in == {0: 2, 1: 3, 2: 3}
+        assert [record.finished for record in output_lines] == [0, 1, 1, 2, 3, 3]
+        assert [record.running for record in output_lines] == [1, 1, 2, 2, 2, 3]
+        assert [record.demand for record in output_lines] == [3, 5, 7, 9, 11, 13]
+
+    def test_launch_delay_above_graph_duration(self):
+        result = simulate_launch_delay(5, ParallelExecution, bandwidth=10, gen_graph=lambda: Graph(depth=5, width=5),
+                                       iteration_period=1, simulated_duration=50, logged_points=10)
+        assert result.finished == 10
+        assert result.running == 0
+        assert result.mean_finished_in == 5
+
+    @pytest.mark.parametrize('launch_delay', [1, 2])
+    def test_no_graph_finished(self, launch_delay):
+        # 25 cubes every second or two are launched and 10 are executed, the parallel execution
+        # keeps all the graphs at the same progress, so none of them finishes
+        result = simulate_launch_delay(launch_delay, ParallelExecution, bandwidth=10,
+                                       gen_graph=lambda: Graph(depth=5, width=5),
+                                       iteration_period=1, simulated_duration=100, logged_points=10)
+        assert result.finished == 0
+        assert result.running == 100 // launch_delay
+        assert result.mean_finished_in is None
@@ -0,0 +1,88 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from benchmarks.bench_launchers import change_detector
+from soft_limit_with_tasks.change_detectors import CusumDetector, PageHinkleyDetector, reset_stale_sum
+from soft_limit_with_tasks.launchers import MpcLauncher
+from stop_conditions import MAX_SLOTS
+from task_model import Task
+
+
+class FakeExecutor:
+    def __init__(self, demand: float, usage: float):
+        self.demand = demand
+        self.usage = usage
+        self.launched = []
+
+    def get_demand(self, t: float) -> float:
+        return self.demand
+
+    def get_usage(self, t: float) -> float:
+        return self.usage
+
+    def launch(self, task: Task, t: float):
+        self.launched.append(task)
+
+
+def mpc(executor: FakeExecutor, **kwargs) -> MpcLauncher:
+    params = dict(optimistic_delta=0.1, step=5, size_mean=1.0, duration_mean=10, duration_dev=1, period=1)
+    return MpcLauncher(executor, lambda: Task(1.0, 10.0), **{**params, **kwargs})
+
+
+class TestMpcLauncher:
+    def test_slots_are_clamped_and_the_rest_is_carried(self):
+        # the demand is far below the target, the plan is at its bound max_slots
+        executor = FakeExecutor(demand=0.0, usage=1000.0)
+        launcher = mpc(executor, max_slots=50)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            launcher.do(0)
+        assert len(executor.launched) == 50
+        assert launcher.carry == pytest.approx(0.0)
+        assert 'plan=' not in output.getvalue()
+
+        # the carry of the earlier rounding takes the work over max_slots, it is launched later
+        launcher.carry = 30.0
+        assert launcher._get_slots(1) == 50
+        assert launcher.carry == pytest.approx(30.0)
+
+    def test_default_max_slots_is_below_the_limit(self):
+        executor = FakeExecutor(demand=0.0, usage=1e6)
+        launcher = mpc(executor)
+        assert launcher._get_slots(0) < MAX_SLOTS
+
+    def test_rounding_remainder_is_carried(self):
+        executor = FakeExecutor(demand=100.0, usage=100.0)
+        launcher = mpc(executor, size_mean=3.0)
+        slots = launcher._get_slots(0)
+        assert launcher.carry == pytest.approx(launcher.plan[0] - slots * 3.0)
+        assert abs(launcher.carry) <= 1.5
+
+
+@pytest.mark.parametrize('detector', [CusumDetector(threshold=1.0, drift=0.05),
+                                      PageHinkleyDetector(threshold=1.0, delta=0.05)])
+def test_detectors_find_a_step(detector):
+    signal = [200.0] * 20 + [300.0] * 20 + [200.0] * 20
+    changes = [(i, direction) for i, x in enumerate(signal) if (direction := detector.update(x))]
+    assert [direction for _, direction in changes] == [1, -1]
+    # a few samples after the step
+    assert 20 <= changes[0][0] <= 23 and 40 <= changes[1][0] <= 43
+
+
+def test_reset_stale_sum():
+    assert reset_stale_sum(-3.0, 1) == 0.0 and reset_stale_sum(3.0, 1) == 3.0
+    assert reset_stale_sum(3.0, -1) == 0.0 and reset_stale_sum(3.0, 0) == 3.0
+
+
+@pytest.mark.parametrize('detector', ['cusum', 'page_hinkley'])
+@pytest.mark.parametrize('launcher', ['relative_pid2', 'kalman'])
+def test_change_detector_speeds_up_adaptation_on_the_stair(launcher, detector):
+    # an overflow of the kalman filter would make the baseline a run of NaN slots
+    with np.errstate(all='raise'):
+        _, before = change_detector(launcher, 'none')()
+        _, after = change_detector(launcher, detector)()
+    # relative_pid2: 2700 -> 60 seconds, kalman: 900 -> 60
+    assert after['time_to_descend'] * 10 < before['time_to_descend']
+    assert after['time_to_ascend'] <= before['time_to_ascend']
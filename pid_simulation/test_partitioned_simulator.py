@@ -0,0 +1,94 @@
+import contextlib
+import functools
+import io
+
+import pytest
+
+from partitioned_simulator import Partition, PartitionedSimulator, ProportionalShare, pool_partition
+from simulator import Simulator, StopSimulation
+
+DURATION = 6000.0
+
+
+def small_pool(index: int) -> Partition:
+    return pool_partition(index, seed=1, task_duration=1000.0, logged_points=20, duration=DURATION)
+
+
+def same_capacity(t, demands):
+    return [250.0] * len(demands)
+
+
+@pytest.mark.parametrize('workers', [0, 1])
+def test_one_partition_matches_a_plain_simulator(workers):
+    partition = small_pool(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        Simulator(partition.processes).simulate(DURATION)
+    expected = partition.results()
+
+    # the signal at every barrier is the capacity the pool already has
+    simulator = PartitionedSimulator(small_pool, partitions=1, sync_interval=700, combine=same_capacity,
+                                     workers=workers)
+    assert simulator.simulate(DURATION) == [expected]
+    assert simulator.syncs == 9
+    assert simulator.stop_reasons == [None]
+
+
+class Clock:
+    """
+    Reports the time of its last event, it must not be past the barrier
+    """
+
+    def __init__(self, period: float, stop_at: float = None):
+        self.period = period
+        self.stop_at = stop_at
+        self.last = 0.0
+        self.calls = 0
+
+    def do(self, t: float):
+        self.calls += 1
+        self.last = t
+        if self.stop_at is not None and t >= self.stop_at:
+            raise StopSimulation('custom', f'at {t}')
+
+
+def clock_partition(index: int, stop_at: float = None) -> Partition:
+    clock = Clock(period=70 + 30 * index, stop_at=stop_at if index == 1 else None)
+    return Partition(processes=[clock], report=lambda t: (t, clock.last), results=lambda: (clock.calls, clock.last))
+
+
+class RecordingShare(ProportionalShare):
+    def __init__(self):
+        super().__init__(total_capacity=1.0)
+        self.reports = []
+
+    def __call__(self, t, reports):
+        self.reports.append((t, reports))
+        return super().__call__(t, [1.0] * len(reports))
+
+
+def test_combine_sees_state_up_to_the_barrier():
+    combine = RecordingShare()
+    PartitionedSimulator(clock_partition, partitions=3, sync_interval=250, combine=combine, workers=0).simulate(1000)
+    assert [t for t, _ in combine.reports] == [250, 500, 750, 1000]
+    for until, reports in combine.reports:
+        for index, (t, last) in enumerate(reports):
+            assert t == until
+            # the last event before the barrier has run, none at or after it
+            assert until - (70 + 30 * index) <= last < until
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_stopped_partition_is_not_run_again(workers):
+    combine = RecordingShare()
+    simulator = PartitionedSimulator(functools.partial(clock_partition, stop_at=300), partitions=3,
+                                     sync_interval=250, combine=combine, workers=workers)
+    results = simulator.simulate(1000)
+
+    reason = simulator.stop_reasons[1]
+    assert simulator.stop_reasons[0] is None and simulator.stop_reasons[2] is None
+    assert reason.reason == 'custom' and reason.time == 300
+    # the stopping event ran once, the partition was not simulated at the later barriers
+    assert results[1] == (4, 300)
+    assert results[0] == (len(range(0, 1000, 70)), 980)
+    # and it keeps reporting the state it stopped in
+    assert [reports[1] for _, reports in combine.reports] == [(250, 200), (300, 300), (300, 300), (300, 300)]
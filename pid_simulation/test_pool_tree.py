@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from soft_limit_with_tasks.pool_tree import Pool, PoolResourceProvider, PoolTree, water_fill
+
+
+def pools(*specs) -> list:
+    # (demand, weight, guarantee)
+    result = []
+    for i, (demand, weight, guarantee) in enumerate(specs):
+        pool = Pool(f'p{i}', weight=weight, guarantee=guarantee)
+        pool.demand = demand
+        result.append(pool)
+    return result
+
+
+class TestWaterFill:
+    def test_unused_share_goes_to_the_others(self):
+        assert water_fill(pools((10, 1, 0), (100, 1, 0), (100, 1, 0)), 90) == pytest.approx([10, 40, 40])
+
+    def test_split_by_weights(self):
+        assert water_fill(pools((100, 2, 0), (100, 1, 0)), 90) == pytest.approx([60, 30])
+
+    def test_everyone_satisfied(self):
+        assert water_fill(pools((10, 1, 0), (20, 3, 0)), 100) == pytest.approx([10, 20])
+
+    def test_guarantees_first(self):
+        # the guaranteed 50 goes to the first pool, the remaining 50 is split equally
+        assert water_fill(pools((100, 1, 50), (100, 1, 0)), 100) == pytest.approx([75, 25])
+
+    def test_guarantee_above_demand(self):
+        assert water_fill(pools((10, 1, 50), (100, 1, 0)), 100) == pytest.approx([10, 90])
+
+    def test_unsatisfiable_guarantees_are_cut_proportionally(self):
+        assert water_fill(pools((100, 1, 60), (100, 1, 20)), 40) == pytest.approx([30, 10])
+
+
+def make_tree(capacity: float = 100.0) -> PoolTree:
+    root = Pool('root', children=[
+        Pool('research', weight=2, children=[Pool('a'), Pool('b', weight=3)]),
+        Pool('prod', guarantee=30, children=[Pool('c'), Pool('d')]),
+    ])
+    return PoolTree(lambda t: capacity, root)
+
+
+class TestPoolTree:
+    def test_hierarchical_fair_shares(self):
+        tree = make_tree()
+        for name in 'abcd':
+            tree.set_demand(name, 100)
+        # prod gets its guarantee 30 and a third of the other 70
+        assert tree.fair_share('prod', 0) == pytest.approx(30 + 70 / 3)
+        assert tree.fair_share('research', 0) == pytest.approx(70 * 2 / 3)
+        assert tree.fair_share('a', 0) == pytest.approx(70 * 2 / 3 / 4)
+        assert tree.fair_share('b', 0) == pytest.approx(70 * 2 / 3 * 3 / 4)
+        assert tree.fair_share('c', 0) == tree.fair_share('d', 0)
+        assert sum(tree.fair_share(name, 0) for name in 'abcd') == pytest.approx(100)
+
+    def test_incremental_matches_recomputation(self):
+        rng = random.Random(1)
+        tree = make_tree()
+        for _ in range(200):
+            name = rng.choice('abcd')
+            tree.set_demand(name, rng.uniform(0, 80))
+            fresh = make_tree()
+            for leaf in 'abcd':
+                fresh.set_demand(leaf, tree.pools[leaf].demand)
+            for pool in tree.pools:
+                assert tree.fair_share(pool, 0) == pytest.approx(fresh.fair_share(pool, 0))
+
+    def test_unchanged_subtree_is_not_recomputed(self):
+        tree = make_tree()
+        for name in 'abcd':
+            tree.set_demand(name, 10)
+        tree.fair_share('a', 0)
+        recomputed = tree.recomputed_pools
+        tree.fair_share('c', 0)
+        assert tree.recomputed_pools == recomputed
+
+        # everything fits, so a demand change of c is distributed only along its path, d and research keep theirs
+        tree.set_demand('c', 20)
+        tree.fair_share('a', 0)
+        assert tree.recomputed_pools == recomputed + 3
+
+    def test_resource_provider_and_orchid(self):
+        capacity = [40.0]
+        tree = PoolTree(lambda t: capacity[0], make_tree().root)
+        tree.set_demand('c', 50)
+        provider = PoolResourceProvider(tree, 'c')
+        assert provider.capacity_fun(0) == pytest.approx(40)
+        assert provider.try_alloc(0, 30)
+        assert not provider.try_alloc(0, 20)
+        tree.set_demand('a', 50)
+        # prod keeps its guarantee 30 and a third of the other 10
+        assert not provider.limit_exceeded(0)
+        capacity[0] = 20.0
+        assert provider.limit_exceeded(0)
+        orchid = tree.orchid('prod', 0)
+        assert orchid['resource_usage']['cpu'] == 30
+        assert orchid['resource_demand']['cpu'] == 50
+        assert orchid['fair_share']['cpu'] == pytest.approx(20)
+        provider.free(0, 30)
+        assert tree.pools['root'].usage == 0
@@ -0,0 +1,61 @@
+import json
+
+from profiling import SimulationProfiler
+from simulator import Simulator
+
+
+class Counter:
+    def __init__(self, period: float):
+        self.period = period
+        self.calls = 0
+
+    def do(self, t: float):
+        self.calls += 1
+
+
+class SlottedCounter:
+    __slots__ = ('period', 'calls')
+
+    def __init__(self, period: float):
+        self.period = period
+        self.calls = 0
+
+    def do(self, t: float):
+        self.calls += 1
+
+
+def test_counts_calls_per_process():
+    counter = Counter(10)
+    slotted = SlottedCounter(25)
+    profiler = SimulationProfiler()
+    Simulator([counter, slotted]).simulate(100, profiler=profiler)
+
+    report = profiler.report()
+    assert report['simulated_sec'] == 100
+    assert [(x['name'], x['calls']) for x in report['processes']] == [('Counter#0', 10), ('SlottedCounter#1', 4)]
+    assert report['processes'][0]['events_per_simulated_sec'] == 0.1
+    assert counter.calls == 10 and slotted.calls == 4
+    # the processes are not changed
+    assert 'do' not in vars(counter)
+
+
+def test_same_process_twice():
+    counter = Counter(10)
+    profiler = SimulationProfiler()
+    simulator = Simulator([counter, counter])
+    simulator.simulate(50, profiler=profiler)
+    simulator.simulate(100, profiler=profiler)
+
+    assert counter.calls == 20
+    assert [x['calls'] for x in profiler.report()['processes']] == [10, 10]
+    assert profiler.report()['simulated_sec'] == 100
+
+
+def test_trace_memory_and_json(tmp_path):
+    profiler = SimulationProfiler(trace_memory=True)
+    Simulator([Counter(10)]).simulate(100, profiler=profiler)
+    assert 'memory_delta' in profiler.summary()
+    profiler.to_json(tmp_path / 'profile.json')
+    report = json.loads((tmp_path / 'profile.json').read_text())
+    assert report['classes'][0]['name'] == 'Counter'
+    assert report['events'] == 10
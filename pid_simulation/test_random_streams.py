@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from kalman_experiments import Barrel, plant_noise
+from random_streams import PairedDifference, RandomStreams, StreamTaskGenerator, compare_launchers
+
+
+def test_streams_depend_on_seed_and_name():
+    assert RandomStreams(1)['task_size'].random() == RandomStreams(1)['task_size'].random()
+    assert RandomStreams(1)['task_size'].random() != RandomStreams(2)['task_size'].random()
+    assert RandomStreams(1)['task_size'].random() != RandomStreams(1)['task_duration'].random()
+
+
+def test_ith_task_does_not_depend_on_other_draws():
+    streams = RandomStreams(1)
+    gen_task = StreamTaskGenerator(streams, size_mean=1, size_dev=0.5, duration_mean=10, duration_dev=1)
+    expected = [gen_task() for _ in range(5)]
+
+    streams = RandomStreams(1)
+    gen_task = StreamTaskGenerator(streams, size_mean=1, size_dev=0.5, duration_mean=10, duration_dev=1)
+    # the plant draws in between
+    tasks = []
+    for _ in range(5):
+        streams['plant_noise'].normal(size=3)
+        tasks.append(gen_task())
+    assert [(x.size, x.duration) for x in tasks] == [(x.size, x.duration) for x in expected]
+
+
+def barrel_trajectory(streams, v: float) -> list:
+    barrel = Barrel(v, 5, d_dev=1, l_dev=1, v_dev=1, period=1, rng=plant_noise(streams))
+    trajectory = []
+    for t in range(20):
+        barrel.do(t)
+        trajectory.append(barrel.d)
+    return trajectory
+
+
+def test_barrel_plant_noise_is_common():
+    # the same noise, so the trajectories of different controls differ only by the control
+    a = np.array(barrel_trajectory(RandomStreams(3), v=5))
+    b = np.array(barrel_trajectory(RandomStreams(3), v=6))
+    assert a - b == pytest.approx(-np.arange(1, 21))
+    assert barrel_trajectory(RandomStreams(3), v=5) != barrel_trajectory(RandomStreams(4), v=5)
+
+
+def test_paired_difference_is_narrower_than_independent():
+    def run(launcher: str, streams: RandomStreams) -> float:
+        noise = streams['plant_noise'].normal(0, 10)
+        return noise + (1.0 if launcher == 'better' else 0.0)
+
+    report = compare_launchers(run, ['better', 'worse'], seeds=range(10))
+    difference, = report.differences
+    assert difference.mean == pytest.approx(1.0)
+    assert difference.half_width == pytest.approx(0.0, abs=1e-9)
+    assert difference.independent_half_width > 1
+    assert 'better - worse' in report.table()
+
+    difference = PairedDifference.calculate('a', 'b', [1.0, 2.0, 3.0], [1.0, 1.0, 1.0])
+    assert difference.mean == 1.0 and difference.ci_low < 1.0 < difference.ci_high
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from realtime import RealtimeRuntime, run_realtime
+
+
+class FakeClock:
+    """
+    Wall clock plus the busy time the processes simulate, so an overrun does not need a long sleep
+    """
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def __call__(self) -> float:
+        return time.monotonic() + self.offset
+
+
+class Recorder:
+    def __init__(self, period: float, busy=None, clock: FakeClock = None):
+        self.period = period
+        self.busy = busy or {}
+        self.clock = clock
+        self.calls = []
+        self.threads = set()
+
+    def do(self, t: float):
+        self.calls.append(t)
+        self.threads.add(threading.get_ident())
+        if len(self.calls) in self.busy:
+            self.clock.offset += self.busy[len(self.calls)]
+
+
+def test_steps_are_scheduled_without_drift():
+    recorder = Recorder(period=0.01)
+    stats, = run_realtime([recorder], duration=0.2, start_time=1000.0)
+
+    assert stats.steps == len(recorder.calls) > 1
+    # a sum of 0.01 drifts away from 1000 + k * 0.01 after a few steps, overruns skip whole periods
+    for t in recorder.calls:
+        k = round((t - 1000.0) / 0.01)
+        assert t == 1000.0 + k * 0.01
+    assert recorder.calls[0] == 1000.0
+
+
+def test_period_change_counts_from_the_changing_step():
+    recorder = Recorder(period=0.01)
+
+    def do(t: float):
+        Recorder.do(recorder, t)
+        if len(recorder.calls) == 3:
+            recorder.period = 0.03
+
+    recorder.do = do
+    run_realtime([recorder], duration=0.2)
+
+    changed = recorder.calls[2]
+    assert changed == 2 * 0.01
+    for t in recorder.calls[3:]:
+        k = round((t - changed) / 0.03)
+        assert k >= 1 and t == changed + k * 0.03
+
+
+def test_overrun_skips_the_missed_steps():
+    clock = FakeClock()
+    # the first step takes 1.25 s of the 0.5 s period: the steps at 0.5 and 1.0 are missed
+    recorder = Recorder(period=0.5, busy={1: 1.25}, clock=clock)
+    overruns = []
+    stats, = run_realtime([recorder], duration=1.6, clock=clock,
+                          on_overrun=lambda process, t, lateness: overruns.append((process, t, lateness)))
+
+    assert recorder.calls == [0.0, 1.5]
+    assert stats.steps == 2
+    assert stats.overruns == 1
+    assert stats.skipped_steps == 2
+    assert stats.max_lateness == pytest.approx(0.75, abs=0.1)
+    assert stats.busy_sec == pytest.approx(1.25, abs=0.1)
+    (process, t, lateness), = overruns
+    assert process is recorder and t == 0.5 and lateness == stats.max_lateness
+
+
+def test_offloaded_process_does_not_delay_the_others():
+    blocking = Recorder(period=0.3)
+    blocking.do = lambda t: (Recorder.do(blocking, t), time.sleep(0.2))
+    fast = Recorder(period=0.02)
+    blocking_stats, fast_stats = run_realtime([blocking, fast], duration=0.25, offload=[blocking])
+
+    assert blocking.calls == [0.0]
+    assert blocking.threads.isdisjoint(fast.threads)
+    assert fast.threads == {threading.get_ident()}
+    # the loop of fast kept running while blocking slept in the thread pool
+    assert fast_stats.steps + fast_stats.skipped_steps == 13
+    assert fast_stats.steps >= 10
+    assert blocking_stats.busy_sec == pytest.approx(0.2, abs=0.05)
+
+
+def test_exception_in_do_stops_all_loops():
+    class Failing:
+        period = 0.01
+
+        def do(self, t: float):
+            if t >= 0.05:
+                raise ValueError('broken process')
+
+    recorder = Recorder(period=0.01)
+    offloaded = Recorder(period=0.01)
+    started = time.monotonic()
+    with pytest.raises(ValueError, match='broken process'):
+        run_realtime([recorder, Failing(), offloaded], duration=10, offload=[offloaded])
+    assert time.monotonic() - started < 1
+    assert max(recorder.calls) < 0.1 and max(offloaded.calls) < 0.1
+
+
+class TestStop:
+    def test_stop_before_run(self):
+        recorder = Recorder(period=0.01)
+        runtime = RealtimeRuntime([recorder])
+        runtime.stop()
+        asyncio.run(runtime.run(duration=10))
+        assert recorder.calls == []
+        assert runtime.stats[0].steps == 0
+
+    @pytest.mark.parametrize('offload', [False, True])
+    def test_stop_from_do(self, offload):
+        recorder = Recorder(period=0.01)
+        runtime = RealtimeRuntime([recorder], offload=[recorder] if offload else [])
+
+        def do(t: float):
+            Recorder.do(recorder, t)
+            if len(recorder.calls) == 3:
+                runtime.stop()
+
+        recorder.do = do
+        asyncio.run(runtime.run(duration=10))
+        assert len(recorder.calls) == 3
+
+        # the stop does not carry over to the next run
+        asyncio.run(runtime.run(duration=0.05))
+        assert len(recorder.calls) > 3
@@ -0,0 +1,127 @@
+import copy
+import pickle
+import random
+
+import pytest
+
+from simulator import LatestRecord, SimulationSnapshot, Simulator, StopSimulation
+from soft_limit_with_tasks.task_executors import UtilizationRecord
+
+
+class Recorder:
+    def __init__(self, name: str, period: float, calls: list):
+        self.name = name
+        self.period = period
+        self.calls = calls
+        self.value = 0.0
+
+    def do(self, t: float):
+        # random, so the trajectory depends on the order of the calls and on the RNG state
+        self.value += random.random()
+        self.calls.append((self.name, t, self.value))
+
+
+def make_simulator(calls: list) -> Simulator:
+    return Simulator([Recorder('slow', 1000, calls), Recorder('fast', 300, calls), Recorder('odd', 70, calls)])
+
+
+def trajectory(*times: float) -> list:
+    random.seed(1)
+    calls = []
+    simulator = make_simulator(calls)
+    for time in times:
+        simulator.simulate(time)
+        assert simulator.t == time
+    return calls
+
+
+class TestSimulate:
+    def test_stops_before_time(self):
+        calls = []
+        simulator = Simulator([Recorder('slow', 1000, calls)])
+        simulator.simulate(300)
+        assert [t for _, t, _ in calls] == [0]
+        assert simulator.t == 300
+        simulator.simulate(1000)
+        assert [t for _, t, _ in calls] == [0]
+        simulator.simulate(1000.5)
+        assert [t for _, t, _ in calls] == [0, 1000]
+
+    @pytest.mark.parametrize('times', [(300, 5000), (1, 999, 1000, 2100, 5000), (70, 140, 3000, 5000)])
+    def test_chained_calls_match_one_call(self, times):
+        assert trajectory(*times) == trajectory(5000)
+
+    def test_fork_at_time_continues_the_same_trajectory(self):
+        expected = trajectory(5000)
+
+        random.seed(1)
+        calls = []
+        simulator = make_simulator(calls)
+        simulator.simulate(2000)
+        checkpoint = simulator.checkpoint(shared=[calls])
+        simulator.simulate(5000)
+        assert calls == expected
+
+        del calls[len([x for x in expected if x[1] < 2000]):]
+        fork = simulator.fork(checkpoint)
+        fork.simulate(5000)
+        assert calls == expected
+
+
+class Stopper:
+    period = 100
+
+    def do(self, t: float):
+        if t >= 500:
+            raise StopSimulation('custom')
+
+
+class TestSimulateIter:
+    def test_snapshots(self):
+        calls = []
+        simulator = Simulator([Recorder('slow', 1000, calls)])
+        snapshots = simulator.simulate_iter(3000, 300)
+        assert next(snapshots) == SimulationSnapshot(300, next_event_time=1000)
+        assert simulator.t == 300
+        assert [t for _, t, _ in calls] == [0]
+
+        rest = list(snapshots)
+        assert [x.time for x in rest] == [600, 900, 1200, 1500, 1800, 2100, 2400, 2700, 3000]
+        assert [x.next_event_time for x in rest] == [1000, 1000, 2000, 2000, 2000, 3000, 3000, 3000, 3000]
+        assert simulator.t == 3000
+        assert [t for _, t, _ in calls] == [0, 1000, 2000]
+
+    def test_break_and_continue_match_simulate(self):
+        random.seed(1)
+        calls = []
+        simulator = make_simulator(calls)
+        for snapshot in simulator.simulate_iter(5000, 700):
+            if snapshot.time >= 2100:
+                break
+        assert simulator.t == 2100
+        simulator.simulate(5000)
+        assert calls == trajectory(5000)
+
+    def test_sample(self):
+        calls = []
+        simulator = Simulator([Recorder('fast', 300, calls)])
+        latest = LatestRecord()
+        logger = Recorder('logger', 1, latest)
+        values = list(simulator.simulate_iter(1000, 500, sample=latest.sample(logger)))
+        assert [t for _, t, _ in values] == [500, 1000]
+        assert [t for _, t, _ in calls] == [0, 300, 600, 900]
+
+    def test_stop_ends_iteration(self):
+        simulator = Simulator([Stopper()])
+        assert [x.time for x in simulator.simulate_iter(1000, 200)] == [200, 400]
+        assert simulator.stop_reason.reason == 'custom'
+        assert simulator.stop_reason.time == 500
+
+
+class TestRecords:
+    def test_logged_records_are_shared_by_copies(self):
+        record = UtilizationRecord(usage=1.0, demand=2.0, actual_limit=3.0, time=0.0)
+        assert copy.deepcopy([record])[0] is record
+        assert copy.copy(record) == record
+        assert pickle.loads(pickle.dumps(record)) == record
+        assert record.__dict__ == {'usage': 1.0, 'demand': 2.0, 'actual_limit': 3.0, 'time': 0.0, 'launched': 0}
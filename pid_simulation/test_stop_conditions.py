@@ -0,0 +1,137 @@
+import pytest
+
+from simulator import Simulator, StopSimulation
+from stop_conditions import (
+    MAX_SLOTS,
+    Divergence,
+    SlotsLimitExceeded,
+    SteadyState,
+    WallTimeBudget,
+    check_slots,
+    demand_stop_conditions,
+)
+
+
+class Signal:
+    """
+    Process with a value changed by a function of time, read by the stop conditions
+    """
+
+    def __init__(self, fun, period: float = 100):
+        self.fun = fun
+        self.period = period
+        self.value = fun(0)
+        self.times = []
+
+    def do(self, t: float):
+        self.times.append(t)
+        self.value = self.fun(t)
+
+    def __call__(self, t: float) -> float:
+        return self.value
+
+
+class TestSteadyState:
+    def test_stops_when_signal_settles(self):
+        signal = Signal(lambda t: 100 + 1000 / (1 + t))
+        reason = Simulator([signal, SteadyState(signal, period=100, window=5, tolerance=0.02)]).simulate(100_000)
+        assert reason.reason == 'steady_state'
+        assert 0 < reason.time < 100_000
+
+    def test_not_before_min_time(self):
+        signal = Signal(lambda t: 100.0)
+        reason = Simulator([signal, SteadyState(signal, period=100, window=5, tolerance=0.02,
+                                                min_time=3000)]).simulate(10_000)
+        assert reason.time == 3000
+
+    def test_oscillation_is_not_steady(self):
+        signal = Signal(lambda t: 100 + (-1) ** int(t // 100) * 10)
+        simulator = Simulator([signal, SteadyState(signal, period=100, window=5, tolerance=0.02)])
+        assert simulator.simulate(10_000) is None
+        assert simulator.stop_reason is None
+
+
+class TestDivergence:
+    @pytest.mark.parametrize('fun', [lambda t: t, lambda t: float('nan') if t > 500 else 0.0])
+    def test_stops_out_of_bound(self, fun):
+        signal = Signal(fun)
+        reason = Simulator([signal, Divergence(signal, period=100, bound=550)]).simulate(10_000)
+        assert reason.reason == 'divergence'
+        assert reason.time == 600
+
+    def test_within_bound(self):
+        signal = Signal(lambda t: -t)
+        assert Simulator([signal, Divergence(signal, period=100, bound=10_000)]).simulate(5000) is None
+
+
+class FakeClock:
+    def __init__(self, step: float):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self) -> float:
+        self.now += self.step
+        return self.now
+
+
+def test_wall_time_budget():
+    # every check takes 2 seconds of wall time
+    budget = WallTimeBudget(period=100, budget_sec=5, clock=FakeClock(step=2))
+    reason = Simulator([budget]).simulate(10_000)
+    assert reason.reason == 'wall_time'
+    assert reason.time == 300
+    assert reason.detail == '6 s'
+
+
+def test_resume_after_stop():
+    signal = Signal(lambda t: t)
+    simulator = Simulator([signal, Divergence(signal, period=100, bound=550)])
+    assert simulator.simulate(1000).time == 600
+    assert signal.times[-1] == 600
+
+    # the stopping event is not repeated, the simulation continues with the next events
+    assert simulator.simulate(650) is None
+    assert simulator.t == 650
+    assert simulator.simulate(1000).time == 700
+    assert signal.times == list(range(0, 800, 100))
+
+
+def test_custom_stop_is_reported_at_its_time():
+    class Stopper:
+        period = 70
+
+        def do(self, t: float):
+            if t >= 200:
+                raise StopSimulation('custom', 'enough')
+
+    simulator = Simulator([Stopper()])
+    assert simulator.simulate(1000) == simulator.stop_reason
+    assert simulator.stop_reason == ('custom', 210, 'enough')
+    assert simulator.t == 210
+
+
+def test_launcher_divergence_raises():
+    check_slots(MAX_SLOTS - 1)
+
+    class Launcher:
+        period = 100
+
+        def do(self, t: float):
+            check_slots(MAX_SLOTS if t >= 300 else 0)
+
+    simulator = Simulator([Launcher()])
+    with pytest.raises(AssertionError) as error:
+        simulator.simulate(1000)
+    assert isinstance(error.value, SlotsLimitExceeded) and error.value.slots == MAX_SLOTS
+    assert simulator.stop_reason is None
+
+
+def test_demand_stop_conditions():
+    class Executor:
+        def get_demand(self, t: float) -> float:
+            return 1.0
+
+    conditions = demand_stop_conditions(Executor(), 300, steady_window=10, max_demand=100, wall_sec=60)
+    assert [type(x) for x in conditions] == [SteadyState, Divergence, WallTimeBudget]
+    assert all(x.period == 300 for x in conditions)
+    assert demand_stop_conditions(Executor(), 300) == []
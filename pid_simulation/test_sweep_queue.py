@@ -0,0 +1,84 @@
+import pytest
+
+from sweep_queue import DONE, FAILED, PENDING, RUNNING, SweepQueue, grid, work
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SweepQueue(tmp_path / 'sweep.db', max_attempts=2)
+
+
+def test_grid():
+    assert grid(a=[1, 2], b=[3]) == [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]
+
+
+def test_add_jobs_skips_existing(queue):
+    assert queue.add_jobs('c', 'stair', grid(x=[1, 2])) == 2
+    assert queue.add_jobs('c', 'stair', grid(x=[2, 3])) == 1
+    assert queue.add_jobs('other', 'stair', grid(x=[1])) == 1
+    assert queue.status() == {PENDING: 4}
+    assert queue.status('c') == {PENDING: 3}
+
+
+def test_complete_and_results(queue):
+    queue.add_jobs('c', 'stair', grid(x=[1, 2]))
+    first = queue.claim('w1', lease_sec=60)
+    second = queue.claim('w2', lease_sec=60)
+    assert (first.params, second.params) == ({'x': 1}, {'x': 2})
+    assert queue.claim('w3', lease_sec=60) is None
+
+    assert queue.complete(first, {'mae': 0.5})
+    assert queue.status() == {DONE: 1, RUNNING: 1}
+    assert queue.results('c') == [{'id': first.id, 'campaign': 'c', 'scenario': 'stair', 'x': 1, 'mae': 0.5}]
+
+
+def test_expired_lease_is_claimed_again(queue):
+    queue.add_jobs('c', 'stair', grid(x=[1]))
+    # the worker crashed: its lease has already expired
+    lost = queue.claim('w1', lease_sec=-1)
+    job = queue.claim('w2', lease_sec=60)
+    assert job.id == lost.id and job.attempts == 2
+
+    # the first worker lost the lease, its late result is dropped
+    assert not queue.extend_lease(lost, 60)
+    assert not queue.complete(lost, {'mae': 1.0})
+    assert queue.complete(job, {'mae': 0.5})
+    assert queue.results()[0]['mae'] == 0.5
+
+
+def test_lease_expired_too_many_times(queue):
+    queue.add_jobs('c', 'stair', grid(x=[1]))
+    queue.claim('w1', lease_sec=-1)
+    queue.claim('w2', lease_sec=-1)
+    assert queue.claim('w3', lease_sec=60) is None
+    assert queue.status() == {FAILED: 1}
+
+    assert queue.retry_failed('other') == 0
+    assert queue.retry_failed('c') == 1
+    job = queue.claim('w3', lease_sec=60)
+    assert job.attempts == 1
+
+
+def test_work_runs_and_resumes(tmp_path):
+    path = tmp_path / 'sweep.db'
+    queue = SweepQueue(path)
+    queue.add_jobs('c', 'square', grid(x=[1, 2, 3]))
+    queue.add_jobs('c', 'broken', grid(x=[1]))
+    # an interrupted worker left a job with an expired lease
+    queue.claim('crashed', lease_sec=-1)
+    calls = []
+
+    def square(params, cache):
+        calls.append(params['x'])
+        return {'y': params['x'] ** 2}
+
+    def broken(params, cache):
+        raise ValueError('diverged')
+
+    assert work(path, worker='w', scenarios={'square': square, 'broken': broken}) == 3
+    assert sorted(calls) == [1, 2, 3]
+    assert queue.status() == {DONE: 3, FAILED: 1}
+    assert [row['y'] for row in queue.results()] == [1, 4, 9]
+
+    # a failed scenario is not retried until asked
+    assert work(path, worker='w', scenarios={'square': square, 'broken': broken}) == 0
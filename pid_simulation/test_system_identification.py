@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from system_identification import (
+    ArxModel,
+    FopdtModel,
+    SurrogatePlant,
+    fit_arx,
+    fit_fopdt,
+    identification_data,
+    prescreen_pid,
+)
+
+
+def excitation(n: int, seed: int = 0) -> np.ndarray:
+    # launches held for a few samples, so slow modes are excited as well as fast ones
+    rng = np.random.default_rng(seed)
+    return np.repeat(rng.integers(0, 10, size=n // 5), 5).astype(np.float64)
+
+
+def fopdt_response(model: FopdtModel, u: np.ndarray, noise_std: float = 0.0, seed: int = 1) -> np.ndarray:
+    y = model.arx.simulate(u, [model.offset] * model.arx.lag)
+    return y + np.random.default_rng(seed).normal(0, noise_std, size=len(y))
+
+
+def test_identification_data_from_cumulative_launches():
+    records = pd.DataFrame({
+        'time': [0.0, 10.0, 20.0, 30.0],
+        'launched': [5, 7, 7, 12],
+        'demand': [1.0, 2.0, 3.0, 4.0],
+    })
+    u, y, period = identification_data(records)
+    assert u.tolist() == [0, 2, 0, 5]
+    assert y.tolist() == [1, 2, 3, 4]
+    assert period == 10
+
+
+def test_fit_arx_recovers_coefficients():
+    true = ArxModel(np.array([0.6, 0.2]), np.array([0.5, 0.3]), 1.0, nk=1, sample_period=1)
+    u = excitation(2000)
+    y = true.simulate(u, [5.0, 5.0]) + np.random.default_rng(1).normal(0, 0.01, size=len(u))
+
+    model, report = fit_arx(u, y, sample_period=1, na=2, nb=2, nk=1)
+    assert model.a == pytest.approx(true.a, abs=0.01)
+    assert model.b == pytest.approx(true.b, abs=0.01)
+    assert model.steady_state_gain == pytest.approx(true.steady_state_gain, rel=0.01)
+    assert report.r2_one_step > 0.99
+    assert report.fit_percent > 95
+
+
+def test_fit_fopdt_recovers_gain_time_constant_and_dead_time():
+    true = FopdtModel(gain=2.0, time_constant=50.0, delay=3, offset=10.0, sample_period=10.0)
+    u = excitation(1000)
+
+    model, report = fit_fopdt(u, fopdt_response(true, u, noise_std=0.01), sample_period=10.0, max_delay=10)
+    assert model.delay == 3
+    assert model.dead_time == 30
+    assert model.gain == pytest.approx(2.0, rel=0.01)
+    assert model.time_constant == pytest.approx(50.0, rel=0.01)
+    assert model.offset == pytest.approx(10.0, abs=0.5)
+    assert report.model == 'FOPDT(delay=3)'
+    assert not report.delay_at_max
+
+
+def test_fit_fopdt_flags_delay_at_max():
+    true = FopdtModel(gain=2.0, time_constant=50.0, delay=8, offset=0.0, sample_period=10.0)
+    u = excitation(1000)
+
+    model, report = fit_fopdt(u, fopdt_response(true, u), sample_period=10.0, max_delay=5)
+    assert model.delay == 5
+    assert report.delay_at_max
+
+
+class TestSurrogatePlant:
+    def test_steps_by_sample_period_after_dead_time(self):
+        model = FopdtModel(gain=2.0, time_constant=10.0, delay=2, offset=0.0, sample_period=10.0)
+        a = float(model.arx.a[0])
+        plant = SurrogatePlant(model)
+        plant.set_input(1.0, 0)
+
+        # the input reaches the output after the dead time of 2 samples
+        assert plant.get_output(5) == 0
+        assert plant.get_output(10) == 0
+        assert plant.get_output(20) == 0
+        assert plant.get_output(30) == pytest.approx(2 * (1 - a))
+        assert plant.get_output(40) == pytest.approx(2 * (1 - a ** 2))
+        assert plant.get_output(1000) == pytest.approx(2.0)
+
+    def test_clips_negative_input_and_output(self):
+        model = ArxModel(np.array([0.5]), np.array([1.0]), -1.0, nk=0, sample_period=1)
+        plant = SurrogatePlant(model, initial_output=1.0)
+        plant.set_input(-5.0, 0)
+        assert plant.input == 0
+        # 0.5 * 1 + 0 - 1 is clipped
+        assert plant.get_output(1) == 0
+
+
+def test_prescreen_pid_sorted_by_iae():
+    model = FopdtModel(gain=1.0, time_constant=30.0, delay=1, offset=0.0, sample_period=10.0)
+    gains = [(0, 0, 0), (0.5, 0.05, 0), (0.1, 0.005, 0)]
+
+    results = prescreen_pid(model, gains, target=lambda t: 100, duration=1000)
+    assert [x.iae for x in results] == sorted(x.iae for x in results)
+    assert [(x.k_p, x.k_i, x.k_d) for x in results] == [(0.5, 0.05, 0), (0.1, 0.005, 0), (0, 0, 0)]
+    # without control the output stays at 0: the error is the target for the whole run
+    assert results[-1].iae == pytest.approx(100 * 1000, rel=0.02)
+    assert results[-1].max_overshoot == 0
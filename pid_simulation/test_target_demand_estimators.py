@@ -0,0 +1,171 @@
+import contextlib
+import functools
+import io
+
+import numpy as np
+import pytest
+
+# the module is not imported by name: pytest would collect its test_on_stair_configurable
+import soft_limit_with_tasks.__main__ as scenarios
+from soft_limit_with_tasks.target_demand_estimators import (
+    EwmaEstimator,
+    ExponentialEstimator,
+    HoltEstimator,
+    HoltWintersEstimator,
+    QuantileEstimator,
+)
+
+MARGIN = 0.1
+MIN_OPTIMISTIC_SHIFT = 1.5
+
+
+class FakeResProvider:
+    def __init__(self, usage: float):
+        self.usage = usage
+
+
+def feed(estimator, res_provider: FakeResProvider, series) -> list:
+    """
+    Sets usage to every value of the series and runs the estimator, returns the target demands
+    """
+    targets = []
+    for i, usage in enumerate(series):
+        res_provider.usage = usage
+        estimator.do(i)
+        targets.append(estimator.get_target_demand(i))
+    return targets
+
+
+def make(estimator_cls, initial_usage: float, **kwargs):
+    res_provider = FakeResProvider(initial_usage)
+    estimator = estimator_cls(margin=MARGIN, min_optimistic_shift=MIN_OPTIMISTIC_SHIFT,
+                              res_provider=res_provider, period=1, **kwargs)
+    return estimator, res_provider
+
+
+def target(usage: float) -> float:
+    return max(usage + MIN_OPTIMISTIC_SHIFT, usage * (1 + MARGIN))
+
+
+class TestEwmaEstimator:
+    def test_constant(self):
+        estimator, res_provider = make(EwmaEstimator, 100, alpha=0.3)
+        feed(estimator, res_provider, [100] * 10)
+        assert estimator.level == 100
+        assert estimator.get_target_demand(10) == pytest.approx(110)
+
+    def test_ramp_lags_by_slope_over_alpha(self):
+        alpha, slope = 0.25, 2.0
+        estimator, res_provider = make(EwmaEstimator, 0, alpha=alpha)
+        feed(estimator, res_provider, slope * np.arange(1, 201))
+        # the steady state lag of an EWMA on a ramp is slope * (1 - alpha) / alpha
+        assert estimator.level == pytest.approx(400 - slope * (1 - alpha) / alpha)
+
+    def test_step(self):
+        estimator, res_provider = make(EwmaEstimator, 0, alpha=0.5)
+        targets = feed(estimator, res_provider, [100, 100, 100])
+        assert estimator.level == 87.5
+        assert targets == pytest.approx([target(50), target(75), target(87.5)])
+
+
+class TestHoltEstimator:
+    def test_constant(self):
+        estimator, res_provider = make(HoltEstimator, 100, alpha=0.5, beta=0.3, horizon=3)
+        feed(estimator, res_provider, [100] * 10)
+        assert estimator.level == 100
+        assert estimator.trend == 0
+        assert estimator.get_target_demand(10) == pytest.approx(110)
+
+    def test_ramp_is_tracked_without_lag(self):
+        estimator, res_provider = make(HoltEstimator, 0, alpha=0.5, beta=0.3, horizon=3)
+        feed(estimator, res_provider, 2.0 * np.arange(1, 201))
+        assert estimator.level == pytest.approx(400)
+        assert estimator.trend == pytest.approx(2.0)
+        assert estimator.forecast() == pytest.approx(406)
+        assert estimator.get_target_demand(200) == pytest.approx(target(406))
+
+    def test_forecast_is_not_negative(self):
+        estimator, res_provider = make(HoltEstimator, 100, alpha=1, beta=1, horizon=10)
+        feed(estimator, res_provider, [100, 50, 0])
+        assert estimator.trend == -50
+        assert estimator.forecast() == 0
+
+
+class TestHoltWintersEstimator:
+    SEASON = [0.0, 20.0, 0.0, -20.0]
+
+    def test_constant(self):
+        estimator, res_provider = make(HoltWintersEstimator, 100, alpha=0.5, beta=0.1, gamma=0.3,
+                                       season_length=4)
+        feed(estimator, res_provider, [100] * 20)
+        assert estimator.level == 100
+        assert estimator.trend == 0
+        assert estimator.seasonal == [0] * 4
+
+    def test_seasonal_series_is_forecast(self):
+        estimator, res_provider = make(HoltWintersEstimator, 100, alpha=0.2, beta=0.05, gamma=0.3,
+                                       season_length=4)
+        # usage[i] = 100 + SEASON[(i + 1) % 4], so do() of usage[i] updates phase (i + 1) % 4
+        series = [100 + self.SEASON[(i + 1) % 4] for i in range(400)]
+        feed(estimator, res_provider, series)
+        assert estimator.level == pytest.approx(100, abs=0.1)
+        assert estimator.trend == pytest.approx(0, abs=0.01)
+        assert estimator.seasonal == pytest.approx(self.SEASON, abs=0.1)
+        # the next usage is 100 + SEASON[401 % 4]
+        assert estimator.forecast() == pytest.approx(120, abs=0.2)
+
+    def test_seasonal_ramp(self):
+        estimator, res_provider = make(HoltWintersEstimator, 0, alpha=0.3, beta=0.1, gamma=0.3,
+                                       season_length=4)
+        series = [i + 100 + self.SEASON[(i + 1) % 4] for i in range(1, 801)]
+        feed(estimator, res_provider, series)
+        assert estimator.trend == pytest.approx(1, abs=0.01)
+        assert estimator.forecast() == pytest.approx(801 + 100 + self.SEASON[2], abs=0.5)
+
+
+class TestQuantileEstimator:
+    def test_initial_window_is_filled_with_usage(self):
+        estimator, _ = make(QuantileEstimator, 100, window=5, quantile=0.9)
+        assert estimator.value() == 100
+        assert estimator.get_target_demand(0) == pytest.approx(110)
+
+    def test_quantiles_of_the_window(self):
+        estimator, res_provider = make(QuantileEstimator, 0, window=5, quantile=0.5)
+        feed(estimator, res_provider, [5, 1, 4, 2, 3])
+        assert estimator.value() == 3
+        estimator.quantile = 1
+        assert estimator.value() == 5
+        estimator.quantile = 0
+        assert estimator.value() == 1
+
+    def test_ramp_drops_old_samples(self):
+        estimator, res_provider = make(QuantileEstimator, 0, window=10, quantile=0)
+        feed(estimator, res_provider, range(1, 101))
+        assert estimator.value() == 91
+
+    @pytest.mark.parametrize('quantile', [0, 0.25, 0.9, 1])
+    def test_matches_sorting_the_window(self, quantile):
+        window = 7
+        estimator, res_provider = make(QuantileEstimator, 0, window=window, quantile=quantile)
+        series = np.random.default_rng(0).integers(0, 20, size=200).astype(float)
+        for i, usage in enumerate(series):
+            feed(estimator, res_provider, [usage])
+            last = sorted(([0.0] * window + list(series[:i + 1]))[-window:])
+            assert estimator.value() == last[round(quantile * (window - 1))]
+
+
+@pytest.mark.parametrize('estimator', [
+    functools.partial(EwmaEstimator, alpha=1),
+    functools.partial(HoltEstimator, alpha=1, beta=0),
+    functools.partial(HoltWintersEstimator, alpha=1, beta=0, gamma=0, season_length=3),
+    functools.partial(QuantileEstimator, window=1, quantile=0.5),
+], ids=['ewma', 'holt', 'holt_winters', 'quantile'])
+def test_on_stair_degenerate_estimators_match_exponential(estimator):
+    # with these parameters every estimator follows the last usage, like ExponentialEstimator
+    launcher = functools.partial(scenarios.relative_pid_launcher, k_p=0.5, k_i=0.0001, k_d=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = scenarios.test_on_stair_configurable(**scenarios.STAIR_SCENARIO, launcher=launcher,
+                                                        estimator=ExponentialEstimator)
+        actual = scenarios.test_on_stair_configurable(**scenarios.STAIR_SCENARIO, launcher=launcher,
+                                                      estimator=estimator)
+    assert [x.__dict__ for x in actual] == [x.__dict__ for x in expected]
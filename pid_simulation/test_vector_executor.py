@@ -0,0 +1,98 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from simulator import Simulator
+from soft_limit_with_tasks.launchers import ProportionalLauncher
+from soft_limit_with_tasks.resources import SoftResourceProvider, VectorResourceProvider
+from soft_limit_with_tasks.task_executors import ResourceLogger, TaskExecutor, TaskExetutorQueueMaintainer
+from soft_limit_with_tasks.vector_executor import LimitingResourceView, VectorResourceLogger, VectorTaskExecutor
+from task_model import Task, VectorTask
+
+
+def stair(t: float) -> float:
+    return 300 if 100 <= t < 200 else 200
+
+
+def run_scalar(seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    executor = TaskExecutor(SoftResourceProvider(stair))
+    output_lines = []
+
+    def gen_task() -> Task:
+        return Task(max(0.1, rng.normal(1, 0.5)), max(1.0, rng.normal(10, 1)))
+
+    Simulator([
+        TaskExetutorQueueMaintainer(1.0, executor),
+        ProportionalLauncher(executor, gen_task, optimistic_delta=0.1, step=20, period=1.0),
+        ResourceLogger(period=1.0, executor=executor, output_lines=output_lines),
+    ]).simulate(300)
+    return [(x.time, x.usage, x.demand) for x in output_lines]
+
+
+def run_vector(seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    executor = VectorTaskExecutor(VectorResourceProvider(lambda t: np.array([stair(t)]), ['cpu']))
+    output_lines = []
+
+    def gen_task() -> VectorTask:
+        return VectorTask((max(0.1, rng.normal(1, 0.5)),), max(1.0, rng.normal(10, 1)))
+
+    Simulator([
+        TaskExetutorQueueMaintainer(1.0, executor),
+        ProportionalLauncher(LimitingResourceView(executor), gen_task, optimistic_delta=0.1, step=20, period=1.0),
+        VectorResourceLogger(period=1.0, executor=executor, output_lines=output_lines),
+    ]).simulate(300)
+    return [(x.time, x.usage[0], x.demand[0]) for x in output_lines]
+
+
+def test_one_resource_matches_task_executor():
+    with contextlib.redirect_stdout(io.StringIO()):
+        scalar = run_scalar(seed=1)
+        vector = run_vector(seed=1)
+    assert len(scalar) == len(vector) == 300
+    for (t, usage, demand), (vector_t, vector_usage, vector_demand) in zip(scalar, vector):
+        assert vector_t == t
+        assert vector_usage == pytest.approx(usage, abs=1e-9)
+        assert vector_demand == pytest.approx(demand, abs=1e-9)
+
+
+class TestVectorTaskExecutor:
+    def make_executor(self, capacity) -> VectorTaskExecutor:
+        return VectorTaskExecutor(VectorResourceProvider(lambda t: np.asarray(capacity), ['ram', 'cpu']))
+
+    def test_task_fits_only_if_every_resource_fits(self):
+        executor = self.make_executor([10.0, 4.0])
+        executor.launch(VectorTask((3.0, 3.0), 10.0), 0.0)
+        executor.launch(VectorTask((3.0, 3.0), 10.0), 0.0)
+        np.testing.assert_array_equal(executor.get_usage(0.0), [3.0, 3.0])
+        np.testing.assert_array_equal(executor.get_demand(0.0), [6.0, 6.0])
+        # the first task finishes after 10, the pending one starts
+        executor.clear_finished(10.5)
+        executor.try_launch_pending(10.5)
+        np.testing.assert_array_equal(executor.get_usage(10.5), [3.0, 3.0])
+        np.testing.assert_array_equal(executor.get_demand(10.5), [3.0, 3.0])
+
+    def test_pauses_earliest_tasks_until_every_resource_fits(self):
+        capacity = [10.0, 10.0]
+        executor = self.make_executor(capacity)
+        for i in range(3):
+            executor.launch(VectorTask((1.0, 3.0), 10.0), float(i))
+        capacity[1] = 7.0
+        executor.pause_if_necessary(5.0)
+        np.testing.assert_array_equal(executor.get_usage(5.0), [2.0, 6.0])
+        np.testing.assert_array_equal(executor.get_demand(5.0), [3.0, 9.0])
+        # the paused task started at 0 and has 5 seconds left
+        assert list(executor.paused) == [VectorTask((1.0, 3.0), 5.0)]
+
+    def test_limiting_resource_view(self):
+        executor = self.make_executor([10.0, 4.0])
+        for _ in range(3):
+            executor.launch(VectorTask((1.0, 2.0), 10.0), 0.0)
+        view = LimitingResourceView(executor)
+        # ram: usage 2, demand 3, cpu: usage 4, demand 6, both 1.5, the first one wins
+        assert view.limiting(0.0) == (0, 2.0, 3.0)
+        executor.launch(VectorTask((0.0, 2.0), 10.0), 0.0)
+        assert view.limiting(0.0) == (1, 4.0, 8.0)
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulator import Simulator
+from soft_limit_with_tasks.resources import SoftResourceProvider
+from soft_limit_with_tasks.task_executors import TaskExecutor
+from soft_limit_with_tasks.workloads import TRACE_COLUMNS, TraceWorkload, iter_trace, write_binary_trace
+from task_model import Task
+
+ARRIVAL = np.array([0.0, 0.0, 5.0, 12.0, 12.0, 12.5, 30.0])
+SIZE = np.array([1.0, 2.0, 1.0, 3.0, 1.0, 2.0, 1.0])
+DURATION = np.array([10.0, 20.0, 10.0, 5.0, 5.0, 1.0, 100.0])
+
+
+@pytest.fixture
+def csv_trace(tmp_path):
+    path = tmp_path / 'trace.csv'
+    pd.DataFrame({'arrival': ARRIVAL, 'size': SIZE, 'duration': DURATION}).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def binary_trace(tmp_path, csv_trace):
+    path = tmp_path / 'trace.bin'
+    write_binary_trace(iter_trace(csv_trace, chunk_size=3), path)
+    return path
+
+
+def concatenated(chunks):
+    chunks = list(chunks)
+    return [np.concatenate([chunk[i] for chunk in chunks]) for i in range(len(TRACE_COLUMNS))]
+
+
+class TestIterTrace:
+    @pytest.mark.parametrize('chunk_size', [1, 3, 100])
+    def test_formats_read_the_same_trace(self, csv_trace, binary_trace, chunk_size):
+        for path in (csv_trace, binary_trace):
+            chunks = list(iter_trace(path, chunk_size))
+            assert max(len(chunk[0]) for chunk in chunks) <= chunk_size
+            arrival, size, duration = concatenated(chunks)
+            np.testing.assert_array_equal(arrival, ARRIVAL)
+            np.testing.assert_array_equal(size, SIZE)
+            np.testing.assert_array_equal(duration, DURATION)
+
+    def test_parquet(self, tmp_path):
+        pytest.importorskip('pyarrow')
+        path = tmp_path / 'trace.parquet'
+        pd.DataFrame({'arrival': ARRIVAL, 'size': SIZE, 'duration': DURATION}).to_parquet(path)
+        arrival, size, duration = concatenated(iter_trace(path, chunk_size=3))
+        np.testing.assert_array_equal(arrival, ARRIVAL)
+        np.testing.assert_array_equal(duration, DURATION)
+
+
+class TestTraceWorkload:
+    def test_launches_at_arrival_times(self, binary_trace):
+        executor = TaskExecutor(SoftResourceProvider(lambda t: 100))
+        launches = []
+        executor.launch_batch = lambda tasks, t: launches.append((t, tasks))
+        workload = TraceWorkload(executor, binary_trace, chunk_size=2)
+        Simulator([workload]).simulate(100)
+
+        assert [t for t, _ in launches] == [0.0, 5.0, 12.0, 12.5, 30.0]
+        assert [len(tasks) for _, tasks in launches] == [2, 1, 2, 1, 1]
+        assert launches[2][1] == [Task(3.0, 5.0), Task(1.0, 5.0)]
+        assert workload.launched == len(ARRIVAL)
+        assert workload.period == float('inf')
+
+    def test_time_shift(self, binary_trace):
+        executor = TaskExecutor(SoftResourceProvider(lambda t: 100))
+        workload = TraceWorkload(executor, binary_trace, time_shift=10.0)
+        Simulator([workload]).simulate(1)
+        # everything that arrived before 10 is launched at once, the next arrival is 12 - 10
+        assert workload.launched == 3
+        assert workload.period == 2.0
+
+    @pytest.mark.parametrize('trace', ['binary_trace', 'csv_trace'])
+    def test_fork_continues_from_the_same_row(self, trace, request):
+        path = request.getfixturevalue(trace)
+        executor = TaskExecutor(SoftResourceProvider(lambda t: 100))
+        simulator = Simulator([TraceWorkload(executor, path, chunk_size=2)])
+        simulator.simulate(12.2)
+        checkpoint = simulator.checkpoint()
+        simulator.simulate(100)
+
+        fork = simulator.fork(checkpoint)
+        workload = fork.processes[0]
+        assert workload.launched == 5
+        fork.simulate(100)
+        assert workload.launched == len(ARRIVAL)
+        assert fork.processes[0].executor.get_demand(100) == executor.get_demand(100)
+
+
+class TestLaunchBatch:
+    def test_same_as_launching_one_by_one(self):
+        tasks = [Task(size, duration) for size, duration in zip(SIZE, DURATION)]
+        one_by_one = TaskExecutor(SoftResourceProvider(lambda t: 5))
+        batch = TaskExecutor(SoftResourceProvider(lambda t: 5))
+        for t in (0.0, 15.0):
+            for task in tasks:
+                one_by_one.launch(task, t)
+            batch.launch_batch(tasks, t)
+
+            assert batch.running == one_by_one.running
+            assert list(batch.pending) == list(one_by_one.pending)
+            assert batch.get_usage(t) == one_by_one.get_usage(t)
+            assert batch.get_demand(t) == one_by_one.get_demand(t)
+            assert batch.launched == one_by_one.launched
@@ -0,0 +1,181 @@
+"""
+Metrics of quota decisions, exportable in OpenMetrics text format.
+
+Quota managers report to a MetricsRegistry. By default it is NULL_REGISTRY, which does nothing,
+so the instrumentation costs a few no-op calls per decision.
+"""
+import bisect
+import functools
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels_key(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    labels = labels + extra
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in labels) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: Labels) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(labels, (("le", _format_value(float(bound))),))} {cumulative}')
+        lines.append(f'{name}_count{_format_labels(labels)} {self.count}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(self.sum)}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """
+    Keeps counters, gauges and histograms in memory.
+    A metric is created on first use, its labels are passed as a dict.
+    """
+
+    def __init__(self, prefix: str = '', buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.help: Dict[str, str] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def describe(self, name: str, help_text: str):
+        self.help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None):
+        family = self.counters.setdefault(name, {})
+        key = _labels_key(labels)
+        family[key] = family.get(key, 0) + value
+
+    def set(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        self.gauges.setdefault(name, {})[_labels_key(labels)] = value
+
+    def histogram(self, name: str, labels: Optional[Dict[str, str]] = None) -> Histogram:
+        family = self.histograms.setdefault(name, {})
+        key = _labels_key(labels)
+        histogram = family.get(key)
+        if histogram is None:
+            histogram = family[key] = Histogram(self.buckets)
+        return histogram
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        self.histogram(name, labels).observe(value)
+
+    def time(self, name: str, labels: Optional[Dict[str, str]] = None):
+        """
+        Context manager observing the duration of its body in seconds
+        """
+        return _Timer(self.histogram(name, labels))
+
+    def to_openmetrics(self) -> str:
+        lines = []
+        for kind, families in (('counter', self.counters), ('gauge', self.gauges), ('histogram', self.histograms)):
+            for name in sorted(families):
+                full_name = self.prefix + name
+                lines.append(f'# TYPE {full_name} {kind}')
+                if name in self.help:
+                    lines.append(f'# HELP {full_name} {_escape(self.help[name])}')
+                for labels, value in sorted(families[name].items()):
+                    if kind == 'counter':
+                        lines.append(f'{full_name}_total{_format_labels(labels)} {_format_value(value)}')
+                    elif kind == 'gauge':
+                        lines.append(f'{full_name}{_format_labels(labels)} {_format_value(value)}')
+                    else:
+                        lines.extend(value.samples(full_name, labels))
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+class NullRegistry(MetricsRegistry):
+    """
+    Registry of disabled metrics: every call is a no-op
+    """
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None):
+        pass
+
+    def set(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        pass
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        pass
+
+    def time(self, name: str, labels: Optional[Dict[str, str]] = None):
+        return _NULL_TIMER
+
+
+NULL_REGISTRY = NullRegistry()
+
+
+def timed(name: str, **labels: str):
+    """
+    Method decorator observing the method duration into self.metrics
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.time(name, labels):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
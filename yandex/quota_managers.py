@@ -3,13 +3,17 @@ import logging
 from abc import ABC, abstractmethod
 
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Callable, List, Optional
 
+import numpy as np
+from filterpy.kalman import KalmanFilter
 from ott.drm.library.python.packager_task.clients import PackagerTasksApiClient
 from ott.drm.library.python.packager_task.models import TaskStatus, PackagerTask
 from yweb.video.faas.graphs.ott.common import Priority
 from yt.wrapper import YtClient
 
+from metrics import MetricsRegistry, NULL_REGISTRY, timed
+
 
 class QuotaManager(ABC):
     def __init__(
@@ -17,28 +21,35 @@ class QuotaManager(ABC):
         tasks_client: PackagerTasksApiClient,
         nirvana_quota: str,
         vod_providers: List[str],
-        parallel_graph_launch_delay_sec: int
+        parallel_graph_launch_delay_sec: int,
+        metrics: Optional[MetricsRegistry] = None,
+        clock: Optional[Callable[[], datetime]] = None,
     ):
         self.tasks_client = tasks_client
         self.nirvana_quota = nirvana_quota
         self.vod_providers = vod_providers
         self.parallel_graph_launch_delay_sec = parallel_graph_launch_delay_sec
+        self.metrics = metrics or NULL_REGISTRY
+        self.clock = clock or datetime.utcnow
 
     @abstractmethod
     def available_slots(self) -> int:
         pass
 
+    @timed('quota_decision_seconds', decision='can_launch_parallel_graph')
     def can_launch_parallel_graph(self) -> bool:
-        recent_parallel_graphs_cnt = self.tasks_client.count(
-            [TaskStatus.PACKAGING],
-            nirvana_quota=self.nirvana_quota,
-            vod_providers=self.vod_providers,
-            parallel_encoding=True,
-            update_time_lower_bound=datetime.utcnow() - timedelta(seconds=self.parallel_graph_launch_delay_sec)
-        )
+        with self.metrics.time('quota_external_call_seconds', {'call': 'tasks_count'}):
+            recent_parallel_graphs_cnt = self.tasks_client.count(
+                [TaskStatus.PACKAGING],
+                nirvana_quota=self.nirvana_quota,
+                vod_providers=self.vod_providers,
+                parallel_encoding=True,
+                update_time_lower_bound=self.clock() - timedelta(seconds=self.parallel_graph_launch_delay_sec)
+            )
 
         return recent_parallel_graphs_cnt == 0
 
+    @timed('quota_decision_seconds', decision='filter_tasks_to_launch')
     def filter_tasks_to_launch(self, tasks: list[PackagerTask]) -> list[PackagerTask]:
         max_priority_tasks = [
             task
@@ -64,6 +75,7 @@ class QuotaManager(ABC):
 
             if task.is_parallel_encoding():
                 if not can_launch_parallel_graph:
+                    self.metrics.inc('quota_parallel_encoding_blocked')
                     logging.info(f'Parallel encoding quota limit is reached! '
                                  f'Task {task} will be launched later')
                     continue
@@ -75,8 +87,10 @@ class QuotaManager(ABC):
             can_launch -= 1
 
         if other_tasks:
+            self.metrics.inc('quota_reached')
             logging.info('Quota limit is reached!')
-            logging.debug(f'Tasks({len(other_tasks)}): {other_tasks} will be launched later')
+            # formatted lazily: the backlog may be long and debug is usually disabled
+            logging.debug('Tasks(%d): %s will be launched later', len(other_tasks), other_tasks)
 
         return tasks_to_launch
 
@@ -93,6 +107,30 @@ class DemandUsageData:
     demand: ResourcesData
 
 
+def get_demand_usage(
+    yt_client: YtClient,
+    nirvana_quota: str,
+    metrics: MetricsRegistry = NULL_REGISTRY
+) -> Optional[DemandUsageData]:
+    table = '//sys/scheduler/orchid/scheduler/scheduling_info_per_pool_tree/physical/fair_share_info/' \
+            f'pools/nirvana-{nirvana_quota}'
+    try:
+        with metrics.time('quota_external_call_seconds', {'call': 'yt_get'}):
+            row = yt_client.get(table)
+    except Exception as e:
+        logging.error(f"Error while getting yt table: {e}")
+        return
+
+    try:
+        return DemandUsageData(
+            usage=ResourcesData(ram=row['resource_usage']['user_memory'], cpu=row['resource_usage']['cpu']),
+            demand=ResourcesData(ram=row['resource_demand']['user_memory'], cpu=row['resource_demand']['cpu'])
+        )
+    except KeyError as e:
+        logging.error(f"Error '{e}' while parsing yt response:\n{row}")
+        return
+
+
 class ResourceQuotaManager(QuotaManager):
     """
     Attributes:
@@ -109,15 +147,19 @@ class ResourceQuotaManager(QuotaManager):
         nirvana_quota: str,
         vod_providers: List[str],
         parallel_graph_launch_delay_sec: int,
+        metrics: Optional[MetricsRegistry] = None,
+        clock: Optional[Callable[[], datetime]] = None,
     ):
-        super().__init__(tasks_client, nirvana_quota, vod_providers, parallel_graph_launch_delay_sec)
+        super().__init__(tasks_client, nirvana_quota, vod_providers, parallel_graph_launch_delay_sec, metrics, clock)
         self.yt_client = yt_client
         self.max_demand_usage_diff = max_demand_usage_diff
         self.step = step
 
+    @timed('quota_decision_seconds', decision='available_slots')
     def available_slots(self) -> int:
         yt = self._get_demand_usage()
         if yt is None:
+            self.metrics.inc('quota_yt_error_zero_slots')
             logging.error("Can't get YT resource usage or demand. Not launching tasks.")
             return 0
         if yt.demand.cpu < yt.usage.cpu or yt.demand.ram < yt.usage.ram:
@@ -136,9 +178,11 @@ class ResourceQuotaManager(QuotaManager):
 
         max_coef = 1 + self.max_demand_usage_diff
         limiting_resource, cur_coef = max([('ram', ram_coef), ('cpu', cpu_coef)], key=lambda p: p[1])
+        self.metrics.set('quota_cur_coef', cur_coef)
+        for resource in ('ram', 'cpu'):
+            self.metrics.set('quota_limiting_resource', int(resource == limiting_resource), {'resource': resource})
 
-        # rounding half up, so when the cur_coef is 1.001, slots is equal to step
-        slots = max(0, round(self.step * (max_coef - cur_coef) / (max_coef - 1)))
+        slots = self._get_slots(cur_coef)
         if slots == 0:
             logging.warning(
                 f'{limiting_resource} demand/usage reached {cur_coef}, which is too close / above {max_coef} limit.\n'
@@ -153,20 +197,175 @@ class ResourceQuotaManager(QuotaManager):
 
         return slots
 
+    def _get_slots(self, cur_coef: float) -> int:
+        max_coef = 1 + self.max_demand_usage_diff
+        # rounding half up, so when the cur_coef is 1.001, slots is equal to step
+        return max(0, round(self.step * (max_coef - cur_coef) / (max_coef - 1)))
+
     def _get_demand_usage(self) -> Optional[DemandUsageData]:
-        table = '//sys/scheduler/orchid/scheduler/scheduling_info_per_pool_tree/physical/fair_share_info/' \
-                f'pools/nirvana-{self.nirvana_quota}'
-        try:
-            row = self.yt_client.get(table)
-        except Exception as e:
-            logging.error(f"Error while getting yt table: {e}")
-            return
-
-        try:
-            return DemandUsageData(
-                usage=ResourcesData(ram=row['resource_usage']['user_memory'], cpu=row['resource_usage']['cpu']),
-                demand=ResourcesData(ram=row['resource_demand']['user_memory'], cpu=row['resource_demand']['cpu'])
-            )
-        except KeyError as e:
-            logging.error(f"Error '{e}' while parsing yt response:\n{row}")
-            return
+        return get_demand_usage(self.yt_client, self.nirvana_quota, self.metrics)
+
+
+class PidResourceQuotaManager(ResourceQuotaManager):
+    """
+    ResourceQuotaManager with integral and derivative terms added to the proportional rule
+    (the control law of RelativePidLauncher2 from the simulation).
+    The error is 1 + max_demand_usage_diff - demand/usage of the limiting resource.
+
+    Attributes:
+        k_i: Integral gain, slots per (error * second)
+        k_d: Derivative gain, slots per (error / second)
+        period_sec: Expected interval between available_slots calls. Used as dt when the real one is unknown
+    """
+
+    # dt is at most this many periods: the calls that returned early (YT errors, demand < usage) did not update
+    # t_prev, and the integral must not wind up by the error times the whole outage
+    MAX_DT_PERIODS = 2
+
+    def __init__(
+        self,
+        max_demand_usage_diff: float,
+        step: int,
+        k_i: float,
+        k_d: float,
+        period_sec: float,
+        tasks_client: PackagerTasksApiClient,
+        yt_client: YtClient,
+        nirvana_quota: str,
+        vod_providers: List[str],
+        parallel_graph_launch_delay_sec: int,
+        metrics: Optional[MetricsRegistry] = None,
+        clock: Optional[Callable[[], datetime]] = None,
+    ):
+        super().__init__(
+            max_demand_usage_diff, step, tasks_client, yt_client,
+            nirvana_quota, vod_providers, parallel_graph_launch_delay_sec, metrics, clock
+        )
+        self.k_i = k_i
+        self.k_d = k_d
+        self.period_sec = period_sec
+
+        self.e_prev = 0
+        self.e_integral = 0
+        self.t_prev: Optional[datetime] = None
+
+    def _get_slots(self, cur_coef: float) -> int:
+        now = self.clock()
+        dt = self.period_sec if self.t_prev is None else (now - self.t_prev).total_seconds()
+        if dt <= 0:
+            dt = self.period_sec
+        dt = min(dt, self.MAX_DT_PERIODS * self.period_sec)
+
+        e = 1 + self.max_demand_usage_diff - cur_coef
+        # unlike the simulation launcher, the integral is reset before it is used,
+        # so slots accumulated below the limit are not launched once the limit is crossed
+        if self.e_prev < 0 < e or self.e_prev > 0 > e:
+            self.e_integral = 0
+            logging.debug('PidResourceQuota: error crossed zero, resetting integral')
+        self.e_integral += e * dt
+
+        p = super()._get_slots(cur_coef)
+        i = self.k_i * self.e_integral
+        d = self.k_d * (e - self.e_prev) / dt
+        u = p + i + d
+
+        self.e_prev = e
+        self.t_prev = now
+
+        logging.debug(f'PidResourceQuota: {e=} {dt=} {p=} {i=} {d=}')
+        return round(max(0.0, u))
+
+
+class KalmanQuotaManager(QuotaManager):
+    """
+    Estimates the rate at which the pool drains queued graphs and launches
+    v_underutil of it (KalmanLauncher from the simulation).
+    Filter state is x = [l, v, d]: drain rate (graph-seconds per second),
+    launch rate (graphs per second) and queued work (graph-seconds).
+
+    Attributes:
+        graph_resources: Resources of one graph, converts demand - usage into the number of queued graphs
+        s_mean: Mean graph duration, seconds
+        s_dev: Deviation of the queued work per step (process noise)
+        l_dev: Deviation of the drain rate per step (process noise)
+        v_underutil: Fraction of the estimated drain rate to launch (usually close to 1)
+        period_sec: Expected interval between available_slots calls. Slots are computed for this interval
+    """
+
+    def __init__(
+        self,
+        graph_resources: ResourcesData,
+        s_mean: float,
+        s_dev: float,
+        l_dev: float,
+        v_underutil: float,
+        period_sec: float,
+        tasks_client: PackagerTasksApiClient,
+        yt_client: YtClient,
+        nirvana_quota: str,
+        vod_providers: List[str],
+        parallel_graph_launch_delay_sec: int,
+        metrics: Optional[MetricsRegistry] = None,
+        clock: Optional[Callable[[], datetime]] = None,
+    ):
+        super().__init__(tasks_client, nirvana_quota, vod_providers, parallel_graph_launch_delay_sec, metrics, clock)
+        self.yt_client = yt_client
+        self.graph_resources = graph_resources
+        self.s_mean = s_mean
+        self.v_underutil = v_underutil
+        self.period_sec = period_sec
+
+        self.f = KalmanFilter(dim_x=3, dim_z=2, dim_u=1)
+        self.f.x = np.array([1., 1., 0.])
+        self.f.H = np.array([[0., 1., 0.],
+                             [0., 0., 1.]])
+        self.f.P *= 100
+        self.f.R = np.array([[0., 0.],
+                             [0., 0.]])
+        self.f.Q = np.array([[l_dev ** 2, 0., 0.],
+                             [0., 0., 0.],
+                             [0., 0., s_dev ** 2]])
+        self.v = 1
+        self.t_prev: Optional[datetime] = None
+
+    @timed('quota_decision_seconds', decision='available_slots')
+    def available_slots(self) -> int:
+        yt = self._get_demand_usage()
+        if yt is None:
+            self.metrics.inc('quota_yt_error_zero_slots')
+            logging.error("Can't get YT resource usage or demand. Not launching tasks.")
+            return 0
+
+        now = self.clock()
+        dt = self.period_sec if self.t_prev is None else (now - self.t_prev).total_seconds()
+        if dt <= 0:
+            dt = self.period_sec
+
+        queued_graphs = max(
+            (yt.demand.ram - yt.usage.ram) / self.graph_resources.ram,
+            (yt.demand.cpu - yt.usage.cpu) / self.graph_resources.cpu,
+        )
+        d = queued_graphs * self.s_mean
+
+        self.f.F = np.array([[1., 0., 0.],
+                             [0., 1., 0.],
+                             [-dt, self.s_mean * dt, 1.]])
+        self.f.B = np.array([0, 1, self.s_mean * dt])
+        # graphs were launched at rate self.v since the previous call
+        self.f.predict(u=self.v - self.f.x[1])
+        self.f.update(np.array([self.v, d]))
+        self.v = max(0.0, self.f.x[0] / self.s_mean * self.v_underutil)
+        self.t_prev = now
+
+        slots = round(max(0.0, self.period_sec * self.v))
+        logging.debug(
+            f'KalmanQuota: '
+            f'{slots=} '
+            f'{queued_graphs=} '
+            f'{dt=} '
+            f'state={self.f.x} '
+        )
+        return slots
+
+    def _get_demand_usage(self) -> Optional[DemandUsageData]:
+        return get_demand_usage(self.yt_client, self.nirvana_quota, self.metrics)
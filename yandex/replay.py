@@ -0,0 +1,395 @@
+"""
+Offline replay of QuotaManager policies against recorded YT snapshots and task arrivals.
+
+The quota manager talks to fake YT and packager tasks clients, the launched tasks are executed by
+the soft limit task model from pid_simulation, so pid_simulation has to be importable:
+
+    PYTHONPATH=pid_simulation:yandex python ...
+
+Recorded files are JSON lines (or Parquet, if pyarrow is installed), sorted by time, one record per line.
+Snapshots:
+    {"time": 0.0, "resource_usage": {"cpu": 10, "user_memory": 100}, "resource_demand": {...}}
+Task arrivals:
+    {"time": 0.0, "id": "1", "priority": "NORMAL", "parallel_encoding": false, "size": 1.0, "duration": 600.0}
+time is in seconds from the trace start, size is in graphs (1 for an ordinary graph).
+"""
+import dataclasses
+import json
+import logging
+import time as wall_time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from quota_managers import QuotaManager, ResourcesData
+from yweb.video.faas.graphs.ott.common import Priority
+
+from records import LoggedRecord, Record
+from simulator import Simulator
+from soft_limit_with_tasks.resources import SoftResourceProvider
+from soft_limit_with_tasks.task_executors import TaskExecutor, TaskExetutorQueueMaintainer
+from task_model import Task
+
+
+class RecordFile:
+    """
+    Recorded file read from an offset (a byte offset for JSON lines, a row for Parquet),
+    so a reader over it can be checkpointed without the open file
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def read(self, offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Records from offset with the offset of the next record
+        """
+        if self.path.suffix == '.parquet':
+            import pyarrow.parquet as pq
+
+            row = 0
+            for batch in pq.ParquetFile(self.path).iter_batches():
+                if row + batch.num_rows > offset:
+                    for i, record in enumerate(batch.slice(max(0, offset - row)).to_pylist()):
+                        yield max(row, offset) + i + 1, record
+                row += batch.num_rows
+            return
+
+        with open(self.path) as file:
+            file.seek(offset)
+            # readline, not iteration, so tell() is available
+            for line in iter(file.readline, ''):
+                if line.strip():
+                    yield file.tell(), json.loads(line)
+
+
+def iter_records(path) -> Iterator[Dict[str, Any]]:
+    return (record for _, record in RecordFile(path).read())
+
+
+class RecordReader:
+    """
+    Reads records one by one from a RecordFile or a list. Checkpoints keep the offset of the next record,
+    the file is opened again at it.
+    """
+
+    def __init__(self, records):
+        self.records = records if isinstance(records, RecordFile) else list(records)
+        self.offset = 0
+        self._iterator = None
+
+    def next(self) -> Optional[Dict[str, Any]]:
+        if self._iterator is None:
+            if isinstance(self.records, RecordFile):
+                self._iterator = self.records.read(self.offset)
+            else:
+                self._iterator = ((i + 1, self.records[i]) for i in range(self.offset, len(self.records)))
+        item = next(self._iterator, None)
+        if item is None:
+            return None
+        self.offset, record = item
+        return record
+
+    def __getstate__(self):
+        return {'records': self.records, 'offset': self.offset, '_iterator': None}
+
+
+class ReplayClock:
+    def __init__(self, start: datetime):
+        self.start = start
+        self.t = 0.0
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.t)
+
+
+class SnapshotCursor:
+    """
+    Latest record with record['time'] <= t. Queries must not go back in time,
+    so the records are read lazily and only one of them is kept.
+    """
+
+    def __init__(self, records):
+        self.records = RecordReader(records)
+        self.current = None
+        self.next = self.records.next()
+
+    def at(self, t: float) -> Optional[Dict[str, Any]]:
+        while self.next is not None and self.next['time'] <= t:
+            self.current = self.next
+            self.next = self.records.next()
+        return self.current
+
+
+class RecordedYtClient:
+    """
+    Answers with the recorded orchid rows, launched tasks do not affect them (open loop).
+    """
+
+    def __init__(self, snapshots: SnapshotCursor, clock: ReplayClock):
+        self.snapshots = snapshots
+        self.clock = clock
+
+    def get(self, path: str) -> Dict[str, Any]:
+        row = self.snapshots.at(self.clock.t)
+        if row is None:
+            raise Exception(f'No snapshot recorded before {self.clock.t}')
+        return row
+
+
+class ExecutorYtClient:
+    """
+    Answers with usage and demand of the simulated executor (closed loop).
+    """
+
+    def __init__(self, executor: TaskExecutor, clock: ReplayClock, graph_resources: ResourcesData):
+        self.executor = executor
+        self.clock = clock
+        self.graph_resources = graph_resources
+
+    def get(self, path: str) -> Dict[str, Any]:
+        usage = self.executor.get_usage(self.clock.t)
+        demand = self.executor.get_demand(self.clock.t)
+        return {
+            'resource_usage': {
+                'cpu': usage * self.graph_resources.cpu,
+                'user_memory': usage * self.graph_resources.ram
+            },
+            'resource_demand': {
+                'cpu': demand * self.graph_resources.cpu,
+                'user_memory': demand * self.graph_resources.ram
+            }
+        }
+
+
+class ReplayTasksClient:
+    """
+    Counts parallel encoding tasks launched during the replay.
+    """
+
+    def __init__(self):
+        self.parallel_launches = deque()
+
+    def register_launch(self, task: 'ReplayTask', when: datetime):
+        if task.is_parallel_encoding():
+            self.parallel_launches.append(when)
+
+    def count(self, statuses, nirvana_quota=None, vod_providers=None, parallel_encoding=None,
+              update_time_lower_bound: Optional[datetime] = None) -> int:
+        assert parallel_encoding, 'Only parallel encoding tasks are counted in replay'
+        # the lower bound only grows, as the delay is constant
+        while self.parallel_launches and self.parallel_launches[0] < update_time_lower_bound:
+            self.parallel_launches.popleft()
+        return len(self.parallel_launches)
+
+
+@dataclasses.dataclass(eq=False)
+class ReplayTask:
+    id: str
+    arrival: float
+    priority: Priority
+    parallel_encoding: bool
+    size: float
+    duration: float
+
+    def is_parallel_encoding(self) -> bool:
+        return self.parallel_encoding
+
+    @staticmethod
+    def from_record(record: Dict[str, Any]) -> 'ReplayTask':
+        return ReplayTask(
+            id=str(record['id']),
+            arrival=record['time'],
+            priority=Priority[record.get('priority', 'NORMAL')],
+            parallel_encoding=bool(record.get('parallel_encoding', False)),
+            size=record.get('size', 1.0),
+            duration=record['duration'],
+        )
+
+
+class ArrivalFeeder:
+    """
+    Puts recorded tasks into the backlog at their arrival time.
+    """
+
+    def __init__(self, arrivals, backlog: List[ReplayTask], idle_period: float):
+        self.arrivals = RecordReader(arrivals)
+        self.backlog = backlog
+        self.idle_period = idle_period
+        self.next = self._next_task()
+        self.period = idle_period
+
+    def _next_task(self) -> Optional[ReplayTask]:
+        record = self.arrivals.next()
+        return None if record is None else ReplayTask.from_record(record)
+
+    def do(self, t: float):
+        while self.next is not None and self.next.arrival <= t:
+            self.backlog.append(self.next)
+            self.next = self._next_task()
+        self.period = self.idle_period if self.next is None else self.next.arrival - t
+
+
+class QuotaManagerDriver:
+    """
+    Calls filter_tasks_to_launch each period and launches the chosen tasks in the executor.
+    """
+
+    def __init__(
+        self,
+        manager: QuotaManager,
+        backlog: List[ReplayTask],
+        executor: TaskExecutor,
+        tasks_client: ReplayTasksClient,
+        clock: ReplayClock,
+        period: float
+    ):
+        self.manager = manager
+        self.backlog = backlog
+        self.executor = executor
+        self.tasks_client = tasks_client
+        self.clock = clock
+        self.period = period
+
+        self.decisions = 0
+        self.launched = 0
+        self.sum_wait = 0.0
+
+    def do(self, t: float):
+        self.clock.t = t
+        to_launch = self.manager.filter_tasks_to_launch(list(self.backlog))
+        self.decisions += 1
+        if not to_launch:
+            return
+
+        launched = set(to_launch)
+        self.backlog[:] = [task for task in self.backlog if task not in launched]
+        now = self.clock.now()
+        for task in to_launch:
+            self.tasks_client.register_launch(task, now)
+            self.executor.launch(Task(task.size, task.duration), t)
+            self.sum_wait += t - task.arrival
+        self.launched += len(to_launch)
+
+
+@dataclasses.dataclass
+class ReplayRecord(LoggedRecord):
+    usage: float
+    demand: float
+    actual_limit: float
+    backlog: int
+    launched: int
+    time: float
+
+
+class ReplayLogger:
+    def __init__(self, period: float, executor: TaskExecutor, driver: QuotaManagerDriver, output_lines):
+        self.period = period
+        self.executor = executor
+        self.driver = driver
+        self.output_lines = output_lines
+
+    def do(self, t):
+        self.output_lines.append(ReplayRecord(
+            usage=self.executor.get_usage(t),
+            demand=self.executor.get_demand(t),
+            actual_limit=self.executor.res_provider.capacity_fun(t),
+            backlog=len(self.driver.backlog),
+            launched=self.driver.launched,
+            time=t
+        ))
+
+
+@dataclasses.dataclass
+class ReplayReport(Record):
+    average_usage_util: float
+    average_demand_util: float
+    average_backlog: float
+    max_backlog: int
+    average_wait_sec: float
+    launched: int
+    decisions: int
+    simulated_sec: float
+    wall_time_sec: float
+
+    @staticmethod
+    def calculate(records: List[ReplayRecord], driver: QuotaManagerDriver, simulated_sec: float,
+                  wall_time_sec: float) -> 'ReplayReport':
+        limited = [x for x in records if x.actual_limit > 0]
+        return ReplayReport(
+            average_usage_util=sum(x.usage / x.actual_limit for x in limited) / max(1, len(limited)),
+            average_demand_util=sum(x.demand / x.actual_limit for x in limited) / max(1, len(limited)),
+            average_backlog=sum(x.backlog for x in records) / max(1, len(records)),
+            max_backlog=max((x.backlog for x in records), default=0),
+            average_wait_sec=driver.sum_wait / max(1, driver.launched),
+            launched=driver.launched,
+            decisions=driver.decisions,
+            simulated_sec=simulated_sec,
+            wall_time_sec=wall_time_sec,
+        )
+
+
+def recorded_capacity(snapshots: SnapshotCursor, graph_resources: ResourcesData) -> Callable[[float], float]:
+    """
+    Pool capacity in graphs, taken as the recorded usage of the worse resource:
+    what the pool actually got from the scheduler at that time.
+    """
+
+    def capacity(t: float) -> float:
+        row = snapshots.at(t)
+        if row is None:
+            return 0
+        return min(
+            row['resource_usage']['user_memory'] / graph_resources.ram,
+            row['resource_usage']['cpu'] / graph_resources.cpu,
+        )
+
+    return capacity
+
+
+def replay(
+    make_manager: Callable[[ReplayTasksClient, Any, Callable[[], datetime]], QuotaManager],
+    arrivals_path,
+    snapshots_path,
+    graph_resources: ResourcesData,
+    decision_period_sec: float,
+    duration_sec: float,
+    closed_loop: bool = True,
+    queue_maintainer_period_sec: float = 60,
+    log_period_sec: float = 60,
+    start: datetime = datetime(2023, 1, 1),
+):
+    """
+    Replays the recorded trace through a quota manager made by make_manager(tasks_client, yt_client, clock),
+    where clock returns the simulated time. In closed loop YT answers with the simulated executor state, and the recorded snapshots only
+    define the pool capacity. In open loop the manager sees the recorded snapshots as is.
+
+    Returns ReplayReport and the list of ReplayRecord.
+    """
+    clock = ReplayClock(start)
+    capacity_snapshots = SnapshotCursor(RecordFile(snapshots_path))
+    res_provider = SoftResourceProvider(recorded_capacity(capacity_snapshots, graph_resources))
+    executor = TaskExecutor(res_provider)
+
+    tasks_client = ReplayTasksClient()
+    if closed_loop:
+        yt_client = ExecutorYtClient(executor, clock, graph_resources)
+    else:
+        yt_client = RecordedYtClient(SnapshotCursor(RecordFile(snapshots_path)), clock)
+    manager = make_manager(tasks_client, yt_client, clock.now)
+
+    backlog = []
+    feeder = ArrivalFeeder(RecordFile(arrivals_path), backlog, idle_period=decision_period_sec)
+    driver = QuotaManagerDriver(manager, backlog, executor, tasks_client, clock, decision_period_sec)
+    output_lines = []
+    logger = ReplayLogger(log_period_sec, executor, driver, output_lines)
+
+    processes = [feeder, TaskExetutorQueueMaintainer(queue_maintainer_period_sec, executor), driver, logger]
+    started = wall_time.perf_counter()
+    Simulator(processes).simulate(duration_sec)
+    wall_time_sec = wall_time.perf_counter() - started
+
+    report = ReplayReport.calculate(output_lines, driver, duration_sec, wall_time_sec)
+    logging.info(f'Replay finished: {report}')
+    return report, output_lines
@@ -0,0 +1,54 @@
+from metrics import MetricsRegistry, NULL_REGISTRY, timed
+
+
+class Decider:
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    @timed('decision_seconds', decision='decide')
+    def decide(self) -> int:
+        return 42
+
+
+class TestMetricsRegistry:
+    def test_counter(self):
+        registry = MetricsRegistry()
+        registry.inc('quota_reached')
+        registry.inc('quota_reached', 2)
+        assert registry.counters['quota_reached'][()] == 3
+        assert 'quota_reached_total 3' in registry.to_openmetrics()
+
+    def test_gauge_with_labels(self):
+        registry = MetricsRegistry()
+        registry.set('limiting', 1, {'resource': 'ram'})
+        registry.set('limiting', 0, {'resource': 'cpu'})
+        text = registry.to_openmetrics()
+        assert '# TYPE limiting gauge' in text
+        assert 'limiting{resource="ram"} 1' in text
+        assert 'limiting{resource="cpu"} 0' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5):
+            registry.observe('latency_seconds', value)
+        text = registry.to_openmetrics()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1.0"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'latency_seconds_count 3' in text
+
+    def test_ends_with_eof(self):
+        assert MetricsRegistry().to_openmetrics() == '# EOF\n'
+
+    def test_timed(self):
+        registry = MetricsRegistry()
+        assert Decider(registry).decide() == 42
+        assert registry.histograms['decision_seconds'][(('decision', 'decide'),)].count == 1
+
+
+class TestNullRegistry:
+    def test_nothing_recorded(self):
+        assert Decider(NULL_REGISTRY).decide() == 42
+        NULL_REGISTRY.inc('quota_reached')
+        NULL_REGISTRY.set('cur_coef', 1)
+        assert NULL_REGISTRY.to_openmetrics() == '# EOF\n'
@@ -1,3 +1,78 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from metrics import MetricsRegistry
+from quota_managers import KalmanQuotaManager, PidResourceQuotaManager, ResourceQuotaManager, ResourcesData
+
+
+def yt_response(usage: float, demand: float) -> dict:
+    return {
+        'resource_usage': {
+            'cpu': usage,
+            'user_memory': usage
+        },
+        'resource_demand': {
+            'cpu': demand,
+            'user_memory': demand
+        }
+    }
+
+
+def make_pid_quota_manager(clock) -> PidResourceQuotaManager:
+    return PidResourceQuotaManager(
+        max_demand_usage_diff=0.2,
+        step=4,
+        k_i=0.5,
+        k_d=0,
+        period_sec=60,
+        tasks_client=MagicMock(),
+        yt_client=MagicMock(),
+        nirvana_quota='quota',
+        vod_providers=['provider'],
+        parallel_graph_launch_delay_sec=60,
+        clock=clock,
+    )
+
+
+@pytest.fixture
+def pid_quota_manager():
+    now = datetime(2023, 1, 1)
+
+    def tick():
+        nonlocal now
+        now += timedelta(seconds=60)
+        return now
+
+    return make_pid_quota_manager(tick)
+
+
+@pytest.fixture
+def kalman_quota_manager():
+    now = datetime(2023, 1, 1)
+
+    def tick():
+        nonlocal now
+        now += timedelta(seconds=10)
+        return now
+
+    return KalmanQuotaManager(
+        graph_resources=ResourcesData(ram=1, cpu=1),
+        s_mean=10,
+        s_dev=1,
+        l_dev=1,
+        v_underutil=0.95,
+        period_sec=10,
+        tasks_client=MagicMock(),
+        yt_client=MagicMock(),
+        nirvana_quota='quota',
+        vod_providers=['provider'],
+        parallel_graph_launch_delay_sec=60,
+        clock=tick,
+    )
+
+
 class TestResourceQuotaManager:
     def test_have_resources(self, yt_quota_manager, various_max_demand_usage_diffs, various_steps):
         yt_quota_manager.yt_client.get.return_value = {
@@ -100,4 +175,165 @@ class TestResourceQuotaManager:
                 'user_memory': 51
             }
         }
-        assert yt_quota_manager.available_slots() == 1
\ No newline at end of file
+        assert yt_quota_manager.available_slots() == 1
+
+
+class TestPidResourceQuotaManager:
+    def test_proportional_without_history(self, pid_quota_manager):
+        pid_quota_manager.k_i = 0
+        pid_quota_manager.yt_client.get.return_value = yt_response(usage=100, demand=110)
+        assert pid_quota_manager.available_slots() == 2
+
+    def test_integral_grows_while_under_limit(self, pid_quota_manager):
+        pid_quota_manager.yt_client.get.return_value = yt_response(usage=100, demand=110)
+        first = pid_quota_manager.available_slots()
+        second = pid_quota_manager.available_slots()
+        assert second > first > 2
+
+    def test_integral_reset_when_limit_crossed(self, pid_quota_manager):
+        pid_quota_manager.yt_client.get.return_value = yt_response(usage=100, demand=110)
+        pid_quota_manager.available_slots()
+        pid_quota_manager.available_slots()
+
+        pid_quota_manager.yt_client.get.return_value = yt_response(usage=100, demand=130)
+        assert pid_quota_manager.available_slots() == 0
+        assert pid_quota_manager.e_integral < 0
+
+    def test_worse_resource_limits(self, pid_quota_manager):
+        pid_quota_manager.yt_client.get.return_value = {
+            'resource_usage': {
+                'cpu': 100,
+                'user_memory': 100
+            },
+            'resource_demand': {
+                'cpu': 100,
+                'user_memory': 125
+            }
+        }
+        assert pid_quota_manager.available_slots() == 0
+
+    def test_gap_does_not_wind_up_integral(self):
+        now = datetime(2023, 1, 1)
+        pid_quota_manager = make_pid_quota_manager(lambda: now)
+        pid_quota_manager.yt_client.get.return_value = yt_response(usage=100, demand=110)
+        pid_quota_manager.available_slots()
+        integral = pid_quota_manager.e_integral
+
+        # an hour of YT errors, the calls return before the controller
+        pid_quota_manager.yt_client.get.side_effect = [Exception("YT ERROR")] * 60
+        for _ in range(60):
+            now += timedelta(seconds=60)
+            assert pid_quota_manager.available_slots() == 0
+        pid_quota_manager.yt_client.get.side_effect = None
+
+        now += timedelta(seconds=60)
+        pid_quota_manager.available_slots()
+        e = 1 + pid_quota_manager.max_demand_usage_diff - 1.1
+        max_dt = PidResourceQuotaManager.MAX_DT_PERIODS * pid_quota_manager.period_sec
+        assert pid_quota_manager.e_integral == pytest.approx(integral + e * max_dt)
+
+    def test_yt_error_keeps_state(self, pid_quota_manager):
+        pid_quota_manager.yt_client.get.side_effect = [Exception("YT ERROR")]
+        assert pid_quota_manager.available_slots() == 0
+        assert pid_quota_manager.t_prev is None
+        assert pid_quota_manager.e_integral == 0
+
+
+class TestKalmanQuotaManager:
+    def test_yt_error(self, kalman_quota_manager):
+        kalman_quota_manager.yt_client.get.side_effect = [Exception("YT ERROR")]
+        assert kalman_quota_manager.available_slots() == 0
+        assert kalman_quota_manager.t_prev is None
+
+    def test_invalid_yt_response(self, kalman_quota_manager):
+        kalman_quota_manager.yt_client.get.return_value = {}
+        assert kalman_quota_manager.available_slots() == 0
+
+    def test_follows_drain_rate(self, kalman_quota_manager):
+        # the pool starts 2 queued graphs per second while there is a backlog
+        queued = 100
+        slots = 0
+        for _ in range(30):
+            queued = max(0, queued + slots - 2 * kalman_quota_manager.period_sec)
+            kalman_quota_manager.yt_client.get.return_value = yt_response(usage=100, demand=100 + queued)
+            slots = kalman_quota_manager.available_slots()
+        assert 0.95 * 2 * kalman_quota_manager.period_sec - 2 <= slots <= 2 * kalman_quota_manager.period_sec
+
+    def test_worse_resource_limits(self, kalman_quota_manager):
+        kalman_quota_manager.yt_client.get.return_value = {
+            'resource_usage': {
+                'cpu': 100,
+                'user_memory': 100
+            },
+            'resource_demand': {
+                'cpu': 100,
+                'user_memory': 150
+            }
+        }
+        kalman_quota_manager.available_slots()
+        assert kalman_quota_manager.f.x[2] == pytest.approx(50 * kalman_quota_manager.s_mean)
+
+
+class TestQuotaMetrics:
+    @staticmethod
+    def quota_manager(metrics: MetricsRegistry) -> ResourceQuotaManager:
+        return ResourceQuotaManager(
+            max_demand_usage_diff=0.2,
+            step=4,
+            tasks_client=MagicMock(),
+            yt_client=MagicMock(),
+            nirvana_quota='quota',
+            vod_providers=['provider'],
+            parallel_graph_launch_delay_sec=60,
+            metrics=metrics,
+        )
+
+    def test_yt_error_counted(self):
+        metrics = MetricsRegistry()
+        manager = self.quota_manager(metrics)
+        manager.yt_client.get.side_effect = [Exception("YT ERROR")]
+        assert manager.available_slots() == 0
+        assert metrics.counters['quota_yt_error_zero_slots'][()] == 1
+        assert metrics.histograms['quota_external_call_seconds'][(('call', 'yt_get'),)].count == 1
+        assert metrics.histograms['quota_decision_seconds'][(('decision', 'available_slots'),)].count == 1
+
+    def test_limiting_resource_gauges(self):
+        metrics = MetricsRegistry()
+        manager = self.quota_manager(metrics)
+        manager.yt_client.get.return_value = {
+            'resource_usage': {
+                'cpu': 100,
+                'user_memory': 100
+            },
+            'resource_demand': {
+                'cpu': 110,
+                'user_memory': 100
+            }
+        }
+        manager.available_slots()
+        assert metrics.gauges['quota_cur_coef'][()] == 1.1
+        assert metrics.gauges['quota_limiting_resource'][(('resource', 'cpu'),)] == 1
+        assert metrics.gauges['quota_limiting_resource'][(('resource', 'ram'),)] == 0
+
+    def test_quota_reached_and_parallel_blocked(self):
+        metrics = MetricsRegistry()
+        manager = self.quota_manager(metrics)
+        manager.tasks_client.count.return_value = 1
+        manager.yt_client.get.return_value = {
+            'resource_usage': {
+                'cpu': 100,
+                'user_memory': 100
+            },
+            'resource_demand': {
+                'cpu': 100,
+                'user_memory': 100
+            }
+        }
+        tasks = [MagicMock() for _ in range(10)]
+        for task in tasks:
+            task.is_parallel_encoding.return_value = True
+
+        assert manager.filter_tasks_to_launch(tasks) == []
+        assert metrics.counters['quota_reached'][()] == 1
+        assert metrics.counters['quota_parallel_encoding_blocked'][()] == 10
+        assert 'quota_decision_seconds_count{decision="filter_tasks_to_launch"} 1' in metrics.to_openmetrics()
@@ -0,0 +1,116 @@
+import copy
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from quota_managers import ResourceQuotaManager, ResourcesData
+from replay import ArrivalFeeder, RecordFile, ReplayTasksClient, SnapshotCursor, replay
+
+
+def write_lines(path, records):
+    with open(path, 'w') as file:
+        for record in records:
+            file.write(f'{json.dumps(record)}\n')
+    return path
+
+
+def snapshot(t: float, usage: float, demand: float) -> dict:
+    return {
+        'time': t,
+        'resource_usage': {'cpu': usage, 'user_memory': usage},
+        'resource_demand': {'cpu': demand, 'user_memory': demand}
+    }
+
+
+@pytest.fixture
+def trace(tmp_path):
+    arrivals = [
+        {'time': float(i), 'id': str(i), 'priority': 'NORMAL', 'parallel_encoding': i % 10 == 0,
+         'size': 1.0, 'duration': 100.0}
+        for i in range(1000)
+    ]
+    snapshots = [snapshot(0, 50, 50), snapshot(500, 100, 100)]
+    return write_lines(tmp_path / 'arrivals.jsonl', arrivals), write_lines(tmp_path / 'snapshots.jsonl', snapshots)
+
+
+def make_resource_quota_manager(tasks_client, yt_client, clock) -> ResourceQuotaManager:
+    return ResourceQuotaManager(
+        max_demand_usage_diff=0.2,
+        step=4,
+        tasks_client=tasks_client,
+        yt_client=yt_client,
+        nirvana_quota='quota',
+        vod_providers=['provider'],
+        parallel_graph_launch_delay_sec=30,
+        clock=clock,
+    )
+
+
+class TestReplay:
+    def test_closed_loop(self, trace):
+        arrivals, snapshots = trace
+        report, records = replay(make_resource_quota_manager, arrivals, snapshots,
+                                 graph_resources=ResourcesData(ram=1, cpu=1),
+                                 decision_period_sec=5, duration_sec=2000, log_period_sec=10)
+        assert report.launched > 0
+        assert report.decisions == pytest.approx(2000 / 5, abs=1)
+        assert 0 < report.average_usage_util <= 1
+        assert records[-1].backlog == 1000 - report.launched
+
+    def test_open_loop_sees_recorded_snapshots(self, trace):
+        arrivals, snapshots = trace
+        yt_clients = []
+
+        def make_manager(tasks_client, yt_client, clock):
+            yt_clients.append(yt_client)
+            return make_resource_quota_manager(tasks_client, yt_client, clock)
+
+        replay(make_manager, arrivals, snapshots, graph_resources=ResourcesData(ram=1, cpu=1),
+               decision_period_sec=5, duration_sec=600, closed_loop=False)
+        assert yt_clients[0].get('')['resource_usage']['cpu'] == 100
+
+
+class TestReplayTasksClient:
+    def test_counts_recent_parallel_launches(self):
+        client = ReplayTasksClient()
+        start = datetime(2023, 1, 1)
+        task = MagicMock()
+        task.is_parallel_encoding.return_value = True
+        client.register_launch(task, start)
+        client.register_launch(task, start + timedelta(seconds=10))
+
+        assert client.count([], parallel_encoding=True, update_time_lower_bound=start) == 2
+        assert client.count([], parallel_encoding=True, update_time_lower_bound=start + timedelta(seconds=5)) == 1
+
+
+class TestSnapshotCursor:
+    def test_latest_before(self):
+        cursor = SnapshotCursor([{'time': 0}, {'time': 10}, {'time': 20}])
+        assert cursor.at(5)['time'] == 0
+        assert cursor.at(10)['time'] == 10
+        assert cursor.at(100)['time'] == 20
+
+    def test_copy_continues_from_the_same_record(self, trace):
+        _, snapshots = trace
+        cursor = SnapshotCursor(RecordFile(snapshots))
+        assert cursor.at(100)['time'] == 0
+        copied = copy.deepcopy(cursor)
+        assert copied.at(1000)['time'] == 500
+        assert cursor.at(1000)['time'] == 500
+
+
+class TestArrivalFeeder:
+    def test_copy_continues_from_the_same_record(self, trace):
+        arrivals, _ = trace
+        feeder = ArrivalFeeder(RecordFile(arrivals), [], idle_period=5)
+        feeder.do(99.5)
+        assert [task.id for task in feeder.backlog] == [str(i) for i in range(100)]
+        assert feeder.period == 0.5
+
+        copied = copy.deepcopy(feeder)
+        copied.do(200)
+        feeder.do(200)
+        assert [task.id for task in copied.backlog] == [task.id for task in feeder.backlog]
+        assert len(feeder.backlog) == 201